@@ -3,4 +3,13 @@ __version__ = "0.2"
 from pyfim import config
 defaults = config.default_parameters
 
-from pyfim.core import Experiment, Collection, TwoChoiceExperiment
\ No newline at end of file
+from pyfim.core import Experiment, Collection, TwoChoiceExperiment, process_batches, load_pipelined
+from pyfim.io import read_hdf5, read_zarr
+from pyfim.live import LiveTail
+from pyfim import features
+from pyfim import shared
+from pyfim import pipeline
+from pyfim import roi
+from pyfim import heatmap
+from pyfim import contacts
+from pyfim import stitching
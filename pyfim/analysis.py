@@ -15,14 +15,13 @@
 #    GNU General Public License for more details.
 
 
-import math
 
 import numpy as np
 import pandas as pd
 
-import peakutils
-
-from pyfim import core, config
+from pyfim import core, config, kernels
+from pyfim.kinematics import (body_curvature, head_angular_velocity,
+                              heading_change, tortuosity, SPINE_PARAMS)
 defaults = config.default_parameters
 
 # Default analyses
@@ -30,9 +29,61 @@ __all__ = ['stops','pause_turns','bending_strength',
            'head_bends', 'peristalsis_efficiency',
            'peristalsis_frequency', 'stop_duration' ]
 
+# Kinematics - not run by default as most generate a table per analysis.
+# Use e.g. `exp.run_analyses( pyfim.analysis.__kinematics__ )`
+__kinematics__ = ['body_curvature', 'head_angular_velocity',
+                  'heading_change', 'tortuosity']
+
 # Define two-choice analyses here
 __two_choice__ = ['PI_over_time','preference_index']
 
+# Parameters required by each analysis. Analyses are skipped if any of these
+# has not been loaded. Use `None` as placeholder for `TC_PARAM`.
+__requires__ = dict( stops=['go_phase'],
+                     pause_turns=['go_phase', 'mov_direction'],
+                     bending_strength=['bending'],
+                     head_bends=['bending'],
+                     peristalsis_efficiency=['area', 'go_phase', 'acc_dst'],
+                     peristalsis_frequency=['area', 'go_phase'],
+                     stop_duration=['go_phase'],
+                     tortuosity=['spinepoint_2_x', 'spinepoint_2_y'],
+                     body_curvature=SPINE_PARAMS,
+                     head_angular_velocity=SPINE_PARAMS,
+                     heading_change=SPINE_PARAMS,
+                     PI_over_time=[None],
+                     preference_index=[None] )
+
+# Event types collected by detect_events() and the analyses they are based on
+EVENT_TYPES = ['stop', 'head_bend', 'pause_turn', 'peristalsis']
+_EVENT_ANALYSES = dict( stop='stops',
+                        head_bend='head_bends',
+                        pause_turn='pause_turns',
+                        peristalsis='peristalsis_frequency' )
+
+EVENT_DTYPE = np.dtype( [ ('object', np.int32),
+                          ('event', np.int8),
+                          ('start', np.int64),
+                          ('end', np.int64),
+                          ('magnitude', np.float32) ] )
+
+
+def required_parameters(analysis):
+    """ Returns the FIMTrack parameters required to run a given analysis.
+
+    Parameters
+    ----------
+    analysis :  str
+                Name of the analysis, e.g. "stops".
+
+    Returns
+    -------
+    list of str
+
+    """
+    # Important: do NOT add this to __all__ -> otherwise this will be run as analysis
+    return [ defaults['TC_PARAM'] if r is None else r for r in __requires__.get(analysis, []) ]
+
+
 def preference_index(exp):
     """ Calculates the preference index (PI) for a two choice experiment:
 
@@ -277,33 +328,69 @@ def pause_turns(exp):
 
     # Iterate over all objects
     for obj in exp.mov_direction:
-        # Find stop and go phases
-        go_phases = binary_phases( exp.go_phase[obj].values, mode='ON' )
+        # Find pause-turns
+        is_turn = _find_pause_turns( exp.go_phase[obj].values,
+                                     smoothed_mov[obj].values,
+                                     smoothed_mov.index )[2]
 
-        turns = 0
-        # Go over pairs of consecutive go phases
-        for this_go, next_go in zip( go_phases, go_phases[1:] ):
-            # Skip if go time too short
-            if ( this_go[1] - this_go[0] ) < defaults['MIN_GO_TIME']:
-                continue
-            if ( next_go[1] - next_go[0] ) < defaults['MIN_GO_TIME']:
-                continue
+        # Add mean frequency
+        mean_freq.append( is_turn.sum() / ( exp.mov_direction[obj].dropna().shape[0] / defaults['FPS'] ) )
 
-            # Skip if pause too short
-            if ( next_go[0] - this_go[1] ) < defaults['MIN_STOP_TIME']:
-                continue
+    return pd.Series(mean_freq, index=exp.mov_direction.columns)
 
-            # Get directions before and after pause
-            dir_before = smoothed_mov.loc[ this_go[1] - 1 , obj]
-            dir_after = smoothed_mov.loc[ next_go[0] + 1 , obj]
 
-            if math.fabs( dir_before - dir_after ) >= defaults['TURN_ANGLE_THRESHOLD']:
-                turns +=1
+def _find_pause_turns(go_phase, directions, index):
+    """ Low-level function: Finds pause-turns between consecutive go phases.
 
-        # Add mean frequency
-        mean_freq.append( turns / ( exp.mov_direction[obj].dropna().shape[0] / defaults['FPS'] ) )
+    Parameters
+    ----------
+    go_phase :      np.ndarray
+                    Go phase of a single object.
+    directions :    np.ndarray
+                    Smoothed movement direction of the same object.
+    index :         pandas.Index
+                    Frame labels of `directions`.
 
-    return pd.Series(mean_freq, index=exp.mov_direction.columns)
+    Returns
+    -------
+    this_go, next_go :  np.ndarray
+                        (N, 2) start/end of the go phases before and after
+                        each pause.
+    is_turn :           np.ndarray
+                        (N, ) boolean - True if pause is a pause-turn.
+    angle :             np.ndarray
+                        (N, ) change in movement direction across the pause.
+
+    """
+    # Find stop and go phases
+    go_phases = binary_phases( go_phase, mode='ON' )
+
+    if len(go_phases) < 2:
+        empty = np.zeros( (0, 2), dtype=int )
+        return empty, empty, np.zeros( 0, dtype=bool ), np.zeros( 0 )
+
+    # Go over pairs of consecutive go phases
+    this_go, next_go = go_phases[:-1], go_phases[1:]
+
+    # Skip if go time too short or pause too short
+    valid = ( ( this_go[:, 1] - this_go[:, 0] ) >= defaults['MIN_GO_TIME'] ) & \
+            ( ( next_go[:, 1] - next_go[:, 0] ) >= defaults['MIN_GO_TIME'] ) & \
+            ( ( next_go[:, 0] - this_go[:, 1] ) >= defaults['MIN_STOP_TIME'] )
+
+    # Get directions before and after pause
+    ix_before = index.get_indexer( this_go[:, 1] - 1 )
+    ix_after = index.get_indexer( next_go[:, 0] + 1 )
+
+    # Frames missing from the index (e.g. after `CUT_TABLE_HEAD`) have no
+    # direction -> can't be a turn
+    found = ( ix_before >= 0 ) & ( ix_after >= 0 )
+    angle = np.full( len(found), np.nan )
+    angle[ found ] = np.fabs( directions[ ix_before[ found ] ] - directions[ ix_after[ found ] ] )
+
+    with np.errstate(invalid='ignore'):
+        is_turn = valid & found & ( angle >= defaults['TURN_ANGLE_THRESHOLD'] )
+
+    return this_go, next_go, is_turn, angle
 
 
 def bending_strength(exp, during=None):
@@ -464,7 +551,7 @@ def peristalsis_efficiency(exp):
 
         if len(go_area) > 0:
             # Detect peaks
-            indexes = peakutils.indexes( go_area.values, min_dist=defaults['MIN_PEAK_DIST'] )
+            indexes = kernels.peak_indexes( go_area.values, min_dist=defaults['MIN_PEAK_DIST'] )
 
             # Get distances travelled per go phase
             go_acc_dist = sum( [  acc_dst_filled.loc[ e-1, obj ] -  acc_dst_filled.loc[ s, obj ] for s,e in go_phases ] )
@@ -527,7 +614,7 @@ def peristalsis_frequency(exp):
 
         if len(go_area) > 0:
             # Detect peaks
-            indexes = peakutils.indexes( go_area.values, min_dist=defaults['MIN_PEAK_DIST'] )
+            indexes = kernels.peak_indexes( go_area.values, min_dist=defaults['MIN_PEAK_DIST'] )
 
             # Get mean frequency
             mean_freq.append( len(indexes) / ( go_area.shape[0] / defaults['FPS'] ) )
@@ -537,6 +624,258 @@ def peristalsis_frequency(exp):
     return pd.Series(mean_freq, index=exp.area.columns)
 
 
+def frequency_over_time(exp, analysis='stops', window=None, step=None):
+    """ Time-resolved version of the frequency analyses: calculates the
+    frequency [Hz] of events for each object in tumbling or sliding windows.
+
+    Notes
+    -----
+    Events are detected once over the whole track, exactly as in the
+    respective analysis. Events are then assigned to windows by the frame
+    they start in, and counts per window are taken from cumulative sums.
+    A window covering the whole track therefore gives the same result as
+    the analysis itself.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+                Experiment holding the raw data.
+    analysis :  {'stops', 'head_bends', 'pause_turns', 'peristalsis_frequency'}
+                Analysis to resolve over time.
+    window :    int, optional
+                Window size in frames. Defaults to one minute (60 * `FPS`).
+    step :      int, optional
+                Step between windows in frames. Defaults to `window`
+                (tumbling windows). Use a smaller value for sliding windows.
+
+    Returns
+    -------
+    Frequencies [Hz] : pandas.DataFrame
+                Windows (labelled by their first frame) x objects. NaN if an
+                object has not been tracked in a window.
+
+    Examples
+    --------
+    >>> # Stop frequency per minute
+    >>> stops = pyfim.analysis.frequency_over_time(exp, 'stops', window=600)
+
+    """
+
+    # Important: do NOT add this to __all__ -> otherwise this will be run as analysis
+
+    if not isinstance(exp, core.Experiment):
+        raise TypeError('Need pyfim.Experiment, not {0}'.format(type(exp)))
+
+    if isinstance(window, type(None)):
+        window = 60 * defaults['FPS']
+
+    if isinstance(step, type(None)):
+        step = window
+
+    window, step = int(window), int(step)
+
+    if window < 1 or step < 1:
+        raise ValueError('Window and step must be at least 1 frame')
+
+    events, valid, _ = _detect_events(exp, analysis)
+
+    # Cumulative number of event starts and valid frames per object
+    n_frames, n_objects = valid.shape
+    starts = np.zeros( (n_frames + 1, n_objects) )
+    frames = np.concatenate( [ ev[:, 0] for ev in events ] ).astype(int)
+    objects = np.repeat( np.arange( n_objects ), [ len(ev) for ev in events ] )
+    np.add.at( starts, ( frames + 1, objects ), 1 )
+    starts = np.cumsum( starts, axis=0 )
+
+    n_valid = np.zeros( (n_frames + 1, n_objects) )
+    n_valid[1:] = np.cumsum( valid.values, axis=0 )
+
+    # Window boundaries
+    w_start = np.arange( 0, n_frames - window + 1, step )
+    w_end = w_start + window
+
+    counts = starts[ w_end ] - starts[ w_start ]
+    tracked = n_valid[ w_end ] - n_valid[ w_start ]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        freq = counts / ( tracked / defaults['FPS'] )
+    freq[ tracked == 0 ] = np.nan
+
+    return pd.DataFrame( freq, index=valid.index[ w_start ], columns=valid.columns )
+
+
+def detect_events(exp, events=None):
+    """ Detects behavioral events and collects them in a single table.
+
+    Events are detected exactly as in the respective analyses:
+
+    ============  =====================================  =====================
+    event         phases                                 magnitude
+    ============  =====================================  =====================
+    stop          see :func:`~pyfim.analysis.stops`      duration [frames]
+    head_bend     see :func:`~pyfim.analysis.head_bends` max bending [degrees]
+    pause_turn    pause between two go phases, see       change in direction
+                  :func:`~pyfim.analysis.pause_turns`    [degrees]
+    peristalsis   peak, see                              area at peak
+                  :func:`~pyfim.analysis.peristalsis_frequency`
+    ============  =====================================  =====================
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+                Experiment holding the raw data.
+    events :    list of str, optional
+                Event types to detect. If None, will detect all event types
+                for which the required parameters are available.
+
+    Returns
+    -------
+    np.ndarray
+                Structured array with fields:
+
+                  - `object`: position of object in `exp.objects`
+                  - `event`: position of event type in `EVENT_TYPES`
+                  - `start`: first frame of event
+                  - `end`: frame after last frame of event
+                  - `magnitude`: see above
+
+                Sorted by object and start frame.
+
+    Examples
+    --------
+    >>> ev = pyfim.analysis.detect_events(exp)
+    >>> # Durations of all stops
+    >>> stops = ev[ ev['event'] == pyfim.analysis.EVENT_TYPES.index('stop') ]
+    >>> durations = stops['magnitude']
+    >>> # Inter-event intervals
+    >>> intervals = np.diff( stops['start'] )
+
+    """
+
+    if not isinstance(exp, core.Experiment):
+        raise TypeError('Need pyfim.Experiment, not {0}'.format(type(exp)))
+
+    if isinstance(events, type(None)):
+        events = [ e for e in EVENT_TYPES if not set( required_parameters( _EVENT_ANALYSES[e] ) ) - set( exp.parameters ) ]
+    elif isinstance(events, str):
+        events = [ events ]
+
+    unknown = set(events) - set(EVENT_TYPES)
+    if unknown:
+        raise ValueError('Unknown event type(s): {0}. Please use {1}'.format( ', '.join( sorted(unknown) ), EVENT_TYPES))
+
+    obj_pos = { o: i for i, o in enumerate( exp.objects ) }
+
+    tables = []
+    for e in events:
+        phases, valid, magnitudes = _detect_events( exp, _EVENT_ANALYSES[e] )
+
+        n = np.array( [ len(ph) for ph in phases ], dtype=int )
+        table = np.zeros( n.sum(), dtype=EVENT_DTYPE )
+
+        if n.sum():
+            frames = np.concatenate( phases ).astype(int)
+            index = valid.index.values
+
+            table['object'] = np.repeat( [ obj_pos[o] for o in valid.columns ], n )
+            table['event'] = EVENT_TYPES.index(e)
+            table['start'] = index[ frames[:, 0] ]
+            # End is exclusive -> last frame + 1
+            table['end'] = index[ frames[:, 1] - 1 ] + 1
+            table['magnitude'] = np.concatenate( magnitudes )
+
+        tables.append( table )
+
+    if not tables:
+        return np.zeros( 0, dtype=EVENT_DTYPE )
+
+    table = np.concatenate( tables )
+
+    return table[ np.lexsort( ( table['start'], table['object'] ) ) ]
+
+
+def _detect_events(exp, analysis):
+    """ Low-level function: Detects events of a frequency analysis.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+    analysis :  {'stops', 'head_bends', 'pause_turns', 'peristalsis_frequency'}
+
+    Returns
+    -------
+    events :    list of np.ndarray
+                One (N, 2) array of start/end frames (positions, end
+                exclusive) per object.
+    valid :     pandas.DataFrame
+                Frames x objects. True for frames counted towards the
+                duration of the track.
+    magnitude : list of np.ndarray
+                One (N, ) array of event magnitudes per object.
+
+    """
+    PERM_ANALYSES = ['stops', 'head_bends', 'pause_turns', 'peristalsis_frequency']
+    if analysis not in PERM_ANALYSES:
+        raise ValueError('Unknown analysis "{0}". Please use {1}'.format(analysis, PERM_ANALYSES))
+
+    def to_frames(phases, not_nan):
+        """ Maps phases on NaN-free data back to frame positions. """
+        phases = np.asarray( phases, dtype=int ).reshape( -1, 2 )
+        pos = np.flatnonzero( not_nan )
+        return np.column_stack( [ pos[ phases[:, 0] ], pos[ phases[:, 1] - 1 ] + 1 ] ) if len(phases) else phases
+
+    events, magnitude = [], []
+    if analysis == 'stops':
+        valid = exp.go_phase.notnull()
+        for obj in exp.go_phase:
+            phases = binary_phases( exp.go_phase[obj].values, mode='OFF',
+                                    min_len=defaults['MIN_STOP_PHASE'] )
+            phases = np.asarray( phases, dtype=int ).reshape( -1, 2 )
+            events.append( to_frames( phases, valid[obj].values ) )
+            magnitude.append( phases[:, 1] - phases[:, 0] )
+    elif analysis == 'head_bends':
+        valid = exp.bending.notnull()
+        for obj in exp.bending:
+            abs_bend = ( exp.bending[obj] - 180 ).abs().dropna()
+            phases = binary_phases( abs_bend >= defaults['BENDING_ANGLE_THRESHOLD'],
+                                    mode='ON', min_len=defaults['MIN_BENDED_PHASE'] )
+            phases = np.asarray( phases, dtype=int ).reshape( -1, 2 )
+            events.append( to_frames( phases, valid[obj].values ) )
+            magnitude.append( np.array( [ abs_bend.values[ s:e ].max() for s, e in phases ] ) )
+    elif analysis == 'pause_turns':
+        valid = exp.mov_direction.notnull()
+        smoothed_mov = exp.mov_direction.rolling( defaults['DIRECTION_SMOOTHING'] ).median()
+        for obj in exp.mov_direction:
+            go = exp.go_phase[obj].values
+            this_go, next_go, is_turn, angle = _find_pause_turns( go, smoothed_mov[obj].values, smoothed_mov.index )
+            # Event = the pause between the two go phases
+            pauses = np.column_stack( [ this_go[is_turn, 1], next_go[is_turn, 0] ] )
+            pos = np.flatnonzero( ~np.isnan( go ) )
+            events.append( np.column_stack( [ pos[ pauses[:, 0] ], pos[ pauses[:, 1] - 1 ] + 1 ] ) if len(pauses) else pauses )
+            magnitude.append( angle[ is_turn ] )
+    elif analysis == 'peristalsis_frequency':
+        valid = pd.DataFrame( False, index=exp.area.index, columns=exp.area.columns )
+        for obj in exp.area:
+            filt = ( ~exp.area[obj].isnull() ) & ( ~exp.go_phase[obj].isnull() )
+            area = exp.area[obj].values[ filt.values ]
+            go_phases = binary_phases( exp.go_phase[obj].values[ filt.values ], mode='ON',
+                                       min_len=defaults['MIN_GO_PHASE'] )
+            go_frames = np.array( [ f for s, e in go_phases for f in range(s, e) ], dtype=int )
+
+            # Frames in go phases with area measured count towards duration
+            pos = np.flatnonzero( filt.values )[ go_frames ]
+            valid.iloc[ pos, valid.columns.get_loc(obj) ] = True
+
+            if len(go_frames) > 0:
+                peaks = kernels.peak_indexes( area[ go_frames ], min_dist=defaults['MIN_PEAK_DIST'] )
+            else:
+                peaks = np.zeros( 0, dtype=int )
+            events.append( np.column_stack( [ pos[ peaks ], pos[ peaks ] + 1 ] ) )
+            magnitude.append( area[ go_frames ][ peaks ] )
+
+    return events, valid, magnitude
+
+
 def binary_phases(x, mode='ON', min_len=1):
     """ Low-level function: Extracts phases from binary indicators such as
     "go_phase" or "is_coiled".
@@ -587,6 +926,15 @@ def binary_phases(x, mode='ON', min_len=1):
     # Make sure we're working on zeroes and ones
     x = x.astype(int)
 
+    # Nothing tracked
+    if not len(x):
+        return np.array( [] )
+
+    # Use compiled kernel if available
+    if kernels.use_numba():
+        phases = kernels.binary_phases( x, mode=mode, min_len=min_len )
+        return phases if len(phases) else np.array( [] )
+
     # Find start and end of phases using the first derivative
     deriv = np.diff( x )
     all_cuts = np.where( deriv != 0 )[0] + 1
@@ -7,6 +7,9 @@ default_parameters = dict(
 FILE_FORMAT               = '.csv', # File format to search for
 DELIMITER                 = ',',    # Delimiter in CSV file
 
+# Use compiled kernels for sequential analyses (requires numba)
+USE_NUMBA                 = True,   # Falls back to NumPy if numba is not installed
+
 # Spatial resolution
 PIXEL2MM                  = False,  # If True, pixel coords are converted to mm or mm^2
 PIXEL_PER_MM              = 150,    # Adjust this according to your setup
@@ -45,6 +48,11 @@ CUT_TABLE_TAIL            = False,
 # Remove objects (columns) without any values
 REMOVE_NANS               = True, # Not doing this is actually a bad idea!
 
+# Stitch fragmented tracks (lost and re-acquired objects) before clean-up
+STITCH_TRACKS             = False,
+STITCH_MAX_GAP            = 10,   # Max untracked frames between end of one and start of the next fragment
+STITCH_MAX_DISTANCE       = 20,   # Max distance between end of one and start of the next fragment. Has to be in mm if `PIXEL2MM` is True, else in pixel.
+
 # Remove objects (columns) with less N tracked frames
 MIN_TRACK_LENGTH          = 600,  # Minimum track length in frames
 
@@ -58,6 +66,10 @@ THRESHOLDED_PARAMS        = ['left_bended',
                              'is_coiled',
                              'is_well_oriented'],
 
+# Memory budget (in bytes, e.g. 8e9) for Experiments and Collections. None = no budget.
+MEMORY_BUDGET             = None,
+MEMORY_BUDGET_ACTIONS     = ['downcast', 'drop_raw', 'spill'], # Actions taken (in order) once the budget is exceeded. "spill" writes least recently used experiments of a Collection to disk.
+
 # Parameters for head bending
 BENDING_ANGLE_THRESHOLD   = 45, # Minimum angle to be counted as bend
 MIN_BENDED_PHASE          = 4,  # Minimum consecutive frames spend bent
@@ -87,4 +99,13 @@ TC_SMOOTHING_WINDOW       = 30,      # Rolling window (in frames) over which to
 TC_CUT_HEAD               = 0.75,    # Set to ignore the first X frames for PI calculation. Can be fraction (e.g. 0.75) of total frames.
 TC_CUT_TAIL               = False,   # Set to ignore the last X frames for PI calculation. Can be fraction (e.g. 0.75) of total frames.
 
+# Parameters for occupancy heatmaps
+HEATMAP_BINS              = 100,     # Number of bins along x and y
+HEATMAP_CHUNK_SIZE        = 1000,    # Number of frames binned at a time
+
+# Parameters for contact detection between objects
+CONTACT_DISTANCE          = 10,      # Max distance between body points of two objects to count as contact. Has to be in mm if `PIXEL2MM` is True, else in pixel.
+CONTACT_PADDING           = 5,       # Number of frames before/after a contact to flag as well
+MASK_CONTACTS             = False,   # If True, frames with contacts are set to NaN during clean-up
+
 )
\ No newline at end of file
@@ -0,0 +1,312 @@
+#    This code is part of pyFIM (http://www.github.com/schlegelp/pyfim), a
+#    package to analyze FIMTrack data (fim.uni-muenster.de). For full
+#    acknowledgments and references, please see the GitHub repository.
+#
+#    Copyright (C) 2018 Philipp Schlegel
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+""" Detection of contacts between objects (e.g. colliding larvae).
+
+Body points (head, spinepoints 1-3, tail) of all objects are hashed into a
+grid with cells of size `CONTACT_DISTANCE`. Points closer than that are
+always in the same or in adjacent cells, so only those are compared instead
+of all pairs of objects.
+"""
+
+import numpy as np
+import pandas as pd
+
+from pyfim import core, config
+defaults = config.default_parameters
+
+__all__ = ['find_contacts', 'contact_events', 'contact_mask', 'mask_contacts']
+
+# Body points used for contact detection
+CONTACT_POINTS = ['head', 'spinepoint_1', 'spinepoint_2', 'spinepoint_3', 'tail']
+
+# Neighbouring cells to compare: each pair of cells is visited only once
+_NEIGHBOURS = [ (0, 0), (1, 0), (-1, 1), (0, 1), (1, 1) ]
+
+
+def _body_points(exp):
+    """ Collects available body points.
+
+    Returns
+    -------
+    points :    np.ndarray
+                (frames, objects, points, 2)
+    index :     pandas.Index
+                Frames.
+    columns :   pandas.Index
+                Objects.
+
+    """
+    if not isinstance(exp, core.Experiment):
+        raise TypeError('Need pyfim.Experiment, not {0}'.format(type(exp)))
+
+    available = [ p for p in CONTACT_POINTS if p + '_x' in exp.parameters and p + '_y' in exp.parameters ]
+
+    # Fall back to the center of mass
+    if not available and 'mom_x' in exp.parameters and 'mom_y' in exp.parameters:
+        available = [ 'mom' ]
+
+    if not available:
+        raise ValueError('Need x/y coordinates of at least one body point')
+
+    ref = getattr(exp, available[0] + '_x')
+    index, columns = ref.index, ref.columns
+
+    points = np.empty( ( len(index), len(columns), len(available), 2 ) )
+    for i, p in enumerate( available ):
+        points[ :, :, i, 0 ] = getattr(exp, p + '_x').reindex( index=index, columns=columns ).values
+        points[ :, :, i, 1 ] = getattr(exp, p + '_y').reindex( index=index, columns=columns ).values
+
+    return points, index, columns
+
+
+def _close_pairs(frame, obj, xy, distance):
+    """ Finds pairs of points of different objects in the same frame that
+    are at most `distance` apart using grid hashing.
+
+    Returns
+    -------
+    i, j :      np.ndarray
+                Indices of the points in each pair.
+    dist :      np.ndarray
+                Distance between them.
+
+    """
+    cells = np.floor( xy / distance ).astype(np.int64)
+
+    # Make cell coordinates positive (incl. a margin for the neighbours)
+    cells -= cells.min( axis=0 ) - 1
+    n_x, n_y = cells.max( axis=0 ) + 2
+
+    def cell_key(dx, dy):
+        return ( frame * n_y + cells[:, 1] + dy ) * n_x + cells[:, 0] + dx
+
+    order = np.argsort( cell_key(0, 0), kind='stable' )
+    sorted_keys = cell_key(0, 0)[ order ]
+
+    pairs_i, pairs_j = [], []
+    for dx, dy in _NEIGHBOURS:
+        key = cell_key(dx, dy)
+        lo = np.searchsorted( sorted_keys, key, side='left' )
+        n = np.searchsorted( sorted_keys, key, side='right' ) - lo
+
+        # Expand each point into its candidates in the neighbouring cell
+        i = np.repeat( np.arange( len(key) ), n )
+        j = order[ np.repeat( lo - np.cumsum(n) + n, n ) + np.arange( n.sum() ) ]
+
+        keep = obj[i] != obj[j]
+        if ( dx, dy ) == ( 0, 0 ):
+            keep &= i < j
+
+        pairs_i.append( i[ keep ] )
+        pairs_j.append( j[ keep ] )
+
+    i, j = np.concatenate( pairs_i ), np.concatenate( pairs_j )
+    dist = np.linalg.norm( xy[i] - xy[j], axis=1 )
+    close = dist <= distance
+
+    return i[ close ], j[ close ], dist[ close ]
+
+
+def _find_pairs(exp, distance=None):
+    """ Finds pairs of objects in contact.
+
+    Returns
+    -------
+    pairs :     pandas.DataFrame
+                Positions of `frame`, object `a` and object `b` plus
+                `distance`. One row per frame and pair of objects.
+    index :     pandas.Index
+                Frames.
+    columns :   pandas.Index
+                Objects.
+
+    """
+    if isinstance(distance, type(None)):
+        distance = defaults['CONTACT_DISTANCE']
+
+    if distance <= 0:
+        raise ValueError('Contact distance must be > 0')
+
+    points, index, columns = _body_points( exp )
+    n_frames, n_objects, n_points = points.shape[:3]
+
+    # Flatten valid points
+    xy = points.reshape( -1, 2 )
+    valid = ~np.isnan( xy ).any( axis=1 )
+    flat = np.flatnonzero( valid )
+    frame = flat // ( n_objects * n_points )
+    obj = ( flat // n_points ) % n_objects
+    xy = xy[ valid ]
+
+    if xy.shape[0]:
+        i, j, dist = _close_pairs( frame, obj, xy, distance )
+    else:
+        i = j = np.zeros( 0, dtype=int )
+        dist = np.zeros( 0 )
+
+    # Reduce to one row per frame and pair of objects
+    pairs = pd.DataFrame( dict( frame=frame[i],
+                                a=np.minimum( obj[i], obj[j] ),
+                                b=np.maximum( obj[i], obj[j] ),
+                                distance=dist ) )
+    pairs = pairs.groupby( [ 'frame', 'a', 'b' ], sort=True ).distance.min().reset_index()
+
+    return pairs, index, columns
+
+
+def find_contacts(exp, distance=None):
+    """ Finds frames in which objects come close to each other.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+    distance :  int | float, optional
+                Maximum distance between any two body points (head,
+                spinepoints, tail) of two objects to count as contact.
+                Defaults to ``pyfim.defaults['CONTACT_DISTANCE']``.
+
+    Returns
+    -------
+    pandas.DataFrame
+                One row per frame and pair of objects in contact::
+
+                    frame  object_a  object_b  distance
+                 0     12  object_1  object_4      3.2
+                 ...
+
+                `distance` is the smallest distance between body points.
+
+    """
+    pairs, index, columns = _find_pairs( exp, distance=distance )
+
+    return pd.DataFrame( dict( frame=index[ pairs.frame.values ],
+                               object_a=columns[ pairs.a.values ],
+                               object_b=columns[ pairs.b.values ],
+                               distance=pairs.distance.values ) )
+
+
+def contact_events(exp, distance=None):
+    """ Finds contact events, i.e. stretches of consecutive frames in which
+    the same two objects are in contact.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+    distance :  int | float, optional
+                See :func:`~pyfim.contacts.find_contacts`.
+
+    Returns
+    -------
+    pandas.DataFrame
+                One row per event with columns `object_a`, `object_b`,
+                `start`, `end` (first and last frame) and `min_distance`.
+
+    """
+    contacts = find_contacts( exp, distance=distance )
+
+    if contacts.empty:
+        return pd.DataFrame( columns=['object_a', 'object_b', 'start', 'end', 'min_distance'] )
+
+    contacts = contacts.sort_values( [ 'object_a', 'object_b', 'frame' ] ).reset_index(drop=True)
+
+    frames = contacts.frame.values
+    same_pair = ( contacts.object_a.values[1:] == contacts.object_a.values[:-1] ) & \
+                ( contacts.object_b.values[1:] == contacts.object_b.values[:-1] )
+    new_event = np.concatenate( [ [ True ], ~same_pair | ( np.diff( frames ) != 1 ) ] )
+
+    starts = np.flatnonzero( new_event )
+    ends = np.concatenate( [ starts[1:], [ len(frames) ] ] ) - 1
+
+    return pd.DataFrame( dict( object_a=contacts.object_a.values[ starts ],
+                               object_b=contacts.object_b.values[ starts ],
+                               start=frames[ starts ],
+                               end=frames[ ends ],
+                               min_distance=np.minimum.reduceat( contacts.distance.values, starts ) ) )
+
+
+def contact_mask(exp, distance=None, padding=None):
+    """ Flags frames in which objects are in contact.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+    distance :  int | float, optional
+                See :func:`~pyfim.contacts.find_contacts`.
+    padding :   int, optional
+                Number of frames before and after each contact to flag as
+                well. Defaults to ``pyfim.defaults['CONTACT_PADDING']``.
+
+    Returns
+    -------
+    pandas.DataFrame
+                Boolean frames x objects. True = in contact.
+
+    """
+    if isinstance(padding, type(None)):
+        padding = defaults['CONTACT_PADDING']
+
+    pairs, index, columns = _find_pairs( exp, distance=distance )
+
+    mask = np.zeros( ( len(index), len(columns) ), dtype=bool )
+    mask[ pairs.frame.values, pairs.a.values ] = True
+    mask[ pairs.frame.values, pairs.b.values ] = True
+
+    # Extend flags by `padding` frames in either direction
+    if padding:
+        counts = np.cumsum( np.vstack( [ np.zeros( ( 1, mask.shape[1] ), dtype=int ), mask ] ), axis=0 )
+        lo = np.clip( np.arange( mask.shape[0] ) - padding, 0, mask.shape[0] )
+        hi = np.clip( np.arange( mask.shape[0] ) + padding + 1, 0, mask.shape[0] )
+        mask = ( counts[ hi ] - counts[ lo ] ) > 0
+
+    return pd.DataFrame( mask, index=index, columns=columns )
+
+
+def mask_contacts(exp, distance=None, padding=None, parameters=None):
+    """ Sets frames in which objects are in contact to NaN. Analyses run
+    afterwards (see :func:`pyfim.Experiment.run_analyses`) will ignore
+    these frames.
+
+    Parameters
+    ----------
+    exp :           pyfim.Experiment
+    distance :      int | float, optional
+                    See :func:`~pyfim.contacts.find_contacts`.
+    padding :       int, optional
+                    See :func:`~pyfim.contacts.contact_mask`.
+    parameters :    list of str, optional
+                    Parameters to mask. If None, will mask all original
+                    (FIMTrack) parameters.
+
+    Returns
+    -------
+    pandas.DataFrame
+                    The mask that was applied (frames x objects).
+
+    """
+    mask = contact_mask( exp, distance=distance, padding=padding )
+
+    if isinstance(parameters, type(None)):
+        parameters = exp._original_params
+
+    for p in parameters:
+        values = getattr(exp, p)
+        m = mask.reindex( index=values.index, columns=values.columns, fill_value=False )
+        setattr( exp, p, values.mask( m.values ) )
+
+    core.module_logger.info('Masked {0} frames with contacts'.format( int( mask.values.sum() ) ))
+
+    return mask
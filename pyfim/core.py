@@ -15,8 +15,17 @@
 #    GNU General Public License for more details.
 
 
+import collections
 import os
-from io import IOBase
+import pickle
+import queue
+import shutil
+import tempfile
+import threading
+import warnings
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO, IOBase, StringIO, TextIOBase, TextIOWrapper
 
 import pandas as pd
 import numpy as np
@@ -26,6 +35,11 @@ import re
 # Load analysis scripts
 from pyfim import analysis as fim_analysis
 from pyfim import plot as fim_plot
+from pyfim import heatmap as fim_heatmap
+from pyfim import contacts as fim_contacts
+from pyfim import stitching as fim_stitching
+from pyfim import io as fim_io
+from pyfim import kernels
 from pyfim import utils
 
 # Load default values
@@ -82,12 +96,44 @@ class Collection:
 
     """
 
-    def __init__(self):
+    def __init__(self, memory_budget=None, spill_dir=None):
         self.experiments = []
-        pass
 
+        # Memory budget in bytes -> see `enforce_budget()`
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
 
-    def add_data(self, x, label=None, keep_raw=False):
+        # Experiments in order of last use (least recently used first)
+        self._last_used = collections.OrderedDict()
+
+        # Experiments spilled to disk: {label: dict(path, summary, means, ...)}
+        self._spilled = {}
+
+
+    def __getattr__(self, name):
+        # Only called if attribute was not found -> load spilled experiments
+        if name in self.__dict__.get('_spilled', {}):
+            return self._unspill(name)
+        raise AttributeError("'{0}' object has no attribute '{1}'".format(type(self).__name__, name))
+
+
+    def _get(self, label):
+        """ Returns experiment and marks it as most recently used. Spilled
+        experiments are loaded back into memory.
+        """
+        if label in self._spilled:
+            return self._unspill(label)
+
+        if label not in self.experiments:
+            raise ValueError('No experiment "{0}" in this collection'.format(label))
+
+        self._last_used[label] = True
+        self._last_used.move_to_end(label)
+
+        return self.__dict__[label]
+
+
+    def add_data(self, x, label=None, keep_raw=False, parameters=None):
         """ Add data (e.g. a genotype) to this analysis.
 
         Parameters
@@ -106,6 +152,9 @@ class Collection:
         keep_raw :  bool, optional
                     If False, will discard raw data after extraction to save
                     memory. Only relevant if x is not an pyfim.Experiment.
+        parameters : list of str, optional
+                     If provided, will only load these FIMTrack parameters.
+                     Only relevant if x is not an pyfim.Experiment.
 
         Returns
         -------
@@ -115,17 +164,22 @@ class Collection:
         if not label:
            label = 'exp_{0}'.format( len( self.experiments ) + 1 )
 
+        # Memory budget is enforced for the collection as a whole (see below)
         if not isinstance( x, Experiment ):
-            exp = Experiment(x, keep_raw=keep_raw)
+            exp = Experiment(x, keep_raw=keep_raw, parameters=parameters, check_budget=False)
         else:
             exp = x
 
         setattr(self, label, exp )
 
         self.experiments.append(label)
+        self._last_used[label] = True
+        self._last_used.move_to_end(label)
 
         self.extract_data()
 
+        self.enforce_budget()
+
 
     def summary(self):
         """ Gives a summary of the data in this analysis.
@@ -133,7 +187,8 @@ class Collection:
 
         to_summarize = ['n_objects','n_frames']
 
-        return pd.DataFrame( [ [exp] + [ getattr( getattr(self, exp), p ) for p in to_summarize ] for exp in self.experiments ],
+        # Spilled experiments are summarized without loading them
+        return pd.DataFrame( [ [exp] + [ self._spilled[exp][p] if exp in self._spilled else getattr( getattr(self, exp), p ) for p in to_summarize ] for exp in self.experiments ],
                              columns=['name']+to_summarize )
 
 
@@ -150,7 +205,7 @@ class Collection:
     @property
     def parameters(self):
         """Returns parameters that all experiments have in common."""
-        all_params = [ set( getattr(self, exp).parameters )
+        all_params = [ set( self._spilled[exp]['parameters'] if exp in self._spilled else getattr(self, exp).parameters )
                                 for exp in self.experiments ]
         if all_params:
             return np.array( list(all_params[0].union(*all_params) ) )
@@ -158,6 +213,95 @@ class Collection:
             return []
 
 
+    def aggregate(self, **kwargs):
+        """ Computes summary statistics for every experiment x parameter x
+        object. See :func:`~pyfim.Experiment.aggregate` for parameters.
+
+        Returns
+        -------
+        pandas.DataFrame
+                    Tidy table with one row per (experiment, parameter,
+                    object) and one column per statistic.
+
+        """
+        return pd.concat( [ self._get(e).aggregate( **kwargs ) for e in self.experiments ],
+                          keys=self.experiments,
+                          names=['experiment'] )
+
+
+    def run_analyses(self, analyses=None):
+        """ (Re-)runs analyses for all experiments in this collection. Objects
+        of all experiments are stacked so that each analysis is run only once.
+        See :func:`~pyfim.core.run_stacked`.
+
+        Parameters
+        ----------
+        analyses :  list of str, optional
+                    Names of functions in :mod:`pyfim.analysis`. If None,
+                    will run all analyses in ``pyfim.analysis.__all__``.
+
+        """
+        if isinstance(analyses, type(None)):
+            analyses = fim_analysis.__all__
+
+        if self._spilled:
+            # Stacking would load all experiments at once -> one at a time
+            # (experiments spilled in the process keep their updated means)
+            for e in self.experiments:
+                self._get(e).run_analyses( analyses )
+        else:
+            run_stacked( [ self._get(e) for e in self.experiments ], analyses )
+
+        self.extract_data()
+
+
+    def heatmap(self, extent=None, bins=None, x='mom_x', y='mom_y', combine=False):
+        """ Generates 2D occupancy heatmaps. Experiments are binned one at a
+        time into the same grid.
+
+        Parameters
+        ----------
+        extent :    (x_min, x_max, y_min, y_max), optional
+                    Area covered by the grid. If None, will use the range of
+                    positions across all experiments.
+        bins :      int | (int, int), optional
+                    Number of bins along x and y. Defaults to
+                    ``pyfim.defaults['HEATMAP_BINS']``.
+        x, y :      str, optional
+                    Parameters with x and y coordinates.
+        combine :   bool, optional
+                    If True, will return a single heatmap for all experiments.
+
+        Returns
+        -------
+        dict
+                    {label: pyfim.heatmap.Heatmap}
+        pyfim.heatmap.Heatmap
+                    If ``combine=True``.
+
+        Examples
+        --------
+        >>> hms = coll.heatmap( bins=50 )
+        >>> ax = hms['Genotype I'].plot()
+
+        """
+        # Experiments are fetched one at a time -> spilled experiments are
+        # not all loaded at once
+        if isinstance(extent, type(None)):
+            extents = np.array( [ fim_heatmap.data_extent( self._get(e), x=x, y=y ) for e in self.experiments ] )
+            extent = ( extents[:, 0].min(), extents[:, 1].max(),
+                       extents[:, 2].min(), extents[:, 3].max() )
+
+        if combine:
+            hm = fim_heatmap.Heatmap( extent, bins )
+            for e in self.experiments:
+                hm.add_experiment( self._get(e), x=x, y=y )
+            return hm
+
+        return { e: fim_heatmap.Heatmap( extent, bins ).add_experiment( self._get(e), x=x, y=y )
+                 for e in self.experiments }
+
+
     def extract_data(self):
         """ Get the mean over all parameters.
         """
@@ -166,18 +310,167 @@ class Collection:
         for param in self.parameters:
             data = [ ]
             for e in self.experiments:
+                # Spilled experiments keep their means
+                if e in self._spilled:
+                    data.append( self._spilled[e]['means'][param] )
+                    continue
                 # Collect data
-                exp = getattr(self, e)
-                values = getattr( exp, param )
-                if values.ndim == 1:
-                    means = values.values
-                else:
-                    means = values.mean().values
-                data.append( means )
+                data.append( _param_means( self._get(e), param ) )
             df = pd.DataFrame( data, index= self.experiments ).T
             setattr(self, param, df)
 
 
+    def memory_usage(self, detailed=False):
+        """ Returns memory used by the experiments in this collection.
+
+        Parameters
+        ----------
+        detailed :  bool, optional
+                    If True, will return memory per experiment and attribute
+                    (see :func:`~pyfim.Experiment.memory_usage`).
+
+        Returns
+        -------
+        pandas.DataFrame
+                    Bytes per experiment (rows) and kind of data (columns).
+                    Experiments spilled to disk use no memory.
+
+        """
+        in_memory = [ e for e in self.experiments if e not in self._spilled ]
+
+        if detailed:
+            return pd.concat( [ self.__dict__[e].memory_usage() for e in in_memory ],
+                              keys=in_memory,
+                              names=['experiment'] )
+
+        kinds = ['parameter', 'analysis', 'raw', 'cache']
+        mem = pd.DataFrame( 0, index=self.experiments, columns=kinds, dtype=np.int64 )
+        for e in in_memory:
+            by_kind = self.__dict__[e].memory_usage().groupby('kind').bytes.sum()
+            mem.loc[ e, by_kind.index ] = by_kind.values
+        mem['total'] = mem[ kinds ].sum( axis=1 )
+        mem['spilled'] = [ e in self._spilled for e in self.experiments ]
+
+        return mem
+
+
+    def enforce_budget(self, budget=None, actions=None, keep=None):
+        """ Reduces memory footprint until it fits into the given budget.
+
+        Parameters
+        ----------
+        budget :    int, optional
+                    Memory budget in bytes. Defaults to `memory_budget` of
+                    this collection or ``pyfim.defaults['MEMORY_BUDGET']``.
+                    If None, does nothing.
+        actions :   list of str, optional
+                    Actions to take (in order) until the budget is met:
+                        - "downcast": downcast data to float32
+                        - "drop_raw": discard raw data
+                        - "spill": write least recently used experiments to
+                          disk; they are loaded back on next access
+                    Defaults to ``pyfim.defaults['MEMORY_BUDGET_ACTIONS']``.
+        keep :      str, optional
+                    Label of an experiment that must not be spilled. Defaults
+                    to the most recently used experiment.
+
+        Returns
+        -------
+        bool
+                    True if memory usage is within budget.
+
+        """
+        if isinstance(budget, type(None)):
+            budget = self.memory_budget
+        if isinstance(budget, type(None)):
+            budget = defaults['MEMORY_BUDGET']
+        if isinstance(budget, type(None)):
+            return True
+
+        if isinstance(actions, type(None)):
+            actions = defaults['MEMORY_BUDGET_ACTIONS']
+
+        if isinstance(keep, type(None)) and self._last_used:
+            keep = next( reversed( self._last_used ) )
+
+        usage = self.memory_usage().total
+        used = usage.sum()
+
+        for action in actions:
+            if used <= budget:
+                return True
+
+            # Least recently used experiments first
+            for e in list( self._last_used ):
+                if action == 'spill':
+                    if e == keep:
+                        continue
+                    self._spill(e)
+                elif action == 'downcast':
+                    self.__dict__[e].downcast()
+                elif action == 'drop_raw' and 'raw_data' in self.__dict__[e].__dict__:
+                    del self.__dict__[e].raw_data
+
+                # Update running total
+                new = 0 if e in self._spilled else self.__dict__[e].memory_usage().bytes.sum()
+                used += new - usage[e]
+                usage[e] = new
+
+                if used <= budget:
+                    return True
+
+        if used > budget:
+            module_logger.warning('Collection uses {0:.1f} MB - exceeds memory '
+                                  'budget of {1:.1f} MB'.format( used / 1e6, budget / 1e6 ))
+            return False
+
+        return True
+
+
+    def _spill(self, label):
+        """ Writes experiment to disk and removes it from memory. """
+        exp = self.__dict__[label]
+
+        if isinstance(self.spill_dir, type(None)):
+            self.spill_dir = tempfile.mkdtemp( prefix='pyfim_spill_' )
+            # Clean up when the collection is gone
+            weakref.finalize( self, shutil.rmtree, self.spill_dir, True )
+        os.makedirs( self.spill_dir, exist_ok=True )
+
+        path = os.path.join( self.spill_dir, '{0}_{1}.pkl'.format( label, id(exp) ) )
+        with open(path, 'wb') as f:
+            pickle.dump( exp, f, protocol=pickle.HIGHEST_PROTOCOL )
+
+        # Keep what the collection needs without loading the experiment
+        self._spilled[label] = dict( path=path,
+                                     parameters=list( exp.parameters ),
+                                     n_objects=exp.n_objects,
+                                     n_frames=exp.n_frames,
+                                     means={ p: _param_means( exp, p ) for p in exp.parameters } )
+
+        del self.__dict__[label]
+        self._last_used.pop( label, None )
+
+        module_logger.info('Spilled experiment "{0}" to {1}'.format( label, path ))
+
+
+    def _unspill(self, label):
+        """ Loads spilled experiment back into memory. """
+        record = self._spilled.pop( label )
+
+        with open(record['path'], 'rb') as f:
+            exp = pickle.load(f)
+        os.remove( record['path'] )
+
+        self.__dict__[label] = exp
+        self._last_used[label] = True
+
+        # Make room for the experiment we just loaded
+        self.enforce_budget( keep=label )
+
+        return exp
+
+
     def plot(self, param=None, **kwargs):
         """ Plots a set of parameters from this pyFIM Collection.
 
@@ -219,6 +512,17 @@ class Experiment:
     include_subfolders : bool, optional
                          If True and folder is provided, will also search
                          subfolders for .csv files.
+    parameters : list of str, optional
+                 If provided, will only load these FIMTrack parameters (e.g.
+                 ``['mom_x', 'mom_y', 'go_phase']``). Row blocks of all other
+                 parameters are skipped while reading the file which saves
+                 time and memory. Additional analyses that depend on
+                 parameters that were not loaded are skipped.
+    check_budget : bool, optional
+                   If True, will enforce ``pyfim.defaults['MEMORY_BUDGET']``
+                   after loading (see :func:`~pyfim.Experiment.enforce_budget`).
+                   Collections set this to False and enforce their own
+                   budget instead.
 
     Examples
     --------
@@ -241,10 +545,19 @@ class Experiment:
     >>> plt.show()
     >>> # Get mean of all values
     >>> exp.mean()
+    >>> # Load only centroid and go phase
+    >>> exp = pyfim.Experiment( folder, parameters=['mom_x', 'mom_y', 'go_phase'] )
 
     """
 
-    def __init__(self, f, keep_raw=False, include_subfolders=False):
+    def __init__(self, f, keep_raw=False, include_subfolders=False, parameters=None, check_budget=True):
+        # Remember where data came from -> used by `update()`
+        self._source = f
+        self._include_subfolders = include_subfolders
+        self._load_params = parameters
+        self._files = []
+        self._n_raw_objects = 0
+
         # Make sure we have files or filenames
         if f:
             f = _parse_files(f, include_subfolders)
@@ -255,13 +568,33 @@ class Experiment:
             # This is for when we want to initialise an empty experiment
             self.parameters = []
             self._original_params = []
+            self.units = {}
             return
 
         # Get the data from each individual file
-        data = [ pd.read_csv(fn, sep=defaults['DELIMITER'], index_col=0) for fn in tqdm(f, desc='Reading files', leave=False) ]
+        data = [ _read_csv(fn, parameters) for fn in tqdm(f, desc='Reading files', leave=False) ]
 
         # Merge - make sure the indices match up
+        self._merge_raw( data )
+
+        self._files = list( f )
+        self._n_raw_objects = self.raw_data.shape[1]
+
+        self.extract_data()
+
+        if not keep_raw:
+            del self.raw_data
+
+        if check_budget:
+            self.enforce_budget()
+
+    def _merge_raw(self, data, offset=0, renumber=True, converted=False):
+        """ Merges raw data from individual files into `raw_data`. Objects
+        (columns) are renumbered starting with `offset`. `converted` flags
+        raw data already converted to mm (see `_convert_units`).
+        """
         self.raw_data = pd.concat( data, axis=1, ignore_index=False, join='outer' )
+        self._raw_converted = converted
 
         # join='outer' makes sure that if we have an uneven number of frames,
         # they will be aligned and empty frames will be filled with NaN
@@ -269,12 +602,75 @@ class Experiment:
         fixed_ix = sorted( self.raw_data.index, key = lambda x : self._index_sorter ( x ) )
         self.raw_data = self.raw_data.loc[fixed_ix]
 
-        self.raw_data.columns = [ 'object_{0}'.format(i) for i in range( self.raw_data.shape[1] ) ]
+        if renumber:
+            self.raw_data.columns = [ 'object_{0}'.format(i + offset) for i in range( self.raw_data.shape[1] ) ]
 
-        self.extract_data()
+            # Remember which file each object came from -> objects from
+            # different recordings must not be stitched together
+            self._recording = pd.Series( np.repeat( np.arange( len(data) ), [ d.shape[1] for d in data ] ),
+                                         index=self.raw_data.columns )
 
-        if not keep_raw:
-            del self.raw_data
+    def update(self, f=None):
+        """ Adds data from new files to this experiment. Only files that
+        have not been ingested before are read. Clean-up and analyses are run
+        on the new objects only and the results are appended.
+
+        Parameters
+        ----------
+        f :     {filename, folder, file object, list thereof}, optional
+                Where to look for new files. If None, will search the
+                original input (e.g. the folder) of this Experiment again.
+
+        Returns
+        -------
+        list
+                Files that were added.
+
+        Examples
+        --------
+        >>> exp = pyfim.Experiment('users/data/today')
+        >>> # ... new CSV files arrive in the folder
+        >>> exp.update()
+
+        """
+        if isinstance(f, type(None)):
+            if not self._source:
+                raise ValueError('Experiment was not initialised from files - '
+                                 'please provide files.')
+            f = self._source
+
+        files = _parse_files(f, self._include_subfolders)
+
+        # Keep only files we haven't seen before
+        seen = set( os.path.abspath(fn) for fn in self._files if isinstance(fn, str) )
+        new_files = [ fn for fn in files if
+                      ( isinstance(fn, str) and os.path.abspath(fn) not in seen ) or
+                      ( not isinstance(fn, str) and not any( fn is s for s in self._files ) ) ]
+
+        if not new_files:
+            module_logger.info('No new files found.')
+            return []
+
+        # Read, clean and analyse only the new data
+        data = [ _read_csv(fn, self._load_params) for fn in tqdm(new_files, desc='Reading files', leave=False) ]
+
+        new = Experiment(None)
+        new._merge_raw( data, offset=self._n_raw_objects )
+        new.extract_data()
+
+        # Append new objects to existing parameters
+        _combine( self, [ self, new ] )
+
+        if isinstance( getattr(self, 'raw_data', None), pd.DataFrame ):
+            self._merge_raw( [ self.raw_data, new.raw_data ], renumber=False,
+                             converted=new._raw_converted )
+
+        self._files += new_files
+        self._n_raw_objects += new.raw_data.shape[1]
+
+        module_logger.info('Added {0} objects from {1} new file(s)'.format( new.n_objects, len(new_files) ))
+
+        return new_files
 
     def _index_sorter( self, x):
         """ Helper function to fix pandas indices. After merging frames are
@@ -297,7 +693,24 @@ class Experiment:
 
 
     def extract_data(self):
-        """ Extracts parameters from .csv file.
+        """ Extracts parameters from .csv file, cleans up the data and runs
+        analyses.
+        """
+        self._extract_parameters()
+
+        # Merge fragments of the same object before short tracks are dropped
+        if defaults['STITCH_TRACKS']:
+            fim_stitching.stitch_tracks( self )
+
+        # Perform data clean up
+        self.clean_data()
+
+        # Perform additional, "higher-level" analyses
+        self.run_analyses( fim_analysis.__all__ )
+
+
+    def _extract_parameters(self):
+        """ Extracts parameters from raw data (incl. unit conversion).
         """
 
         if isinstance( getattr(self, 'raw_data', None) , type(None) ):
@@ -306,9 +719,15 @@ class Experiment:
         # Find all parameters
         self.parameters = sorted (set( [ p[ : p.index('(') ] for p in self.raw_data.index ] ) )
 
+        if not self.parameters:
+            raise ValueError('No parameters found in raw data.')
+
         # Keep track of original parameters (make sure to use a copy)
         self._original_params = list( self.parameters )
 
+        # Convert pixel to mm/mm^2 before anything else sees the data
+        self._convert_units()
+
         # Go over all parameters
         for p in tqdm( self.parameters, desc='Extracting data', leave=False ):
             # Extract values
@@ -320,30 +739,160 @@ class Experiment:
             # Add data as attribute
             setattr(self, p, values )
 
-        # Perform data clean up
-        self.clean_data()
 
-        # Perform additional, "higher-level" analyses
-        for param in tqdm(fim_analysis.__all__, desc='Performing additional analyses', leave=False):
+    def _convert_units(self):
+        """ Converts spatial parameters in `raw_data` from pixel to mm (and
+        mm^2 for area parameters) if `PIXEL2MM` is True. Scaling is done in
+        a single in-place pass over the raw data. Converted raw data is
+        flagged so that repeated extractions do not scale it twice. Units are
+        recorded in `units`.
+        """
+        spatial, area = defaults['SPATIAL_PARAMS'], defaults['AREA_PARAMS']
+        converted = getattr(self, '_raw_converted', False)
+        convert = defaults['PIXEL2MM'] and not converted
+
+        # Units describe the data - raw data converted earlier stays in mm
+        in_mm = defaults['PIXEL2MM'] or converted
+        self.units = { p: ( 'mm' if in_mm else 'px' ) for p in self._original_params if p in spatial }
+        self.units.update( { p: ( 'mm^2' if in_mm else 'px^2' ) for p in self._original_params if p in area } )
+
+        if not convert:
+            return
+
+        # Scale factor for each row of the raw data
+        row_params = np.array( [ i[ : i.index('(') ] for i in self.raw_data.index ] )
+        scale = np.ones( row_params.shape[0] )
+        scale[ np.isin( row_params, spatial ) ] = 1 / defaults['PIXEL_PER_MM']
+        scale[ np.isin( row_params, area ) ] = 1 / defaults['PIXEL_PER_MM'] ** 2
+
+        # No copy if data is already a single float block (e.g. one file)
+        values = self.raw_data.to_numpy( dtype=np.float64 )
+        np.multiply( values, scale[:, None], out=values )
+
+        self.raw_data = pd.DataFrame( values, index=self.raw_data.index,
+                                      columns=self.raw_data.columns, copy=False )
+        self._raw_converted = True
+
+
+    def run_analyses(self, analyses, desc='Performing additional analyses'):
+        """ Runs given analyses and adds results as parameters. Analyses
+        that require parameters which are not available (e.g. because only a
+        subset of parameters was loaded) are skipped.
+
+        Parameters
+        ----------
+        analyses :  list of str
+                    Names of functions in :mod:`pyfim.analysis`.
+        desc :      str, optional
+                    Description for the progress bar.
+
+        """
+        skipped = []
+        for param in tqdm(analyses, desc=desc, leave=False):
+            missing = [ r for r in fim_analysis.required_parameters( param ) if r not in self._original_params ]
+            if missing:
+                skipped.append( param )
+                continue
+
             func = getattr( fim_analysis, param )
             setattr(self, param, func( self ) )
-            self.parameters.append( param )
+            if param not in self.parameters:
+                self.parameters.append( param )
+
+        if skipped:
+            module_logger.info('Skipped analyses due to missing parameters: {0}'.format( ', '.join(skipped) ))
 
         self.parameters = sorted( self.parameters )
 
 
+    def __setattr__(self, name, value):
+        # Setting any (public) attribute might change the objects or events
+        # -> drop caches. Note that in-place changes to a DataFrame (e.g.
+        # ``exp.mom_x.iloc[0] = 0``) are not noticed -> see `clear_cache()`
+        if not name.startswith('_'):
+            self.clear_cache()
+        super().__setattr__(name, value)
+
+
+    def clear_cache(self):
+        """ Drops cached objects and events. Caches are dropped
+        automatically whenever a parameter is (re-)assigned but not if a
+        DataFrame is modified in place.
+
+        Examples
+        --------
+        >>> exp.go_phase.iloc[:10] = 0
+        >>> exp.clear_cache()
+        >>> ev = exp.events
+        """
+        self.__dict__.pop('_objects', None)
+        self.__dict__.pop('_events', None)
+
+
+    def __getstate__(self):
+        # File objects (e.g. an open CSV) can not be pickled -> drop them.
+        # Only affects `update()` without explicit files.
+        state = dict( self.__dict__ )
+
+        if '_files' in state:
+            state['_files'] = [ f for f in state['_files'] if isinstance(f, str) ]
+
+        source = state.get('_source')
+        if isinstance(source, (list, tuple)):
+            state['_source'] = [ f for f in source if isinstance(f, str) ]
+        elif not isinstance(source, (str, type(None))):
+            state['_source'] = None
+
+        return state
+
+
     @property
     def objects(self):
         """ Returns the tracked objects in this experiment. Please note that
         the order is not as in the DataFrames.
+
+        Objects are cached - if you add or remove columns of a DataFrame in
+        place, call :func:`~pyfim.Experiment.clear_cache` afterwards.
         """
-        all_cols = []
-        for p in self.parameters:
-            values = getattr(self, p )
-            if isinstance(values, pd.DataFrame):
-                all_cols.extend( values.columns.values )
+        # Object index is cached until a parameter is changed
+        if '_objects' not in self.__dict__:
+            # Only FIMTrack parameters are guaranteed to have one column per
+            # object (unlike e.g. "PI_over_time")
+            params = self._original_params if self._original_params else self.parameters
+
+            all_cols = set()
+            for p in params:
+                values = getattr(self, p )
+                if isinstance(values, pd.DataFrame):
+                    all_cols.update( values.columns.values )
+
+            self._objects = sorted( all_cols )
+
+        return self._objects
+
 
-        return sorted( list( set(all_cols ) ) )
+    @property
+    def events(self):
+        """ Behavioral events (stops, head bends, pause-turns, peristaltic
+        waves) as structured array. Events are detected once on first access.
+        See :func:`pyfim.analysis.detect_events` for details.
+
+        Events are cached - if you modify a DataFrame in place, call
+        :func:`~pyfim.Experiment.clear_cache` afterwards.
+
+        Examples
+        --------
+        >>> ev = exp.events
+        >>> # All stops of the first object
+        >>> is_stop = ev['event'] == pyfim.analysis.EVENT_TYPES.index('stop')
+        >>> ev[ is_stop & ( ev['object'] == 0 ) ]
+        >>> # Object names
+        >>> np.array( exp.objects )[ ev['object'] ]
+        """
+        if '_events' not in self.__dict__:
+            self._events = fim_analysis.detect_events( self )
+
+        return self._events
 
 
     @property
@@ -351,7 +900,7 @@ class Experiment:
         """ Returns the number of objects tracked in this experiment.
         """
 
-        return getattr(self, self.parameters[0] ).shape[1]
+        return getattr(self, self._original_params[0] ).shape[1]
 
 
     @property
@@ -359,7 +908,7 @@ class Experiment:
         """ Returns the number of frames in this experiment.
         """
 
-        return getattr(self, self.parameters[0] ).shape[0]
+        return getattr(self, self._original_params[0] ).shape[0]
 
 
     def clean_data(self):
@@ -369,12 +918,20 @@ class Experiment:
         obj_before = self.n_objects
 
         # Get objects that have at an all NaN column in any parameter
-        has_all_nans = [ obj for obj in self.objects if 0 in self[obj].count().values ]
+        has_all_nans = set()
+        for p in self.parameters:
+            counts = getattr(self, p).count()
+            has_all_nans.update( counts.index[ counts.values == 0 ] )
+        has_all_nans = [ obj for obj in self.objects if obj in has_all_nans ]
 
         # Will use the "head_x" parameter to determine track length
         # -> some other parameters (e.g. "go_phase") vary in length
+        # If "head_x" has not been loaded, fall back to another coordinate
+        length_param = next( ( p for p in ['head_x', 'mom_x', 'spinepoint_2_x'] if p in self._original_params ),
+                             self._original_params[0] )
+        track_length = getattr(self, length_param).count()
         long_enough = [ obj for obj in self.objects if
-                        getattr(self, 'head_x')[obj].count() >= defaults['MIN_TRACK_LENGTH']
+                        track_length.get(obj, 0) >= defaults['MIN_TRACK_LENGTH']
                         and obj not in has_all_nans]
 
         # Iterate over parameters and clean-up if necessary
@@ -398,33 +955,41 @@ class Experiment:
             if defaults['CUT_TABLE_TAIL']:
                 values = values.iloc[ : defaults['CUT_TABLE_TAIL'] ]
 
-            # Convert to mm/mm^2
-            if defaults['PIXEL2MM']:
-                if p in defaults['SPATIAL_PARAMS']:
-                    values *= defaults['PIXEL_PER_MM']
-                elif p in defaults['AREA_PARAMS']:
-                    values = np.sqrt(values) * defaults['PIXEL_PER_MM']
-
-            # Interpolate gaps (i.e. a sub-threshold gap between two above
-            # threshold stretches) in thresholded parameters
-            if defaults['FILL_GAPS'] and p in defaults['THRESHOLDED_PARAMS']:
-                # Keep track of zeros
-                zeros = values == 0.0
-                # Set zeros to "NaN"
-                values[ values == 0.0 ] = np.nan
-                # Fill gaps with previous value ("forward fill")
-                values = values.fillna( method='ffill',
-                                        axis=0,
-                                        limit=defaults['MAX_GAP_SIZE'])
-                # Set zeros that stayed zeros back to zero
-                values[ (zeros) & ( values.isnull() ) ] = 0.0
-
             # Write values back
             setattr( self, p, values )
 
+        # Interpolate gaps (i.e. a sub-threshold gap between two above
+        # threshold stretches) in thresholded parameters
+        if defaults['FILL_GAPS']:
+            self._fill_gaps( [ p for p in self.parameters if p in defaults['THRESHOLDED_PARAMS'] ] )
+
+        # Remove frames in which objects touch each other
+        if defaults['MASK_CONTACTS']:
+            fim_contacts.mask_contacts( self )
+
         module_logger.info('Data clean-up dropped {0} objects and {1} frames'.format( obj_before-self.n_objects, frames_before-self.n_frames ))
 
 
+    def _fill_gaps(self, params):
+        """ Fills short OFF gaps bounded by ON frames in given thresholded
+        parameters. Parameters with the same number of frames are stacked
+        and processed in a single pass.
+        """
+        by_frames = {}
+        for p in params:
+            by_frames.setdefault( getattr(self, p).shape[0], [] ).append( p )
+
+        for group in by_frames.values():
+            tables = [ getattr(self, p) for p in group ]
+            stacked = np.concatenate( [ t.values for t in tables ], axis=1 ).astype(float)
+            stacked = kernels.fill_gaps( stacked, defaults['MAX_GAP_SIZE'] )
+
+            # Write back views into the stacked array
+            offsets = np.cumsum( [ 0 ] + [ t.shape[1] for t in tables ] )
+            for p, t, i, j in zip( group, tables, offsets[:-1], offsets[1:] ):
+                setattr( self, p, pd.DataFrame( stacked[:, i:j], index=t.index, columns=t.columns, copy=False ) )
+
+
     def __str__(self):
         return self.__repr__()
 
@@ -433,9 +998,14 @@ class Experiment:
         return '{0} with: {1} objects; {2} frames. Available parameters: {3}'.format(type(self), self.n_objects, self.n_frames, ', '.join(self.parameters) )
 
 
-    def analyze(self, p):
-        """ Returns analysis for given parameter.
+    def analyze(self, p=None):
+        """ Returns analysis for given parameter. If no parameter is given,
+        returns summary statistics for all parameters (see
+        :func:`~pyfim.Experiment.aggregate`).
         """
+        if isinstance(p, type(None)):
+            return self.aggregate()
+
         param = getattr(self, p)
 
         if isinstance(param, (pd.DataFrame, pd.Series) ):
@@ -444,25 +1014,121 @@ class Experiment:
             module_logger.warning('Unable to analyse parameter "{0}" of type "{1}"'.format(p, type(param)))
 
 
+    def aggregate(self, parameters=None, stats=None, quantiles=(.25, .75)):
+        """ Computes summary statistics for every parameter x object.
+
+        Statistics ignore NaNs and are computed in a single vectorized pass
+        over each parameter. Parameters with a single value per object (e.g.
+        "stops") are treated as one observation per object. Parameters that
+        are not per-object (e.g. "PI_over_time") are skipped.
+
+        Parameters
+        ----------
+        parameters : list of str, optional
+                     Parameters to aggregate. If None, will use all.
+        stats :      list of str, optional
+                     Statistics to compute. If None, will compute all:
+                     count, mean, std, median, min, quantiles, max
+        quantiles :  list of float, optional
+                     Quantiles to compute (e.g. 0.25 -> column "25%").
+
+        Returns
+        -------
+        pandas.DataFrame
+                     Tidy table with one row per (parameter, object) and one
+                     column per statistic.
+
+        Examples
+        --------
+        >>> stats = exp.aggregate()
+        >>> stats.loc['velocity', 'median']
+        >>> stats['mean'].unstack()
+
+        """
+        q_names = [ '{0:g}%'.format( q * 100 ) for q in quantiles ]
+        all_stats = ['count', 'mean', 'std', 'median', 'min'] + q_names + ['max']
+
+        if isinstance(parameters, type(None)):
+            parameters = self.parameters
+        elif isinstance(parameters, str):
+            parameters = [ parameters ]
+
+        if isinstance(stats, type(None)):
+            stats = all_stats
+        elif isinstance(stats, str):
+            stats = [ stats ]
+
+        unknown = set(stats) - set(all_stats)
+        if unknown:
+            raise ValueError('Unknown statistics: {0}'.format( ', '.join( sorted(unknown) ) ))
+
+        # Quantiles including the median are computed in one go
+        q_to_compute = [ q for q, n in zip( [.5] + list(quantiles), ['median'] + q_names ) if n in stats ]
+
+        objects = set( self.objects )
+
+        data, index = [], []
+        for p in parameters:
+            values = getattr(self, p)
+            if isinstance(values, pd.DataFrame):
+                labels = values.columns
+            elif isinstance(values, pd.Series):
+                labels = values.index
+            else:
+                continue
+
+            if not set(labels) <= objects:
+                continue
+
+            arr = np.asarray( values.values, dtype=float )
+            if arr.ndim == 1:
+                arr = arr[ np.newaxis, : ]
+
+            with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+                # All-NaN columns are expected -> result is NaN
+                warnings.simplefilter('ignore', RuntimeWarning)
+                res = {}
+                if 'count' in stats:
+                    res['count'] = ( ~np.isnan( arr ) ).sum( axis=0 )
+                if 'mean' in stats:
+                    res['mean'] = np.nanmean( arr, axis=0 )
+                if 'std' in stats:
+                    res['std'] = np.nanstd( arr, axis=0, ddof=1 )
+                if 'min' in stats:
+                    res['min'] = np.nanmin( arr, axis=0 )
+                if 'max' in stats:
+                    res['max'] = np.nanmax( arr, axis=0 )
+                if q_to_compute:
+                    q_values = np.nanquantile( arr, q_to_compute, axis=0 )
+                    q_labels = [ n for q, n in zip( [.5] + list(quantiles), ['median'] + q_names ) if n in stats ]
+                    res.update( zip( q_labels, q_values ) )
+
+            data.append( np.column_stack( [ res[s] for s in stats ] ) )
+            index += [ ( p, o ) for o in labels ]
+
+        index = pd.MultiIndex.from_tuples( index, names=['parameter', 'object'] )
+        data = np.concatenate( data, axis=0 ) if data else np.zeros( (0, len(stats)) )
+
+        return pd.DataFrame( data, index=index, columns=stats )
+
+
     def mean(self, p=None ):
         """ Return mean of given parameter over given parameter. If no
         parameter is given return means vor all parameters.
         """
         if p == None:
-            all_means = []
+            all_means = self.aggregate( stats=['mean'] )['mean'].unstack()
+
+            # Experiment-wide values (e.g. preference index) are repeated
             for p in self.parameters:
                 values = getattr(self, p)
-                if isinstance(values, (pd.DataFrame, pd.Series)):
-                    if values.ndim == 1:
-                        all_means.append(values.values)
-                    else:
-                        all_means.append(values.mean(axis=0).values)
-                else:
-                    all_means.append(np.mean(values))
-            return pd.DataFrame(  all_means,
-                                  index=self.parameters,
-                                  columns=self.objects,
-                                   )
+                if not isinstance(values, (pd.DataFrame, pd.Series)):
+                    all_means.loc[p] = np.mean(values)
+
+            all_means = all_means.reindex( index=[ p for p in self.parameters if p in all_means.index ] )
+            all_means.index.name = all_means.columns.name = None
+
+            return all_means
         else:
             values = getattr(self, p)
             if isinstance(values, (pd.DataFrame, pd.Series)):
@@ -474,33 +1140,215 @@ class Experiment:
                 return np.mean(values)
 
 
-    def sanity_check(self):
-        """ Does a sanity check of attached data."""
-        errors_found = False
+    def memory_usage(self):
+        """ Returns memory used by the data in this experiment.
+
+        Returns
+        -------
+        pandas.DataFrame
+                    One row per attribute holding data with columns `kind`
+                    ("parameter", "analysis", "raw" or "cache") and `bytes`.
+
+        Examples
+        --------
+        >>> mem = exp.memory_usage()
+        >>> mem.groupby('kind').bytes.sum()
+        """
+        rows = []
+        for name, value in self.__dict__.items():
+            size = _nbytes( value )
+            if isinstance(size, type(None)):
+                continue
+
+            if name in self._original_params:
+                kind = 'parameter'
+            elif name in self.parameters:
+                kind = 'analysis'
+            elif name == 'raw_data':
+                kind = 'raw'
+            else:
+                kind = 'cache'
 
-        # Test if we have the same number of frames/objects for each parameter
-        shapes = [ set( getattr(self, p).shape ) for p in self.parameters ]
-        intersect = shapes[0].intersection( *shapes )
-        if len(intersect) > 2:
-            module_logger.warning('Found varying numbers of frames: {0}'.format(intersect))
-            errors_found = True
+            rows.append( [ name, kind, size ] )
 
-        # Test if we have the same columns labels for all parameters
-        c_labels = [ set( getattr(self, p).columns ) for p in self.parameters if isinstance(getattr(self, p), pd.DataFrame) ]
-        union = c_labels[0].union( *c_labels )
-        if False in [ l in getattr(self, p) for p in self.parameters for l in union if isinstance(getattr(self, p), pd.DataFrame) ]:
-            module_logger.warning('Found mismatches in names of objects.')
-            errors_found = True
+        mem = pd.DataFrame( rows, columns=['attribute', 'kind', 'bytes'] ).set_index('attribute')
 
-        # Test if we have any empty columns
+        return mem.sort_values( 'bytes', ascending=False )
+
+
+    def downcast(self, dtype='float32'):
+        """ Downcasts FIMTrack parameters and frame-wise analyses to a
+        smaller float type to save memory. Values in float32 have about 7
+        significant digits - enough for FIMTrack's pixel coordinates.
+
+        Parameters
+        ----------
+        dtype :     str | numpy.dtype, optional
+                    Float type to cast to.
+
+        Returns
+        -------
+        int
+                    Bytes saved.
+
+        """
+        dtype = np.dtype( dtype )
+        saved = 0
         for p in self.parameters:
-            if isinstance( getattr(self, p), pd.DataFrame ):
-                if True in ( getattr(self, p).count(axis=0) == 0):
-                    module_logger.warning('Found empty columns for parameter "{0}"'.format(p))
-                    errors_found = True
+            values = getattr(self, p)
+            if not isinstance(values, (pd.DataFrame, pd.Series)):
+                continue
+
+            dtypes = values.dtypes if values.ndim == 2 else pd.Series( [ values.dtype ] )
+            if not all( [ np.issubdtype( d, np.floating ) and d.itemsize > dtype.itemsize for d in dtypes ] ):
+                continue
 
-        if not errors_found:
-            module_logger.info('No errors found - all good!')
+            before = _nbytes( values )
+            values = values.astype( dtype )
+            saved += before - _nbytes( values )
+            setattr( self, p, values )
+
+        return saved
+
+
+    def enforce_budget(self, budget=None, actions=None):
+        """ Reduces memory footprint until it fits into the given budget.
+
+        Parameters
+        ----------
+        budget :    int, optional
+                    Memory budget in bytes. Defaults to
+                    ``pyfim.defaults['MEMORY_BUDGET']``. If None, does
+                    nothing.
+        actions :   list of str, optional
+                    Actions to take (in order) until the budget is met:
+                    "downcast" (see :func:`~pyfim.Experiment.downcast`) and
+                    "drop_raw" (discard raw data). Defaults to
+                    ``pyfim.defaults['MEMORY_BUDGET_ACTIONS']``.
+
+        Returns
+        -------
+        bool
+                    True if memory usage is within budget.
+
+        """
+        if isinstance(budget, type(None)):
+            budget = defaults['MEMORY_BUDGET']
+
+        if isinstance(budget, type(None)):
+            return True
+
+        if isinstance(actions, type(None)):
+            actions = defaults['MEMORY_BUDGET_ACTIONS']
+
+        for action in actions:
+            if self.memory_usage().bytes.sum() <= budget:
+                return True
+
+            if action == 'downcast':
+                self.downcast()
+            elif action == 'drop_raw' and 'raw_data' in self.__dict__:
+                module_logger.info('Dropping raw data to stay within memory budget')
+                del self.raw_data
+
+        used = self.memory_usage().bytes.sum()
+        if used > budget:
+            module_logger.warning('Experiment uses {0:.1f} MB - exceeds memory '
+                                  'budget of {1:.1f} MB'.format( used / 1e6, budget / 1e6 ))
+            return False
+
+        return True
+
+
+    def sanity_check(self, verbose=True):
+        """ Does a sanity check of attached data. All checks are done in a
+        single pass over the parameters.
+
+        Checks for:
+            - varying numbers of frames between parameters
+            - objects missing from some parameters
+            - empty (all NaN) columns
+            - values other than 0/1 in `THRESHOLDED_PARAMS`
+
+        Parameters
+        ----------
+        verbose :   bool, optional
+                    If True, will log found issues.
+
+        Returns
+        -------
+        dict
+                    Report with keys:
+                      - `ok`: True if no issues were found
+                      - `n_frames`: number of frames per parameter
+                      - `frame_mismatch`: parameters deviating from the most common number of frames
+                      - `missing_objects`: {parameter: [objects]}
+                      - `empty_columns`: {parameter: [objects]}
+                      - `non_binary`: {parameter: number of non-binary values}
+
+        """
+        n_frames = {}
+        labels = {}
+        empty_columns = {}
+        non_binary = {}
+
+        for p in self.parameters:
+            values = getattr(self, p)
+
+            if isinstance(values, pd.DataFrame):
+                n_frames[p] = values.shape[0]
+
+                # Only FIMTrack parameters hold one column per object
+                if p in self._original_params:
+                    labels[p] = values.columns
+
+                    counts = values.count(axis=0)
+                    if ( counts == 0 ).any():
+                        empty_columns[p] = counts.index[ counts.values == 0 ].tolist()
+
+                    if p in defaults['THRESHOLDED_PARAMS']:
+                        arr = values.values
+                        n = int( ( ~np.isnan(arr) & ( arr != 0 ) & ( arr != 1 ) ).sum() )
+                        if n:
+                            non_binary[p] = n
+            elif isinstance(values, pd.Series):
+                # Per-object results
+                labels[p] = values.index
+
+        # Test if we have the same number of frames for each parameter
+        if n_frames:
+            counts = pd.Series( n_frames ).value_counts()
+            frame_mismatch = sorted( p for p, n in n_frames.items() if n != counts.index[0] )
+        else:
+            frame_mismatch = []
+
+        # Test if we have the same object labels for all parameters
+        union = set().union( *labels.values() )
+        missing_objects = {}
+        for p, l in labels.items():
+            if len(l) != len(union):
+                missing_objects[p] = sorted( union - set(l) )
+
+        report = dict( ok=not any( [ frame_mismatch, missing_objects, empty_columns, non_binary ] ),
+                       n_frames=n_frames,
+                       frame_mismatch=frame_mismatch,
+                       missing_objects=missing_objects,
+                       empty_columns=empty_columns,
+                       non_binary=non_binary )
+
+        if verbose:
+            if frame_mismatch:
+                module_logger.warning('Found varying numbers of frames: {0}'.format( ', '.join(frame_mismatch) ))
+            if missing_objects:
+                module_logger.warning('Found mismatches in names of objects: {0}'.format( ', '.join(missing_objects) ))
+            for p in empty_columns:
+                module_logger.warning('Found empty columns for parameter "{0}"'.format(p))
+            for p in non_binary:
+                module_logger.warning('Found non-binary values for thresholded parameter "{0}"'.format(p))
+            if report['ok']:
+                module_logger.info('No errors found - all good!')
+
+        return report
 
 
     def __getitem__(self, key):
@@ -508,42 +1356,140 @@ class Experiment:
         parameters with only a single data point per object (e.g. head_bends),
         this single parameter will be at frame 0 and the rest of the column
         will be NaN.
+
+        Use ``exp[obj, params]`` to retrieve only given parameter(s). If a
+        single parameter is requested, the column is returned as
+        pandas.Series without copying.
+
+        Examples
+        --------
+        >>> # All parameters
+        >>> exp['object_1']
+        >>> # Only x/y coordinates
+        >>> exp['object_1', ['mom_x', 'mom_y']]
+
         """
+        if isinstance(key, tuple):
+            key, params = key
+        else:
+            params = self.parameters
+
         if key not in self.objects:
             raise ValueError('Object "{0}" not found.'.format(key))
 
+        if isinstance(params, str):
+            values = getattr(self, params)
+            if isinstance(values, pd.DataFrame):
+                return values[key]
+            return pd.Series( [ values[key] ], name=key )
+
         # Get data
-        data = []
-        for p in self.parameters:
-            values = getattr(self, p)[key]
-            if isinstance(values,float):
-                values = pd.DataFrame([values])
-            data.append(values)
+        data = {}
+        for p in params:
+            values = getattr(self, p)
+            if isinstance(values, pd.DataFrame):
+                if key in values.columns:
+                    data[p] = values[key]
+            elif isinstance(values, pd.Series):
+                if key in values.index:
+                    data[p] = pd.Series( [ values[key] ] )
+
+        return pd.DataFrame( data, columns=[ p for p in params if p in data ] )
+
+
+    def to_hdf5(self, path, group='/', **kwargs):
+        """ Writes this Experiment to a HDF5 file. Parameters are stored as
+        compressed chunks of frames x objects, analyses as side tables.
+
+        Parameters
+        ----------
+        path :      str
+                    HDF5 file. Will be created if it does not exist.
+        group :     str, optional
+                    Group to write to. Use to store multiple experiments in
+                    the same file.
+        **kwargs
+                    Passed to :func:`pyfim.io.to_hdf5`.
+
+        See Also
+        --------
+        :func:`pyfim.read_hdf5`
+                    Read Experiment back from file.
+
+        """
+        fim_io.to_hdf5(self, path, group=group, **kwargs)
+
+
+    def to_zarr(self, path, group='/', **kwargs):
+        """ Writes this Experiment to a Zarr store. Parameters are stored as
+        compressed chunks of frames x objects, analyses as side tables.
+
+        Parameters
+        ----------
+        path :      str
+                    Path to Zarr store. Will be created if it does not exist.
+        group :     str, optional
+                    Group to write to. Use to store multiple experiments in
+                    the same store.
+        **kwargs
+                    Passed to :func:`pyfim.io.to_zarr`.
+
+        See Also
+        --------
+        :func:`pyfim.read_zarr`
+                    Read Experiment back from store.
+
+        """
+        fim_io.to_zarr(self, path, group=group, **kwargs)
+
+
+    def heatmap(self, extent=None, bins=None, x='mom_x', y='mom_y'):
+        """ Generates a 2D occupancy heatmap of all objects.
+
+        Parameters
+        ----------
+        extent :    (x_min, x_max, y_min, y_max), optional
+                    Area covered by the grid. If None, will use the range of
+                    positions. Use a fixed extent to merge heatmaps of
+                    several experiments.
+        bins :      int | (int, int), optional
+                    Number of bins along x and y. Defaults to
+                    ``pyfim.defaults['HEATMAP_BINS']``.
+        x, y :      str, optional
+                    Parameters with x and y coordinates.
+
+        Returns
+        -------
+        pyfim.heatmap.Heatmap
+
+        """
+        if isinstance(extent, type(None)):
+            extent = fim_heatmap.data_extent( self, x=x, y=y )
 
-        df = pd.concat( data, axis=1 )
-        df.columns = self.parameters
+        return fim_heatmap.Heatmap( extent, bins ).add_experiment( self, x=x, y=y )
 
-        return df
 
-    def plot_tracks(self, obj=None, ax=None, **kwargs):
+    def plot_tracks(self, obj=None, ax=None, stride=1, max_segments=None, **kwargs):
         """ Plots traces of tracked objects.
 
         Notes
         -----
-        Uses "spinepoint_2" to plot objects center.
+        Each frame is drawn as a line from tail over spine points to head.
 
         Parameters
         ----------
-        exp :   pyFIM.Experiment
         obj :   {str, list of str, None}
                 Name of object(s) to plot. If None, will plot all objects in
                 Experiment.
         ax :    matplotlib.Axes, optional
                 Ax to plot on. If not provided, will create a new one.
-        plot :  {'center','head'}
-                Which part of the object to plot.
+        stride : int, optional
+                 Only plot every Nth frame.
+        max_segments : int, optional
+                       If provided, `stride` is increased such that at most
+                       about this many lines are drawn.
         **kwargs
-                Will be passed to ax.plot()
+                Will be passed to matplotlib.collections.LineCollection
 
         Returns
         -------
@@ -552,6 +1498,8 @@ class Experiment:
         """
         return fim_plot.plot_tracks(self, obj=obj,
                                           ax=ax,
+                                          stride=stride,
+                                          max_segments=max_segments,
                                           **kwargs)
 
 
@@ -560,25 +1508,35 @@ class TwoChoiceExperiment(Experiment):
     additional analyses.
     """
 
-    def __init__(self, f, keep_raw=False, include_subfolders=False):
+    def __init__(self, f, keep_raw=False, include_subfolders=False, parameters=None, check_budget=True):
         # Do everything the base class does
-        super().__init__(f, keep_raw, include_subfolders)
+        super().__init__(f, keep_raw, include_subfolders, parameters, check_budget=False)
 
         # Add two choice analyses
         self.two_choice_analyses()
 
+        if check_budget:
+            self.enforce_budget()
+
+
+    def update(self, f=None):
+        """ Adds data from new files to this experiment and reruns two-choice
+        analyses. See :func:`~pyfim.Experiment.update`.
+        """
+        new_files = super().update(f)
+
+        if new_files:
+            self.two_choice_analyses()
+
+        return new_files
 
     def two_choice_analyses(self):
         """ Performs additional two-choice analyses.
         """
 
         # Perform additional, "higher-level" analyses
-        for param in tqdm(fim_analysis.__two_choice__, desc='Performing two-choice analyses', leave=False):
-            func = getattr( fim_analysis, param )
-            setattr(self, param, func( self ) )
-            self.parameters.append( param )
-
-        self.parameters = sorted( self.parameters )
+        self.run_analyses( fim_analysis.__two_choice__,
+                           desc='Performing two-choice analyses' )
 
     def split_data(self):
         """ Split data into experiment and control. Returns a collection.
@@ -616,6 +1574,8 @@ class TwoChoiceExperiment(Experiment):
         # Generate empty experiments
         experiment = Experiment(None)
         control = Experiment(None)
+        experiment.units = dict( self.units )
+        control.units = dict( self.units )
 
         # Feed original, MASKED data to each experiment
         for p in self._original_params:
@@ -638,13 +1598,8 @@ class TwoChoiceExperiment(Experiment):
             for p in exp._original_params:
                 setattr(exp, p, getattr(exp,p)[univ_objects] )
 
-        # Rerun higher-level analyses
-        for param in tqdm(fim_analysis.__all__, desc='Performing additional analyses', leave=False):
-            func = getattr( fim_analysis, param )
-            for exp in [experiment, control]:
-                setattr(exp, param, func( exp ) )
-                exp.parameters.append( param )
-                exp.parameters = sorted( exp.parameters )
+        # Rerun higher-level analyses for both halves in one go
+        run_stacked( [experiment, control], fim_analysis.__all__ )
 
         col = Collection()
         col.add_data( experiment, label='experiment' )
@@ -653,6 +1608,471 @@ class TwoChoiceExperiment(Experiment):
         return col
 
 
+def _nbytes(value):
+    """ Returns bytes used by a DataFrame, Series or array. None for
+    anything else.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int( value.memory_usage( index=True, deep=True ).sum() )
+    elif isinstance(value, pd.Series):
+        return int( value.memory_usage( index=True, deep=True ) )
+    elif isinstance(value, np.ndarray):
+        return int( value.nbytes )
+    return None
+
+
+def _param_means(exp, param):
+    """ Returns per-object means of a parameter (as used by Collections). """
+    values = getattr( exp, param )
+    if values.ndim == 1:
+        return values.values
+    return values.mean().values
+
+
+def run_stacked(experiments, analyses, desc='Performing stacked analyses'):
+    """ Runs analyses for multiple experiments at once.
+
+    Objects of all experiments are concatenated along the object axis (with
+    a group index pointing to the experiment), each analysis is run once on
+    the combined data and results are scattered back to the experiments.
+    This amortizes the per-call overhead of the analyses over many
+    experiments.
+
+    Analyses that do not return per-object results (e.g. two-choice
+    analyses) or that require parameters not available in all experiments
+    are run separately for each experiment.
+
+    Parameters
+    ----------
+    experiments :   list of pyfim.Experiment
+    analyses :      list of str
+                    Names of functions in :mod:`pyfim.analysis`.
+    desc :          str, optional
+                    Description for the progress bar.
+
+    Examples
+    --------
+    >>> exps = [ pyfim.Experiment(f) for f in files ]
+    >>> pyfim.core.run_stacked( exps, pyfim.analysis.__all__ )
+
+    """
+    experiments = list( experiments )
+
+    if not experiments:
+        return
+
+    available = set.intersection( *[ set( exp._original_params ) for exp in experiments ] )
+
+    stackable = [ a for a in analyses if a not in fim_analysis.__two_choice__ and not set( fim_analysis.required_parameters(a) ) - available ]
+    separate = [ a for a in analyses if a not in stackable ]
+
+    if stackable:
+        # Generate stacked experiment with only the required parameters.
+        # Columns are renumbered 0..N (plain integer columns are much faster
+        # to look up than a MultiIndex) and `group`/`names` map them back
+        stacked = Experiment(None)
+        required = sorted( set( [ r for a in stackable for r in fim_analysis.required_parameters(a) ] ) )
+        objects = [ exp.objects for exp in experiments ]
+        offsets = np.cumsum( [ 0 ] + [ len(o) for o in objects ] )
+        group = np.repeat( np.arange( len(experiments) ), np.diff( offsets ) )
+        names = np.array( [ o for obj in objects for o in obj ], dtype=object )
+        for p in required:
+            data = []
+            for exp, obj, offset in zip( experiments, objects, offsets ):
+                values = getattr(exp, p)
+                pos = { o: offset + i for i, o in enumerate(obj) }
+                data.append( values.set_axis( [ pos[c] for c in values.columns ], axis=1 ) )
+            setattr( stacked, p, pd.concat( data, axis=1 ) )
+            stacked._original_params.append( p )
+            stacked.parameters.append( p )
+
+        for param in tqdm(stackable, desc=desc, leave=False):
+            res = getattr( fim_analysis, param )( stacked )
+
+            if not isinstance(res, pd.Series):
+                separate.append( param )
+                continue
+
+            # Scatter results back to experiments
+            res_group = group[ res.index.values ]
+            for i, exp in enumerate( experiments ):
+                this = res[ res_group == i ]
+                setattr( exp, param, pd.Series( this.values, index=names[ this.index.values ] ) )
+                if param not in exp.parameters:
+                    exp.parameters.append( param )
+
+        for exp in experiments:
+            exp.parameters = sorted( exp.parameters )
+
+    if separate:
+        for exp in experiments:
+            exp.run_analyses( separate, desc=desc )
+
+
+def load_pipelined(f, keep_raw=False, include_subfolders=False, parameters=None,
+                   n_workers=4, queue_size=4, processes=False):
+    """ Loads an Experiment with file I/O, parsing and analysis overlapping.
+
+    A reader thread reads files into a bounded queue while a pool of
+    workers parses, cleans and analyses each file as soon as it is
+    available. Per-file results are combined once all files are done. This
+    pays off if files are on slow (e.g. network-mounted) disks.
+
+    Notes
+    -----
+    Clean-up and analyses are run per file (as with
+    :func:`~pyfim.Experiment.update`). Objects are numbered as in
+    :class:`~pyfim.Experiment`. Peak memory for raw data is bounded by
+    `queue_size` + `n_workers` files.
+
+    Parameters
+    ----------
+    f :             {filename, folder, file object}
+                        Provide either:
+                            - a CSV file name
+                            - a CSV file object
+                            - single folder
+                            - list of the above
+    keep_raw :      bool, optional
+                    If False, will discard raw data after extraction to save
+                    memory.
+    include_subfolders : bool, optional
+                         If True and folder is provided, will also search
+                         subfolders for .csv files.
+    parameters :    list of str, optional
+                    If provided, will only load these FIMTrack parameters.
+    n_workers :     int, optional
+                    Number of workers parsing and analysing files.
+    queue_size :    int, optional
+                    Maximum number of files read ahead of the workers.
+    processes :     bool, optional
+                    If True, will use processes instead of threads as
+                    workers. Avoids contention for the GIL but per-file
+                    results need to be pickled. Worker processes use the
+                    settings in ``pyfim.defaults`` at the time of calling.
+
+    Returns
+    -------
+    pyfim.Experiment
+
+    Examples
+    --------
+    >>> exp = pyfim.load_pipelined('/mnt/server/genotype1', n_workers=8)
+
+    """
+    files = _parse_files(f, include_subfolders)
+
+    if len(files) == 0:
+        raise ValueError('No files found')
+
+    raw_q = queue.Queue( maxsize=max( 1, int(queue_size) ) )
+    stop = threading.Event()
+
+    def reader():
+        """ Reads files and puts (payload, number of objects) into queue. """
+        try:
+            for fn in files:
+                if isinstance(fn, str):
+                    with open(fn, 'rb') as fh:
+                        payload = fh.read()
+                else:
+                    payload = fn.read()
+                    if isinstance(payload, str):
+                        payload = payload.encode()
+
+                header = payload[ : payload.find(b'\n') ].decode().rstrip('\r')
+                n_objects = len( header.split( defaults['DELIMITER'] ) ) - 1
+
+                # Blocks while queue is full -> bounds memory
+                while not stop.is_set():
+                    try:
+                        raw_q.put( ( payload, n_objects ), timeout=.1 )
+                        break
+                    except queue.Full:
+                        pass
+                if stop.is_set():
+                    return
+        except BaseException as e:
+            raw_q.put( e )
+
+    thread = threading.Thread( target=reader, daemon=True )
+    thread.start()
+
+    Executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+
+    # Worker processes started via "spawn" (default on Windows and macOS)
+    # re-import pyfim and would otherwise run with the stock defaults
+    config = dict( defaults ) if processes else None
+
+    parts, pending, offset = [], collections.deque(), 0
+    try:
+        with Executor( max_workers=max( 1, int(n_workers) ) ) as pool:
+            for _ in tqdm( files, desc='Loading files', leave=False ):
+                item = raw_q.get()
+                if isinstance(item, BaseException):
+                    raise item
+
+                payload, n_objects = item
+                pending.append( pool.submit( _load_file, payload, parameters, offset, keep_raw, config ) )
+                offset += n_objects
+
+                # Limit number of files in flight
+                while len( pending ) > n_workers:
+                    parts.append( pending.popleft().result() )
+
+            while pending:
+                parts.append( pending.popleft().result() )
+    finally:
+        stop.set()
+
+    exp = Experiment(None)
+    exp._source = f
+    exp._include_subfolders = include_subfolders
+    exp._load_params = parameters
+    exp._files = list( files )
+    exp._n_raw_objects = offset
+
+    _combine( exp, parts )
+
+    if keep_raw:
+        exp._merge_raw( [ p.raw_data for p in parts ], renumber=False,
+                        converted=all( p._raw_converted for p in parts ) )
+
+    return exp
+
+
+def _load_file(payload, parameters=None, offset=0, keep_raw=False, config=None):
+    """ Parses, cleans and analyses a single file. Used by
+    :func:`load_pipelined`. `config` (a copy of ``pyfim.defaults``) is
+    applied before loading.
+    """
+    if not isinstance(config, type(None)):
+        defaults.update( config )
+
+    exp = Experiment(None)
+    exp._merge_raw( [ _read_csv( BytesIO(payload), parameters ) ], offset=offset )
+    exp.extract_data()
+
+    if not keep_raw:
+        del exp.raw_data
+
+    return exp
+
+
+def _combine(exp, parts):
+    """ Combines experiments with distinct objects into `exp`: DataFrames
+    are joined along the object axis, Series are concatenated.
+    """
+    params = sorted( set( [ p for e in parts for p in e.parameters ] ) )
+
+    for p in params:
+        values = [ getattr(e, p) for e in parts if p in e.parameters ]
+
+        if all( [ isinstance(v, pd.DataFrame) for v in values ] ):
+            combined = pd.concat( values, axis=1, join='outer' )
+            combined = combined[ sorted( combined.columns ) ]
+        elif all( [ isinstance(v, pd.Series) for v in values ] ):
+            combined = pd.concat( values ).sort_index()
+        else:
+            # E.g. scalars: keep the first
+            combined = values[0]
+
+        setattr( exp, p, combined )
+
+    exp.parameters = params
+    exp._original_params = sorted( set( [ p for e in parts for p in e._original_params ] ) )
+    exp.units = { k: v for e in parts for k, v in getattr(e, 'units', {}).items() }
+
+    # Keep track of recordings: ids are offset such that they stay distinct
+    # across parts. Objects of parts without this information are left out
+    # (-> unknown recording)
+    recording, offset = [], 0
+    for e in parts:
+        rec = getattr(e, '_recording', None)
+        if isinstance(rec, pd.Series) and not rec.empty:
+            recording.append( rec + offset )
+            offset += int( rec.max() ) + 1
+
+    if recording:
+        exp._recording = pd.concat( recording )
+
+
+def process_batches(f, batch_size=50, out=None, include_subfolders=False, parameters=None):
+    """ Out-of-core processing of large data sets. Objects (columns) are
+    processed in batches: each batch is read, cleaned and analysed before
+    moving on to the next one. Peak memory is therefore determined by the
+    batch size rather than the size of the data set.
+
+    Notes
+    -----
+    Only per-object analyses (see `pyfim.analysis.__all__`) are run.
+    Frame-wise data is discarded after each batch. Files are scanned once
+    per batch they contribute objects to.
+
+    Tracks can't be stitched (see `STITCH_TRACKS`) because fragments may
+    end up in different batches.
+
+    Parameters
+    ----------
+    f :             {filename, folder, file object}
+                        Provide either:
+                            - a CSV file name
+                            - a CSV file object (must be seekable)
+                            - single folder
+                            - list of the above
+                    Objects (columns) are numbered as in :class:`~pyfim.Experiment`.
+    batch_size :    int, optional
+                    Number of objects (columns) to process at a time.
+    out :           str, optional
+                    CSV file to which results are appended after each
+                    batch.
+    include_subfolders : bool, optional
+                         If True and folder is provided, will also search
+                         subfolders for .csv files.
+    parameters :    list of str, optional
+                    If provided, will only load these FIMTrack parameters.
+
+    Returns
+    -------
+    pandas.DataFrame
+                    Per-object analysis results (objects x analyses).
+
+    Examples
+    --------
+    >>> res = pyfim.process_batches('users/data/long_session', batch_size=20,
+    ...                             out='users/data/long_session_results.csv')
+
+    """
+    if defaults['STITCH_TRACKS']:
+        raise ValueError('Tracks can not be stitched across batches - please '
+                         'set STITCH_TRACKS=False or use pyfim.Experiment')
+
+    files = _parse_files(f, include_subfolders)
+
+    if len(files) == 0:
+        raise ValueError('No files found')
+
+    # Get number of objects per file from the header
+    n_cols = []
+    for fn in files:
+        if not isinstance(fn, str):
+            fn.seek(0)
+        n_cols.append( pd.read_csv(fn, sep=defaults['DELIMITER'], index_col=0, nrows=0).shape[1] )
+
+    # Global position of each file's first object
+    file_offsets = np.cumsum( [ 0 ] + n_cols )
+
+    results = []
+    batches = range( 0, file_offsets[-1], batch_size )
+    for start in tqdm(batches, desc='Processing batches', leave=False):
+        stop = min( start + batch_size, file_offsets[-1] )
+
+        # Read only this batch's columns from each file
+        data = []
+        for fn, first, last in zip(files, file_offsets[:-1], file_offsets[1:]):
+            if last <= start or first >= stop:
+                continue
+            if not isinstance(fn, str):
+                fn.seek(0)
+            cols = list( range( max(start, first) - first, min(stop, last) - first ) )
+            data.append( _read_csv(fn, parameters, columns=cols) )
+
+        # Clean and analyze this batch
+        exp = Experiment(None)
+        exp._merge_raw( data, offset=start )
+        exp.extract_data()
+
+        res = pd.DataFrame( { a: getattr(exp, a) for a in fim_analysis.__all__ if a in exp.parameters } )
+        res = res.reindex( exp.objects )
+        res.index.name = 'object'
+
+        if out:
+            res.to_csv(out, mode='w' if not results else 'a', header=not results)
+
+        results.append( res )
+
+        # Free memory before moving on
+        del exp, data
+
+    return pd.concat( results, axis=0 )
+
+
+def _read_csv(f, parameters=None, columns=None):
+    """ Reads a single FIMTrack CSV file. If `parameters` is provided, rows
+    belonging to other parameters are dropped while streaming the file and
+    are never parsed.
+
+    Parameters
+    ----------
+    f :             {filename, file object}
+    parameters :    list of str, optional
+                    Parameters (e.g. "mom_x") to keep. If None, will read
+                    all parameters.
+    columns :       list of int, optional
+                    Positions of objects (columns) to keep. If None, will
+                    read all objects.
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    """
+    # Only parse the index and requested columns
+    usecols = None if isinstance(columns, type(None)) else [ 0 ] + [ c + 1 for c in columns ]
+
+    if isinstance(parameters, type(None)):
+        return pd.read_csv(f, sep=defaults['DELIMITER'], index_col=0, usecols=usecols)
+
+    if isinstance(parameters, str):
+        parameters = [ parameters ]
+
+    keep = set(parameters)
+
+    if isinstance(f, str):
+        fh = open(f, 'r')
+    elif not isinstance(f, TextIOBase):
+        # Binary file objects need decoding
+        fh = TextIOWrapper(f)
+    else:
+        fh = f
+
+    # Only rows of requested parameters are written to this buffer
+    buffer = StringIO()
+    seen = set()
+    try:
+        # Keep the header
+        buffer.write( fh.readline() )
+
+        previous = None
+        for line in fh:
+            p = line[ : line.find('(') ]
+
+            if p in keep:
+                buffer.write( line )
+
+            # FIMTrack writes parameters as contiguous blocks of rows ->
+            # stop reading once we have left the last requested block
+            if p != previous:
+                if previous in keep:
+                    seen.add( previous )
+                    if seen == keep:
+                        break
+                previous = p
+    finally:
+        if isinstance(f, str):
+            fh.close()
+        elif fh is not f:
+            # Make sure closing the wrapper does not close the original file
+            fh.detach()
+
+    missing = keep - seen - set([ previous ])
+    if missing:
+        module_logger.warning('Parameter(s) not found in file: {0}'.format( ', '.join( sorted(missing) ) ))
+
+    buffer.seek(0)
+    return pd.read_csv(buffer, sep=defaults['DELIMITER'], index_col=0, usecols=usecols)
+
+
 def _parse_files(x, include_subfolders=False):
     """Parses input to filenames or file objects. Will always return a list!
     """
@@ -0,0 +1,228 @@
+#    This code is part of pyFIM (http://www.github.com/schlegelp/pyfim), a
+#    package to analyze FIMTrack data (fim.uni-muenster.de). For full
+#    acknowledgments and references, please see the GitHub repository.
+#
+#    Copyright (C) 2018 Philipp Schlegel
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+""" Per-object feature matrices, e.g. for machine learning.
+
+Features are computed for all objects of an experiment at once:
+
+    - `analysis`: results of the per-object analyses (e.g. "stops")
+    - `distribution`: mean, standard deviation and quantiles of a parameter
+    - `spectral`: features of the power spectrum of a parameter
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from pyfim import core, config
+from pyfim import analysis as fim_analysis
+defaults = config.default_parameters
+
+__all__ = ['feature_matrix']
+
+# Default parameters and quantiles for distribution features
+DISTRIBUTION_PARAMS = ['velocity', 'bending', 'spine_length']
+QUANTILES = [.05, .25, .5, .75, .95]
+
+# Default parameters and frequency bands [Hz] for spectral features
+SPECTRAL_PARAMS = ['area']
+SPECTRAL_BANDS = [ (0, .5), (.5, 1.5), (1.5, 3) ]
+
+
+def feature_matrix(x, analyses=None, distribution=DISTRIBUTION_PARAMS,
+                   quantiles=QUANTILES, spectral=SPECTRAL_PARAMS,
+                   bands=SPECTRAL_BANDS, as_frame=False):
+    """ Generates a (objects x features) matrix.
+
+    Parameters
+    ----------
+    x :             pyfim.Experiment | pyfim.Collection
+                    Data to extract features from. For Collections, objects
+                    of all experiments are stacked.
+    analyses :      list of str, optional
+                    Per-object analyses to include. If None, will use all
+                    analyses in ``pyfim.analysis.__all__``.
+    distribution :  list of str, optional
+                    Parameters to get mean, standard deviation and
+                    `quantiles` for.
+    quantiles :     list of float, optional
+                    Quantiles (0-1) to compute for `distribution` parameters.
+    spectral :      list of str, optional
+                    Parameters to get spectral features for: dominant
+                    frequency [Hz], relative power of the dominant frequency,
+                    spectral centroid [Hz], normalized spectral entropy and
+                    relative power in each of the frequency `bands`.
+    bands :         list of (low, high) tuples, optional
+                    Frequency bands [Hz] for spectral features.
+    as_frame :      bool, optional
+                    If True, will return a single pandas.DataFrame.
+
+    Returns
+    -------
+    X :             np.ndarray
+                    float32 (objects x features) matrix. Features that could
+                    not be computed (e.g. missing parameter) are NaN.
+    rows :          pandas.Index | pandas.MultiIndex
+                    Objects. For Collections (experiment, object).
+    columns :       pandas.DataFrame
+                    Metadata for each feature (column of `X`): `parameter`,
+                    `kind` ("analysis", "distribution" or "spectral") and
+                    `statistic`.
+
+    pandas.DataFrame
+                    If ``as_frame=True``.
+
+    Examples
+    --------
+    >>> X, rows, columns = pyfim.features.feature_matrix(collection)
+    >>> # All velocity features
+    >>> X[:, columns.parameter == 'velocity']
+
+    """
+    # Experiments are fetched one at a time -> spilled experiments (see
+    # `pyfim.Collection.enforce_budget`) are not all loaded at once
+    if isinstance(x, core.Collection):
+        labels = x.experiments
+        experiments = ( x._get(e) for e in labels )
+    elif isinstance(x, core.Experiment):
+        labels = None
+        experiments = [ x ]
+    else:
+        raise TypeError('Need pyfim.Experiment or pyfim.Collection, not {0}'.format(type(x)))
+
+    if isinstance(analyses, type(None)):
+        analyses = fim_analysis.__all__
+
+    columns = _feature_columns( analyses, distribution, quantiles, spectral, bands )
+
+    blocks, objects = [], []
+    for exp in experiments:
+        blocks.append( _experiment_features( exp, analyses, distribution,
+                                             quantiles, spectral, bands,
+                                             len(columns) ) )
+        objects.append( list( exp.objects ) )
+
+    X = np.concatenate( blocks, axis=0 ) if blocks else np.zeros( (0, len(columns)), dtype=np.float32 )
+
+    if isinstance(labels, type(None)):
+        rows = pd.Index( objects[0], name='object' )
+    else:
+        rows = pd.MultiIndex.from_tuples( [ (l, o) for l, obj in zip(labels, objects) for o in obj ],
+                                          names=['experiment', 'object'] )
+
+    if as_frame:
+        return pd.DataFrame( X, index=rows, columns=columns.index )
+
+    return X, rows, columns
+
+
+def _feature_columns(analyses, distribution, quantiles, spectral, bands):
+    """ Generates metadata for feature columns. """
+    meta = []
+    for a in analyses:
+        meta.append( ( a, a, 'analysis', 'value' ) )
+
+    for p in distribution:
+        for s in [ 'mean', 'std' ] + [ 'q{0:g}'.format( q * 100 ) for q in quantiles ]:
+            meta.append( ( '{0}_{1}'.format(p, s), p, 'distribution', s ) )
+
+    for p in spectral:
+        stats = [ 'dominant_freq', 'dominant_power', 'centroid', 'entropy' ]
+        stats += [ 'band_{0:g}-{1:g}Hz'.format( *b ) for b in bands ]
+        for s in stats:
+            meta.append( ( '{0}_{1}'.format(p, s), p, 'spectral', s ) )
+
+    meta = pd.DataFrame( meta, columns=[ 'feature', 'parameter', 'kind', 'statistic' ] )
+
+    return meta.set_index('feature')
+
+
+def _experiment_features(exp, analyses, distribution, quantiles, spectral, bands, n_features):
+    """ Computes feature block for a single experiment. Columns are in the
+    same order as generated by :func:`_feature_columns`.
+    """
+    objects = exp.objects
+    X = np.full( ( len(objects), n_features ), np.nan, dtype=np.float32 )
+
+    col = 0
+    for a in analyses:
+        values = getattr( exp, a, None )
+        if isinstance(values, pd.Series):
+            X[:, col] = values.reindex( objects ).values
+        col += 1
+
+    n_dist = 2 + len(quantiles)
+    for p in distribution:
+        if p in exp.parameters:
+            values = getattr( exp, p ).reindex( columns=objects ).values
+            with warnings.catch_warnings():
+                # All-NaN objects simply get NaN features
+                warnings.simplefilter('ignore', category=RuntimeWarning)
+                X[:, col] = np.nanmean( values, axis=0 )
+                X[:, col + 1] = np.nanstd( values, axis=0, ddof=1 )
+                X[:, col + 2: col + n_dist] = np.nanquantile( values, quantiles, axis=0 ).T
+        col += n_dist
+
+    n_spec = 4 + len(bands)
+    for p in spectral:
+        if p in exp.parameters:
+            values = getattr( exp, p ).reindex( columns=objects ).values
+            X[:, col: col + n_spec] = _spectral_features( values, bands )
+        col += n_spec
+
+    return X
+
+
+def _spectral_features(values, bands):
+    """ Computes spectral features for each column of a (frames x objects)
+    array. Untracked frames (NaN) are set to the object's mean. Series too
+    short to have at least two frequencies (besides DC) get NaN.
+    """
+    n_frames, n_objects = values.shape
+    out = np.full( ( n_objects, 4 + len(bands) ), np.nan )
+
+    if n_frames < 4:
+        return out
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        centered = values - np.nanmean( values, axis=0 )
+    centered[ np.isnan( centered ) ] = 0
+
+    # Power spectrum without the DC component
+    power = np.abs( np.fft.rfft( centered, axis=0 ) )[1:] ** 2
+    freqs = np.fft.rfftfreq( n_frames, d=1 / defaults['FPS'] )[1:]
+
+    total = power.sum( axis=0 )
+    has_power = total > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rel = power / total
+
+        dominant = np.argmax( power, axis=0 )
+        out[:, 0] = freqs[ dominant ]
+        out[:, 1] = rel[ dominant, np.arange( n_objects ) ]
+        out[:, 2] = ( freqs[:, None] * rel ).sum( axis=0 )
+        # Entropy is normalized by its maximum (log of number of frequencies)
+        out[:, 3] = - np.where( rel > 0, rel * np.log( rel ), 0 ).sum( axis=0 ) / np.log( len(freqs) )
+
+        for i, ( low, high ) in enumerate( bands ):
+            in_band = ( freqs >= low ) & ( freqs < high )
+            out[:, 4 + i] = rel[ in_band ].sum( axis=0 )
+
+    out[ ~has_power ] = np.nan
+
+    return out
@@ -0,0 +1,241 @@
+#    This code is part of pyFIM (http://www.github.com/schlegelp/pyfim), a
+#    package to analyze FIMTrack data (fim.uni-muenster.de). For full
+#    acknowledgments and references, please see the GitHub repository.
+#
+#    Copyright (C) 2018 Philipp Schlegel
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+""" Streaming 2D occupancy heatmaps.
+
+Positions are binned into a fixed grid chunk by chunk, so memory does not
+grow with the number of frames or experiments. Heatmaps with the same grid
+can be merged, e.g. after binning experiments in parallel workers.
+"""
+
+import numpy as np
+
+from pyfim import core, config
+from pyfim import plot as fim_plot
+defaults = config.default_parameters
+
+__all__ = ['Heatmap', 'merge', 'data_extent']
+
+
+class Heatmap:
+    """ Accumulator for 2D position histograms on a fixed grid.
+
+    Parameters
+    ----------
+    extent :    (x_min, x_max, y_min, y_max)
+                Area covered by the grid (same units as the positions).
+                Positions outside are not counted (see `n_outside`).
+    bins :      int | (int, int), optional
+                Number of bins along x and y. Defaults to
+                ``pyfim.defaults['HEATMAP_BINS']``.
+
+    Examples
+    --------
+    >>> hm = pyfim.heatmap.Heatmap( extent=(0, 2000, 0, 2000), bins=100 )
+    >>> hm.add_experiment( exp1 )
+    >>> hm.add_experiment( exp2 )
+    >>> ax = hm.plot()
+
+    """
+
+    def __init__(self, extent, bins=None):
+        if isinstance(bins, type(None)):
+            bins = defaults['HEATMAP_BINS']
+
+        extent = tuple( float(e) for e in extent )
+
+        if len(extent) != 4 or extent[0] >= extent[1] or extent[2] >= extent[3]:
+            raise ValueError('Extent must be (x_min, x_max, y_min, y_max), got {0}'.format(extent))
+
+        if isinstance(bins, (int, np.integer)):
+            bins = ( bins, bins )
+        bins = tuple( int(b) for b in bins )
+
+        if len(bins) != 2 or min(bins) < 1:
+            raise ValueError('Bins must be a positive integer or a pair thereof, got {0}'.format(bins))
+
+        self.extent = extent
+        self.bins = bins
+
+        # Counts are stored as (y, x) -> same orientation as an image
+        self.counts = np.zeros( bins[::-1], dtype=np.int64 )
+        self.n_outside = 0
+
+    def __repr__(self):
+        return '{0} with {1}x{2} bins; extent {3}; {4} positions'.format(type(self),
+                                                                         self.bins[0],
+                                                                         self.bins[1],
+                                                                         self.extent,
+                                                                         self.n_positions)
+
+    def __add__(self, other):
+        return merge( self, other )
+
+    def __iadd__(self, other):
+        self._check_grid( other )
+        self.counts += other.counts
+        self.n_outside += other.n_outside
+        return self
+
+    def _check_grid(self, other):
+        if not isinstance(other, Heatmap):
+            raise TypeError('Can only merge with Heatmap, not {0}'.format(type(other)))
+        if self.extent != other.extent or self.bins != other.bins:
+            raise ValueError('Heatmaps must have the same extent and bins to be merged')
+
+    @property
+    def n_positions(self):
+        """ Number of positions counted (excluding those outside the grid). """
+        return int( self.counts.sum() )
+
+    @property
+    def x_edges(self):
+        """ Bin edges along x. """
+        return np.linspace( self.extent[0], self.extent[1], self.bins[0] + 1 )
+
+    @property
+    def y_edges(self):
+        """ Bin edges along y. """
+        return np.linspace( self.extent[2], self.extent[3], self.bins[1] + 1 )
+
+    @property
+    def density(self):
+        """ Fraction of all counted positions per bin. """
+        total = self.counts.sum()
+        if not total:
+            return np.zeros( self.counts.shape )
+        return self.counts / total
+
+    def add(self, x, y):
+        """ Adds positions to the heatmap.
+
+        Parameters
+        ----------
+        x, y :      array-like
+                    Coordinates of matching shape. NaNs (untracked frames)
+                    are ignored.
+
+        Returns
+        -------
+        self
+
+        """
+        x = np.asarray( x, dtype=float ).ravel()
+        y = np.asarray( y, dtype=float ).ravel()
+
+        if x.shape != y.shape:
+            raise ValueError('x and y must have the same shape')
+
+        valid = ~( np.isnan(x) | np.isnan(y) )
+        x, y = x[ valid ], y[ valid ]
+
+        x_min, x_max, y_min, y_max = self.extent
+        nx, ny = self.bins
+
+        # Right/top edge is included in the last bin (as in numpy.histogram2d)
+        ix = np.floor( ( x - x_min ) / ( x_max - x_min ) * nx ).astype(np.int64)
+        iy = np.floor( ( y - y_min ) / ( y_max - y_min ) * ny ).astype(np.int64)
+        ix[ x == x_max ] = nx - 1
+        iy[ y == y_max ] = ny - 1
+
+        inside = ( ix >= 0 ) & ( ix < nx ) & ( iy >= 0 ) & ( iy < ny )
+        self.n_outside += int( inside.size - inside.sum() )
+
+        self.counts += np.bincount( iy[ inside ] * nx + ix[ inside ],
+                                    minlength=nx * ny ).reshape( ny, nx )
+
+        return self
+
+    def add_experiment(self, exp, x='mom_x', y='mom_y', chunk_size=None):
+        """ Adds positions of all objects in an Experiment.
+
+        Parameters
+        ----------
+        exp :           pyfim.Experiment
+        x, y :          str, optional
+                        Parameters with x and y coordinates.
+        chunk_size :    int, optional
+                        Number of frames binned at a time. Defaults to
+                        ``pyfim.defaults['HEATMAP_CHUNK_SIZE']``.
+
+        Returns
+        -------
+        self
+
+        """
+        if not isinstance(exp, core.Experiment):
+            raise TypeError('Need pyfim.Experiment, not {0}'.format(type(exp)))
+
+        if isinstance(chunk_size, type(None)):
+            chunk_size = defaults['HEATMAP_CHUNK_SIZE']
+        chunk_size = max( int(chunk_size), 1 )
+
+        x = getattr(exp, x)
+        y = getattr(exp, y).reindex( index=x.index, columns=x.columns )
+
+        x, y = x.values, y.values
+        for i in range( 0, x.shape[0], chunk_size ):
+            self.add( x[ i : i + chunk_size ], y[ i : i + chunk_size ] )
+
+        return self
+
+    def plot(self, ax=None, normalize=True, log=False, **kwargs):
+        """ Plots heatmap. See :func:`pyfim.plot.plot_heatmap`. """
+        return fim_plot.plot_heatmap(self, ax=ax, normalize=normalize, log=log, **kwargs)
+
+
+def merge(*heatmaps):
+    """ Merges heatmaps with the same grid (e.g. from parallel workers).
+
+    Parameters
+    ----------
+    *heatmaps : Heatmap
+
+    Returns
+    -------
+    Heatmap
+                New heatmap with summed counts.
+
+    """
+    if len(heatmaps) == 1 and isinstance(heatmaps[0], (list, tuple)):
+        heatmaps = heatmaps[0]
+
+    if not heatmaps:
+        raise ValueError('Need at least one Heatmap to merge')
+
+    merged = Heatmap( heatmaps[0].extent, heatmaps[0].bins )
+    for hm in heatmaps:
+        merged += hm
+
+    return merged
+
+
+def data_extent(experiments, x='mom_x', y='mom_y'):
+    """ Returns extent (x_min, x_max, y_min, y_max) covering all positions
+    in the given experiments.
+    """
+    if isinstance(experiments, core.Experiment):
+        experiments = [ experiments ]
+
+    x_values = [ getattr(e, x).values for e in experiments ]
+    y_values = [ getattr(e, y).values for e in experiments ]
+
+    extent = ( min( [ np.nanmin(v) for v in x_values ] ), max( [ np.nanmax(v) for v in x_values ] ),
+               min( [ np.nanmin(v) for v in y_values ] ), max( [ np.nanmax(v) for v in y_values ] ) )
+
+    # Grid needs a non-zero size
+    return ( extent[0], max( extent[1], extent[0] + 1 ),
+             extent[2], max( extent[3], extent[2] + 1 ) )
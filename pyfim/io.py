@@ -0,0 +1,328 @@
+#    This code is part of pyFIM (http://www.github.com/schlegelp/pyfim), a
+#    package to analyze FIMTrack data (fim.uni-muenster.de). For full
+#    acknowledgments and references, please see the GitHub repository.
+#
+#    Copyright (C) 2018 Philipp Schlegel
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+""" Export and import of Experiments to/from HDF5 and Zarr.
+
+Both formats use the same layout::
+
+    <group>                 attrs: class, objects, original_params, units
+    <group>/parameters/<p>  2d array (frames x objects), chunked
+    <group>/analyses/<a>    1d (objects) or 2d (frames x columns) array
+                            attrs of <group>/analyses hold scalar results
+    <group>/index/<p>       1d array of frame labels of 2d arrays
+
+Each array has a `columns` attribute (positions into `objects`).
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from pyfim import core
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+try:
+    import zarr
+except ImportError:
+    zarr = None
+
+__all__ = ['read_hdf5', 'read_zarr', 'to_hdf5', 'to_zarr']
+
+# Default chunks as (frames, objects)
+CHUNKS = (1024, 16)
+
+# Groups written by pyfim -> the only ones replaced when writing to the root
+_OWNED = ['parameters', 'analyses', 'index']
+
+
+def to_hdf5(exp, path, group='/', chunks=CHUNKS, compression='gzip'):
+    """ Writes Experiment to HDF5 file.
+
+    Parameters
+    ----------
+    exp :           pyfim.Experiment
+    path :          str
+                    HDF5 file. Will be created if it does not exist.
+    group :         str, optional
+                    Group to write to. Use this to store multiple experiments
+                    in the same file. Existing data in the group is replaced.
+                    If writing to the root, only data previously written by
+                    pyfim is replaced - other groups are kept.
+    chunks :        tuple, optional
+                    Chunk size as (frames, objects).
+    compression :   str, optional
+                    Compression filter passed to h5py.
+
+    """
+    if h5py is None:
+        raise ImportError('Exporting to HDF5 requires h5py: pip install h5py')
+
+    with h5py.File(path, 'a') as f:
+        if group not in ['/', '']:
+            if group in f:
+                del f[group]
+            root = f.create_group(group)
+        else:
+            root = f
+            for k in _OWNED:
+                if k in root:
+                    del root[k]
+
+        def create(grp, name, data, chunks):
+            return grp.create_dataset(name, data=data, chunks=chunks,
+                                      compression=compression, shuffle=True)
+
+        _write(exp, root, create, chunks)
+
+
+def to_zarr(exp, path, group='/', chunks=CHUNKS):
+    """ Writes Experiment to a Zarr store.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+    path :      str
+                Path to Zarr store. Will be created if it does not exist.
+    group :     str, optional
+                Group to write to. Use this to store multiple experiments in
+                the same store. Existing data in the group is replaced. If
+                writing to the root, only data previously written by pyfim
+                is replaced - other groups are kept.
+    chunks :    tuple, optional
+                Chunk size as (frames, objects).
+
+    """
+    if zarr is None:
+        raise ImportError('Exporting to Zarr requires zarr: pip install zarr')
+
+    store = zarr.open_group(path, mode='a')
+    if group not in ['/', '']:
+        root = store.require_group(group.strip('/'))
+        owned = list(root.keys())
+    else:
+        root = store
+        owned = [ k for k in _OWNED if k in root ]
+
+    for k in owned:
+        del root[k]
+
+    def create(grp, name, data, chunks):
+        # Let zarr pick chunks if none given
+        kwargs = dict( chunks=chunks ) if chunks else {}
+        # zarr >= 3 uses `create_array`
+        if hasattr(grp, 'create_array'):
+            return grp.create_array(name, data=data, overwrite=True, **kwargs)
+        return grp.create_dataset(name, data=data, overwrite=True, **kwargs)
+
+    _write(exp, root, create, chunks)
+
+
+def read_hdf5(path, group='/', parameters=None, objects=None):
+    """ Reads Experiment from HDF5 file.
+
+    Only chunks containing the requested parameters and objects are read.
+
+    Parameters
+    ----------
+    path :          str
+                    HDF5 file.
+    group :         str, optional
+                    Group to read from.
+    parameters :    list of str, optional
+                    Parameters and/or analyses to load. If None, will load
+                    everything.
+    objects :       list of str, optional
+                    Objects to load. If None, will load all objects.
+
+    Returns
+    -------
+    pyfim.Experiment
+
+    """
+    if h5py is None:
+        raise ImportError('Reading from HDF5 requires h5py: pip install h5py')
+
+    with h5py.File(path, 'r') as f:
+        return _read(f[group], parameters, objects)
+
+
+def read_zarr(path, group='/', parameters=None, objects=None):
+    """ Reads Experiment from Zarr store.
+
+    Only chunks containing the requested parameters and objects are read.
+
+    Parameters
+    ----------
+    path :          str
+                    Path to Zarr store.
+    group :         str, optional
+                    Group to read from.
+    parameters :    list of str, optional
+                    Parameters and/or analyses to load. If None, will load
+                    everything.
+    objects :       list of str, optional
+                    Objects to load. If None, will load all objects.
+
+    Returns
+    -------
+    pyfim.Experiment
+
+    """
+    if zarr is None:
+        raise ImportError('Reading from Zarr requires zarr: pip install zarr')
+
+    root = zarr.open_group(path, mode='r')
+    if group not in ['/', '']:
+        root = root[group.strip('/')]
+
+    return _read(root, parameters, objects)
+
+
+def _write(exp, root, create, chunks):
+    """ Writes experiment into (HDF5 or Zarr) group using `create`. """
+    objects = list( exp.objects )
+    positions = { o: i for i, o in enumerate(objects) }
+
+    root.attrs['class'] = type(exp).__name__
+    root.attrs['objects'] = json.dumps( objects )
+    root.attrs['original_params'] = json.dumps( list(exp._original_params) )
+    root.attrs['units'] = json.dumps( getattr(exp, 'units', {}) )
+
+    params = root.create_group('parameters')
+    analyses = root.create_group('analyses')
+    index = root.create_group('index')
+
+    scalars = {}
+    for p in exp.parameters:
+        values = getattr(exp, p)
+        grp = params if p in exp._original_params else analyses
+
+        if isinstance(values, (pd.DataFrame, pd.Series)):
+            data = np.asarray( values.values, dtype=float )
+            # Align chunks with frame and object blocks
+            this_chunks = tuple( max(1, min(c, s)) for c, s in zip(chunks if data.ndim == 2 else chunks[1:], data.shape) )
+            ds = create(grp, p, data, this_chunks if data.size else None)
+
+            if isinstance(values, pd.DataFrame):
+                # Columns that are not objects (e.g. "PI") are stored by name
+                ds.attrs['columns'] = json.dumps( [ positions.get(c, c) for c in values.columns ] )
+                # Frames are not necessarily contiguous -> store labels
+                create(index, p, np.asarray( values.index, dtype=np.int64 ), this_chunks[:1] if data.size else None)
+            else:
+                ds.attrs['columns'] = json.dumps( [ positions.get(c, c) for c in values.index ] )
+        else:
+            scalars[p] = float(values)
+
+    analyses.attrs['scalars'] = json.dumps( scalars )
+
+
+def _read(root, parameters=None, objects=None):
+    """ Reads experiment from (HDF5 or Zarr) group. """
+    all_objects = json.loads( root.attrs['objects'] )
+    original_params = json.loads( root.attrs['original_params'] )
+    scalars = json.loads( root['analyses'].attrs['scalars'] )
+
+    if not isinstance(objects, type(None)):
+        if not isinstance(objects, (list, np.ndarray, set)):
+            objects = [ objects ]
+        missing = set(objects) - set(all_objects)
+        if missing:
+            raise ValueError('Object(s) not found: {0}'.format( ', '.join( sorted(missing) ) ))
+        keep = [ all_objects.index(o) for o in objects ]
+    else:
+        keep = None
+
+    exp_class = getattr( core, root.attrs['class'], core.Experiment )
+    exp = exp_class.__new__( exp_class )
+    core.Experiment.__init__( exp, None )
+    # Files written before units were recorded have no units
+    exp.units = json.loads( root.attrs['units'] ) if 'units' in root.attrs else {}
+
+    available = list( root['parameters'].keys() ) + list( root['analyses'].keys() ) + list( scalars )
+    if isinstance(parameters, type(None)):
+        parameters = available
+    elif isinstance(parameters, str):
+        parameters = [ parameters ]
+
+    missing = set(parameters) - set(available)
+    if missing:
+        raise ValueError('Parameter(s) not found: {0}'.format( ', '.join( sorted(missing) ) ))
+
+    for p in parameters:
+        if p in scalars:
+            setattr(exp, p, scalars[p])
+        else:
+            grp = root['parameters'] if p in root['parameters'] else root['analyses']
+            frames = root['index'][p][...] if 'index' in root and p in root['index'] else None
+            setattr(exp, p, _read_dataset( grp[p], all_objects, keep, frames ))
+
+        if p in original_params:
+            exp._original_params.append( p )
+        exp.parameters.append( p )
+
+    exp.parameters = sorted( exp.parameters )
+
+    return exp
+
+
+def _read_dataset(ds, all_objects, keep=None, frames=None):
+    """ Reads DataFrame/Series from dataset. If `keep` (set of object
+    positions) is given, only chunks of these columns are read. `frames` are
+    the frame labels of 2d datasets.
+    """
+    columns = json.loads( ds.attrs['columns'] )
+
+    if isinstance(keep, type(None)):
+        cols = np.arange( len(columns) )
+    else:
+        # Columns that are not objects (e.g. "PI") are always kept
+        cols = np.array( [ i for i, c in enumerate(columns) if not isinstance(c, int) or c in keep ], dtype=int )
+
+    labels = [ all_objects[c] if isinstance(c, int) else c for c in np.array(columns, dtype=object)[cols] ]
+
+    # Return objects in the requested order
+    if not isinstance(keep, type(None)):
+        order = [ all_objects[k] for k in keep ]
+        order = [ c for c in labels if c not in order ] + [ c for c in order if c in labels ]
+
+    if len(ds.shape) == 1:
+        if len(cols) == len(columns):
+            data = ds[...]
+        else:
+            data = ds.get_orthogonal_selection( (cols, ) ) if hasattr(ds, 'get_orthogonal_selection') else ds[ list(cols) ]
+        data = pd.Series( data, index=labels )
+        return data if isinstance(keep, type(None)) else data[ order ]
+
+    if len(cols) == len(columns):
+        data = ds[...]
+    elif hasattr(ds, 'get_orthogonal_selection'):
+        data = ds.get_orthogonal_selection( (slice(None), cols) )
+    else:
+        # h5py requires increasing indices
+        data = ds[ :, list(cols) ] if len(cols) else np.zeros( (ds.shape[0], 0) )
+
+    if isinstance(frames, type(None)):
+        # Files written before frame labels were stored
+        start = int( ds.attrs.get('index_start', 0) )
+        frames = range(start, start + data.shape[0])
+
+    data = pd.DataFrame( data, columns=labels, index=frames )
+    return data if isinstance(keep, type(None)) else data[ order ]
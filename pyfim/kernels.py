@@ -0,0 +1,255 @@
+#    This code is part of pyFIM (http://www.github.com/schlegelp/pyfim), a
+#    package to analyze FIMTrack data (fim.uni-muenster.de). For full
+#    acknowledgments and references, please see the GitHub repository.
+#
+#    Copyright (C) 2018 Philipp Schlegel
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+""" Low-level kernels for the sequential, per-frame parts of the analyses.
+
+If `Numba <http://numba.pydata.org>`_ is installed (and `USE_NUMBA` is True
+in the config), these kernels are JIT-compiled on first use. Otherwise,
+the reference NumPy/pandas implementations are used.
+"""
+
+import numpy as np
+import pandas as pd
+
+import peakutils
+
+from pyfim import config
+defaults = config.default_parameters
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _njit(func):
+    """ Compiles function if numba is available. Compiled code is cached on
+    disk so that only the first import pays for compilation.
+    """
+    if numba is None:
+        return None
+    return numba.njit(nogil=True, cache=True)(func)
+
+
+def use_numba():
+    """ Returns True if compiled kernels are available and enabled. """
+    return numba is not None and defaults.get('USE_NUMBA', True)
+
+
+def _phases_loop(x, mode, min_len):
+    """ Extracts (start, end) of phases from array of 0/1 (no NaNs).
+
+    `mode`: 1 = ON phases, 0 = OFF phases, -1 = all phases.
+    """
+    n = x.shape[0]
+    out = np.empty((n, 2), dtype=np.int64)
+    k = 0
+    start = 0
+    for i in range(1, n + 1):
+        if i == n or x[i] != x[start]:
+            if ( mode < 0 or x[start] == mode ) and ( i - start ) >= min_len:
+                out[k, 0] = start
+                out[k, 1] = i
+                k += 1
+            start = i
+    return out[:k]
+
+
+def _peaks_loop(y, thres):
+    """ Loop version of :func:`peakutils.indexes` for `thres_abs=False`. """
+    n = y.shape[0]
+    if n < 2:
+        return np.empty(0, dtype=np.int64)
+
+    y_min = y.min()
+    thres = thres * ( y.max() - y_min ) + y_min
+
+    dy = np.empty(n - 1)
+    for i in range(n - 1):
+        dy[i] = y[i + 1] - y[i]
+
+    # Check if signal is totally flat
+    if np.all(dy == 0):
+        return np.empty(0, dtype=np.int64)
+
+    # Propagate neighbouring values into plateaus (runs of zeros in dy)
+    fixed = dy.copy()
+    i = 0
+    while i < n - 1:
+        if dy[i] != 0:
+            i += 1
+            continue
+        a = i
+        while i < n - 1 and dy[i] == 0:
+            i += 1
+        b = i - 1
+        if a == 0:
+            fixed[a:b + 1] = dy[b + 1]
+        elif b == n - 2:
+            fixed[a:b + 1] = dy[a - 1]
+        else:
+            median = ( a + b ) / 2
+            for k in range(a, b + 1):
+                if k < median:
+                    fixed[k] = dy[a - 1]
+                else:
+                    fixed[k] = dy[b + 1]
+    dy = fixed
+
+    # Find peaks using the first order difference
+    peaks = np.empty(n, dtype=np.int64)
+    n_peaks = 0
+    for i in range(1, n - 1):
+        if dy[i] < 0 and dy[i - 1] > 0 and y[i] > thres:
+            peaks[n_peaks] = i
+            n_peaks += 1
+
+    return peaks[:n_peaks]
+
+
+def _min_dist_loop(highest, n, min_dist):
+    """ Removes peaks too close to a higher peak. `highest` are the peak
+    indices ordered by descending amplitude.
+    """
+    rem = np.ones(n, dtype=np.bool_)
+    rem[highest] = False
+    for peak in highest:
+        if not rem[peak]:
+            rem[max(0, peak - min_dist):peak + min_dist + 1] = True
+            rem[peak] = False
+    return np.where(~rem)[0]
+
+
+_phases_jit = _njit(_phases_loop)
+_peaks_jit = _njit(_peaks_loop)
+_min_dist_jit = _njit(_min_dist_loop)
+
+
+def binary_phases(x, mode='ON', min_len=1):
+    """ Compiled counterpart of :func:`pyfim.analysis.binary_phases`.
+
+    Parameters
+    ----------
+    x :         np.ndarray
+                1-dimensional array of 0/1 without NaNs.
+    mode :      {'ON','OFF','ALL'}
+    min_len :   int
+
+    Returns
+    -------
+    np.ndarray
+                (N, 2) array of start and end indices.
+
+    """
+    mode = {'ON': 1, 'OFF': 0, 'ALL': -1}[mode]
+    return _phases_jit(np.ascontiguousarray(x, dtype=np.int64), mode, int(min_len))
+
+
+def fill_gaps(x, max_gap):
+    """ Closes short OFF gaps in thresholded (0/1) data. Only runs of zeros
+    of at most `max_gap` frames that have ON (> 0) frames directly on both
+    sides are filled - with the value of the preceding ON frame. Untracked
+    frames (NaN) are never filled and do not count as ON.
+
+    Runs are found for all columns at once using the first derivative.
+
+    Parameters
+    ----------
+    x :         np.ndarray
+                2d array (frames x columns). Modified in place.
+    max_gap :   int
+                Maximum size of gaps to fill.
+
+    Returns
+    -------
+    np.ndarray
+                `x` with gaps filled.
+
+    Examples
+    --------
+    >>> x = np.array([[0, 1, 1, 0, 0, 1, 1, 0]], dtype=float).T
+    >>> fill_gaps(x, 3).ravel()
+    array([0., 1., 1., 1., 1., 1., 1., 0.])
+
+    """
+    n_frames = x.shape[0]
+    if not n_frames or not max_gap:
+        return x
+
+    with np.errstate(invalid='ignore'):
+        on = x > 0
+        off = x == 0
+
+    # Start/end of OFF runs: +1 = start, -1 = end (exclusive). Transposing
+    # makes sure runs are ordered by column, then frame
+    padded = np.zeros( ( x.shape[1], n_frames + 2 ), dtype=np.int8 )
+    padded[:, 1:-1] = off.T
+    deriv = np.diff( padded, axis=1 )
+    col, start = np.nonzero( deriv == 1 )
+    end = np.nonzero( deriv == -1 )[1]
+
+    # Keep short gaps bounded by ON frames
+    keep = ( ( end - start ) <= max_gap ) & ( start > 0 ) & ( end < n_frames )
+    col, start, end = col[keep], start[keep], end[keep]
+    keep = on[ start - 1, col ] & on[ end, col ]
+    col, start, end = col[keep], start[keep], end[keep]
+
+    if not len(col):
+        return x
+
+    # Expand gaps to individual frames
+    lengths = end - start
+    frames = np.repeat( start - np.cumsum( np.r_[ 0, lengths[:-1] ] ), lengths ) + np.arange( lengths.sum() )
+    x[ frames, np.repeat( col, lengths ) ] = np.repeat( x[ start - 1, col ], lengths )
+
+    return x
+
+
+def peak_indexes(y, min_dist=1, thres=0.3):
+    """ Peak detection. Same as :func:`peakutils.indexes` (relative
+    threshold) which is used if numba is not available.
+
+    Parameters
+    ----------
+    y :         np.ndarray
+                1D amplitude data to search for peaks.
+    min_dist :  int
+                Minimum distance between detected peaks.
+    thres :     float between [0., 1.]
+                Normalized threshold.
+
+    Returns
+    -------
+    np.ndarray
+                Indices of peaks.
+
+    """
+    if not len(y):
+        return np.empty(0, dtype=np.int64)
+
+    if not use_numba():
+        return peakutils.indexes(y, thres=thres, min_dist=min_dist)
+
+    y = np.ascontiguousarray(y, dtype=float)
+    peaks = _peaks_jit(y, float(thres))
+
+    # Handle multiple peaks, respecting the minimum distance. Sorting is done
+    # by NumPy to break ties between peaks of equal height the same way.
+    if peaks.size > 1 and min_dist > 1:
+        highest = peaks[np.argsort(y[peaks])][::-1]
+        peaks = _min_dist_jit(highest, y.size, int(min_dist))
+
+    return peaks
@@ -0,0 +1,246 @@
+#    This code is part of pyFIM (http://www.github.com/schlegelp/pyfim), a
+#    package to analyze FIMTrack data (fim.uni-muenster.de). For full
+#    acknowledgments and references, please see the GitHub repository.
+#
+#    Copyright (C) 2018 Philipp Schlegel
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+""" Kinematics derived from the spine points (head, spinepoints 1-3, tail).
+
+All functions work on a single (frames, objects, 5, 2) array of points for
+all objects at once. Angles are in degrees.
+"""
+
+import numpy as np
+import pandas as pd
+
+from pyfim import core, config
+defaults = config.default_parameters
+
+# Spine points from head to tail
+SPINE_POINTS = ['head', 'spinepoint_1', 'spinepoint_2', 'spinepoint_3', 'tail']
+SPINE_PARAMS = [ '{0}_{1}'.format(p, c) for p in SPINE_POINTS for c in ['x', 'y'] ]
+
+# Names of the 4 segments between spine points (from head to tail)
+SEGMENTS = [ '{0}-{1}'.format(a, b) for a, b in zip(SPINE_POINTS[:-1], SPINE_POINTS[1:]) ]
+
+
+def spine_points(exp):
+    """ Collects spine points of all objects in a single array.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+
+    Returns
+    -------
+    points :    np.ndarray
+                (frames, objects, 5, 2) array of x/y coordinates for head,
+                spinepoint 1-3 and tail.
+    index :     pandas.Index
+                Frames.
+    columns :   pandas.Index
+                Objects.
+
+    """
+    if not isinstance(exp, core.Experiment):
+        raise TypeError('Need pyfim.Experiment, not {0}'.format(type(exp)))
+
+    missing = [ p for p in SPINE_PARAMS if p not in exp.parameters ]
+    if missing:
+        raise ValueError('Missing parameter(s): {0}'.format( ', '.join(missing) ))
+
+    ref = getattr(exp, SPINE_PARAMS[0])
+    index, columns = ref.index, ref.columns
+
+    points = np.empty( ( len(index), len(columns), len(SPINE_POINTS), 2 ) )
+    for i, p in enumerate( SPINE_PARAMS ):
+        points[ :, :, i // 2, i % 2 ] = getattr(exp, p).reindex( index=index, columns=columns ).values
+
+    return points, index, columns
+
+
+def _wrap(angles):
+    """ Wraps angles (degrees) to [-180, 180). """
+    return ( angles + 180 ) % 360 - 180
+
+
+def _segment_vectors(points):
+    """ Vectors pointing from the posterior to the anterior end of each
+    segment: (frames, objects, 4, 2).
+    """
+    return points[ :, :, :-1 ] - points[ :, :, 1: ]
+
+
+def _segment_angles(points):
+    """ Absolute angles (degrees) of each segment: (frames, objects, 4). """
+    vec = _segment_vectors( points )
+    return np.degrees( np.arctan2( vec[..., 1], vec[..., 0] ) )
+
+
+def segment_angles(exp):
+    """ Calculates the absolute angle of each body segment per frame.
+
+    Notes
+    -----
+    This is not an analysis (i.e. it is not in
+    ``pyfim.analysis.__kinematics__``): results have one column per segment
+    and object and can not be added to an Experiment as parameter.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+                Experiment holding the raw data.
+
+    Returns
+    -------
+    Segment angles [degrees] : pandas.DataFrame
+                Frames x (segment, object). Segments are named e.g.
+                "head-spinepoint_1". Angles are the direction in which the
+                segment points (from posterior to anterior end).
+
+    """
+    points, index, columns = spine_points( exp )
+    angles = _segment_angles( points )
+
+    # (frames, objects, segments) -> (frames, segments * objects)
+    angles = angles.transpose( 0, 2, 1 ).reshape( len(index), -1 )
+
+    return pd.DataFrame( angles, index=index,
+                         columns=pd.MultiIndex.from_product( [ SEGMENTS, columns ],
+                                                             names=['segment', 'object'] ) )
+
+
+def body_curvature(exp):
+    """ Calculates the curvature of the body per frame as the sum of the
+    (signed) angles between consecutive segments divided by the length of
+    the spine. Positive values = bent to the left (counter-clockwise).
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+                Experiment holding the raw data.
+
+    Returns
+    -------
+    Curvature [degrees/length unit] : pandas.DataFrame
+
+    """
+    points, index, columns = spine_points( exp )
+
+    angles = _segment_angles( points )
+    turning = _wrap( angles[..., :-1] - angles[..., 1:] ).sum( axis=2 )
+    length = np.linalg.norm( _segment_vectors( points ), axis=3 ).sum( axis=2 )
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        curvature = turning / length
+    curvature[ ~np.isfinite( curvature ) ] = np.nan
+
+    return pd.DataFrame( curvature, index=index, columns=columns )
+
+
+def head_angular_velocity(exp):
+    """ Calculates the angular velocity of head swings: change of the angle
+    between the head segment (spinepoint 1 -> head) and the body axis
+    (tail -> spinepoint 1) per second.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+                Experiment holding the raw data.
+
+    Returns
+    -------
+    Angular velocity [degrees/s] : pandas.DataFrame
+                First frame is NaN.
+
+    """
+    points, index, columns = spine_points( exp )
+
+    head = points[ :, :, 0 ] - points[ :, :, 1 ]
+    body = points[ :, :, 1 ] - points[ :, :, 4 ]
+    swing = np.degrees( np.arctan2( head[..., 1], head[..., 0] ) - np.arctan2( body[..., 1], body[..., 0] ) )
+
+    velocity = np.full( swing.shape, np.nan )
+    velocity[ 1: ] = _wrap( np.diff( swing, axis=0 ) ) * defaults['FPS']
+
+    return pd.DataFrame( velocity, index=index, columns=columns )
+
+
+def heading_change(exp):
+    """ Calculates the change in heading (direction of the body axis from
+    tail to head) between consecutive frames.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+                Experiment holding the raw data.
+
+    Returns
+    -------
+    Heading change [degrees/frame] : pandas.DataFrame
+                Positive = turning left (counter-clockwise). First frame is
+                NaN.
+
+    """
+    points, index, columns = spine_points( exp )
+
+    axis = points[ :, :, 0 ] - points[ :, :, 4 ]
+    heading = np.degrees( np.arctan2( axis[..., 1], axis[..., 0] ) )
+
+    change = np.full( heading.shape, np.nan )
+    change[ 1: ] = _wrap( np.diff( heading, axis=0 ) )
+
+    return pd.DataFrame( change, index=index, columns=columns )
+
+
+def tortuosity(exp):
+    """ Calculates the tortuosity of each object's path: length of the path
+    travelled by the body midpoint (spinepoint 2) divided by the distance
+    between its first and last position. 1 = straight line.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+                Experiment holding the raw data.
+
+    Returns
+    -------
+    Tortuosity : pandas.Series
+
+    """
+    if not isinstance(exp, core.Experiment):
+        raise TypeError('Need pyfim.Experiment, not {0}'.format(type(exp)))
+
+    x, y = exp.spinepoint_2_x, exp.spinepoint_2_y.reindex( columns=exp.spinepoint_2_x.columns )
+    mid = np.stack( [ x.values, y.values ], axis=2 )
+
+    tracked = ~np.isnan( mid ).any( axis=2 )
+    n_tracked = tracked.sum( axis=0 )
+
+    # Path length: untracked frames are filled with the previous position
+    # -> gaps count as a single step
+    mid[ ~tracked ] = np.nan
+    filled = pd.DataFrame( mid.reshape( len(x.index), -1 ) ).ffill().values.reshape( mid.shape )
+    path = np.nansum( np.linalg.norm( np.diff( filled, axis=0 ), axis=2 ), axis=0 )
+
+    # Net displacement between first and last tracked frame
+    cols = np.arange( mid.shape[1] )
+    first = np.argmax( tracked, axis=0 )
+    last = mid.shape[0] - 1 - np.argmax( tracked[::-1], axis=0 )
+    net = np.linalg.norm( mid[ last, cols ] - mid[ first, cols ], axis=1 )
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        tort = path / net
+    tort[ ( n_tracked < 2 ) | ~np.isfinite( tort ) ] = np.nan
+
+    return pd.Series( tort, index=x.columns )
@@ -0,0 +1,291 @@
+#    This code is part of pyFIM (http://www.github.com/schlegelp/pyfim), a
+#    package to analyze FIMTrack data (fim.uni-muenster.de). For full
+#    acknowledgments and references, please see the GitHub repository.
+#
+#    Copyright (C) 2018 Philipp Schlegel
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+""" Live readout of FIMTrack CSV files that are still being written.
+"""
+
+import os
+import re
+import time
+
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from pyfim import core, config
+defaults = config.default_parameters
+
+__all__ = ['LiveTail']
+
+
+class _GrowableArray:
+    """ Preallocated (frames x objects) array that grows by doubling its
+    capacity. Frames that have not been written are NaN.
+    """
+
+    def __init__(self, n_objects, capacity=1024):
+        self._data = np.full( (max(int(capacity), 1), n_objects), np.nan )
+        self.n_frames = 0
+
+    def put(self, frames, rows):
+        """ Writes rows at given frames. """
+        needed = int( frames.max() ) + 1
+        if needed > self._data.shape[0]:
+            capacity = max( needed, self._data.shape[0] * 2 )
+            grown = np.full( (capacity, self._data.shape[1]), np.nan )
+            grown[ :self.n_frames ] = self._data[ :self.n_frames ]
+            self._data = grown
+
+        self._data[ frames ] = rows
+        self.n_frames = max( self.n_frames, needed )
+
+    @property
+    def values(self):
+        """ View of the filled part of the array. """
+        return self._data[ :self.n_frames ]
+
+
+class LiveTail:
+    """ Follows a FIMTrack CSV file while it is being written.
+
+    New rows are parsed as they arrive and stored in preallocated arrays
+    that grow as needed. Running per-object metrics are updated with each
+    batch of rows without re-reading the file:
+
+        - `distance`: accumulated distance (sum of `mom_dst`)
+        - `velocity`: mean velocity
+        - `stops`: number of stops (phases of at least `MIN_STOP_PHASE`
+          frames in which `go_phase` is zero), counted with a running
+          run-length state machine
+        - `stop_frequency`: stops per second of tracked `go_phase`
+
+    Parameters
+    ----------
+    f :         str
+                FIMTrack CSV file. Does not need to exist yet.
+    capacity :  int, optional
+                Number of frames to preallocate per parameter.
+
+    Examples
+    --------
+    >>> tail = pyfim.LiveTail('/data/recording.csv')
+    >>> for batch in tail.follow(interval=5, timeout=60):
+    ...     print(tail.metrics)
+    >>> # Convert to a full Experiment once the recording is finished
+    >>> exp = tail.to_experiment()
+
+    """
+
+    def __init__(self, f, capacity=1024):
+        self.filename = f
+        self.capacity = capacity
+
+        self.objects = None
+        self.store = {}
+
+        self._offset = 0
+        self._remainder = ''
+        self._label_re = re.compile(r'(.*?)\((\d+)\)')
+
+        # Running metrics (set up once the header is known)
+        self._running = None
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __repr__(self):
+        return '{0} following "{1}": {2} objects; {3} parameters'.format(type(self),
+                                                                          self.filename,
+                                                                          len(self.objects) if self.objects else 0,
+                                                                          len(self.store))
+
+    @property
+    def parameters(self):
+        """ Parameters received so far. """
+        return sorted( self.store )
+
+    def _init_objects(self, header):
+        """ Sets up objects and running metrics from the header line. """
+        n_objects = len( header.rstrip('\r\n').split( defaults['DELIMITER'] ) ) - 1
+        self.objects = [ 'object_{0}'.format(i) for i in range(n_objects) ]
+
+        self._running = dict( dst=np.zeros(n_objects),
+                              vel_sum=np.zeros(n_objects),
+                              vel_n=np.zeros(n_objects),
+                              go_n=np.zeros(n_objects),
+                              off_run=np.zeros(n_objects, dtype=int),
+                              stops=np.zeros(n_objects, dtype=int) )
+
+    def poll(self):
+        """ Reads new rows from the file.
+
+        Returns
+        -------
+        dict
+                    New rows per parameter as {parameter: (frames, values)}.
+                    Empty if nothing new arrived.
+
+        """
+        if not os.path.isfile(self.filename):
+            return {}
+
+        with open(self.filename, 'r') as fh:
+            fh.seek( self._offset )
+            chunk = fh.read()
+            self._offset = fh.tell()
+
+        # Only process complete lines
+        chunk = self._remainder + chunk
+        cut = chunk.rfind('\n') + 1
+        chunk, self._remainder = chunk[ :cut ], chunk[ cut: ]
+
+        if not chunk:
+            return {}
+
+        if isinstance(self.objects, type(None)):
+            header, chunk = chunk.split('\n', 1)
+            self._init_objects( header )
+            if not chunk:
+                return {}
+
+        rows = pd.read_csv( StringIO(chunk), sep=defaults['DELIMITER'], header=None,
+                            index_col=0, names=[ 'label' ] + self.objects )
+
+        labels = rows.index.to_series().str.extract( self._label_re )
+        params = labels[0].values
+        frames = labels[1].values.astype(int)
+        values = rows.values.astype(float)
+
+        batch = {}
+        for p in pd.unique( params ):
+            is_p = params == p
+            batch[p] = ( frames[ is_p ], values[ is_p ] )
+
+            if p not in self.store:
+                self.store[p] = _GrowableArray( len(self.objects), self.capacity )
+            self.store[p].put( *batch[p] )
+
+            self._update_metrics( p, values[ is_p ] )
+
+        return batch
+
+    def _update_metrics(self, p, rows):
+        """ Updates running metrics with new rows of parameter `p`. """
+        r = self._running
+
+        if p == 'mom_dst':
+            r['dst'] += np.nansum( rows, axis=0 )
+        elif p == 'velocity':
+            r['vel_sum'] += np.nansum( rows, axis=0 )
+            r['vel_n'] += ( ~np.isnan( rows ) ).sum( axis=0 )
+        elif p == 'go_phase':
+            # Run-length state machine: NaNs (untracked frames) are skipped
+            for row in rows:
+                tracked = ~np.isnan( row )
+                is_off = tracked & ( row == 0 )
+                is_on = tracked & ~is_off
+
+                r['go_n'] += tracked
+                r['off_run'][ is_off ] += 1
+                r['off_run'][ is_on ] = 0
+
+                # Count a stop the moment its OFF run reaches the minimum length
+                r['stops'] += is_off & ( r['off_run'] == max( 1, defaults['MIN_STOP_PHASE'] ) )
+
+    @property
+    def metrics(self):
+        """ Running per-object metrics as pandas.DataFrame. """
+        if isinstance(self._running, type(None)):
+            return pd.DataFrame()
+
+        r = self._running
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame( dict( distance=r['dst'],
+                                       velocity=r['vel_sum'] / r['vel_n'],
+                                       stops=r['stops'],
+                                       stop_frequency=r['stops'] / ( r['go_n'] / defaults['FPS'] ),
+                                       n_frames=r['go_n'].astype(int) ),
+                                 index=self.objects )
+
+    def data(self, p):
+        """ Returns data received so far for given parameter.
+
+        Parameters
+        ----------
+        p :     str
+                Parameter, e.g. "mom_x".
+
+        Returns
+        -------
+        pandas.DataFrame
+                Frames x objects. Shares memory with the internal store.
+
+        """
+        if p not in self.store:
+            raise ValueError('No data for parameter "{0}" received yet.'.format(p))
+
+        return pd.DataFrame( self.store[p].values, columns=self.objects, copy=False )
+
+    def follow(self, interval=1, timeout=None):
+        """ Polls the file in regular intervals.
+
+        Parameters
+        ----------
+        interval :  int | float, optional
+                    Seconds between polls.
+        timeout :   int | float, optional
+                    Stop after this many seconds without new data. If None,
+                    will run until interrupted.
+
+        Yields
+        ------
+        dict
+                    New rows per parameter (see :func:`~pyfim.LiveTail.poll`).
+
+        """
+        last_data = time.time()
+        while True:
+            batch = self.poll()
+            if batch:
+                last_data = time.time()
+                yield batch
+            elif timeout and ( time.time() - last_data ) > timeout:
+                return
+            else:
+                time.sleep( interval )
+
+    def to_experiment(self):
+        """ Turns data received so far into a :class:`~pyfim.Experiment`
+        (incl. clean-up and analyses).
+        """
+        if not self.store:
+            raise ValueError('No data received yet.')
+
+        index, blocks = [], []
+        for p in self.parameters:
+            values = self.store[p].values
+            index += [ '{0}({1})'.format(p, i) for i in range( values.shape[0] ) ]
+            blocks.append( values )
+
+        exp = core.Experiment(None)
+        exp.raw_data = pd.DataFrame( np.concatenate( blocks, axis=0 ),
+                                     index=index,
+                                     columns=self.objects )
+        exp.extract_data()
+        del exp.raw_data
+
+        return exp
@@ -0,0 +1,350 @@
+#    This code is part of pyFIM (http://www.github.com/schlegelp/pyfim), a
+#    package to analyze FIMTrack data (fim.uni-muenster.de). For full
+#    acknowledgments and references, please see the GitHub repository.
+#
+#    Copyright (C) 2018 Philipp Schlegel
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+""" Declarative processing pipeline with on-disk checkpoints.
+
+The default pipeline has the same stages as :class:`~pyfim.Experiment`:
+
+    read -> merge -> extract -> stitch -> clean -> analyze
+
+Each stage gets the Experiment produced by the previous stage. If a cache
+directory is given, the output of checkpointed stages is written to disk
+under a key derived from the input files, the load parameters, the stages
+run so far (incl. the code of their functions), the config values each of
+them depends on and the pyfim version. On the next
+run, processing resumes from the last checkpoint whose key still matches.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+import pyfim
+from pyfim import core, config
+from pyfim import analysis as fim_analysis
+from pyfim import stitching as fim_stitching
+defaults = config.default_parameters
+
+__all__ = ['Pipeline', 'Stage']
+
+
+class Stage:
+    """ A single processing step.
+
+    Parameters
+    ----------
+    name :          str
+                    Unique name of this stage.
+    func :          callable
+                    Function that takes an Experiment and returns it (or
+                    None if it modifies the Experiment in place).
+    config :        list of str, optional
+                    Config parameters (see ``pyfim.defaults``) this stage
+                    depends on. If None, stage depends on all of them.
+    checkpoint :    bool, optional
+                    If True, output of this stage is written to the cache
+                    directory (if the pipeline has one).
+    version :       str | int, optional
+                    Bump this to invalidate checkpoints, e.g. if `func`
+                    depends on code that is not part of its own body.
+
+    """
+
+    def __init__(self, name, func, config=None, checkpoint=False, version=None):
+        self.name = name
+        self.func = func
+        self.config = config
+        self.checkpoint = checkpoint
+        self.version = version
+
+    def __repr__(self):
+        return '{0} "{1}" (checkpoint={2})'.format(type(self), self.name, self.checkpoint)
+
+    def key(self):
+        """ Returns JSON-serializable description of this stage (incl. the
+        values of the config parameters it depends on, the code of its
+        function and the pyfim version).
+        """
+        keys = sorted( defaults ) if isinstance(self.config, type(None)) else sorted( self.config )
+
+        return dict( name=self.name,
+                     func='{0}.{1}'.format( getattr(self.func, '__module__', ''),
+                                            getattr(self.func, '__qualname__', repr(self.func)) ),
+                     code=_code_hash( self.func ),
+                     version=self.version,
+                     pyfim=pyfim.__version__,
+                     config={ k: defaults.get(k) for k in keys } )
+
+
+class Pipeline:
+    """ Processing pipeline with named stages and optional checkpoints.
+
+    Parameters
+    ----------
+    cache_dir :     str, optional
+                    Directory for checkpoints. If None, nothing is cached.
+    keep_raw :      bool, optional
+                    If False, raw data is dropped after the "extract" stage.
+    cls :           pyfim.Experiment | pyfim.TwoChoiceExperiment, optional
+                    Class of the Experiment to generate. For two-choice
+                    experiments, a "two_choice" stage is added.
+
+    Examples
+    --------
+    >>> pl = pyfim.pipeline.Pipeline(cache_dir='~/.pyfim_cache')
+    >>> # Add a custom filter before the analyses
+    >>> def drop_slow(exp):
+    ...     fast = exp.velocity.mean() > 1
+    ...     for p in exp._original_params:
+    ...         values = getattr(exp, p)
+    ...         setattr(exp, p, values[ values.columns[ fast[values.columns].values ] ])
+    >>> pl.add_stage('drop_slow', drop_slow, before='analyze', config=[])
+    >>> exp = pl.run('users/data/genotype1')
+    >>> # Changing an analysis parameter resumes from the last checkpoint
+    >>> # ("drop_slow" is not checkpointed -> from "clean")
+    >>> pyfim.defaults['MIN_STOP_PHASE'] = 5
+    >>> exp = pl.run('users/data/genotype1')
+
+    """
+
+    def __init__(self, cache_dir=None, keep_raw=False, cls=None):
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.keep_raw = keep_raw
+        self.cls = cls if not isinstance(cls, type(None)) else core.Experiment
+
+        self.stages = [ Stage('read', _read, config=['DELIMITER']),
+                        Stage('merge', _merge, config=[]),
+                        Stage('extract', self._extract,
+                              config=['PIXEL2MM', 'PIXEL_PER_MM', 'SPATIAL_PARAMS', 'AREA_PARAMS'],
+                              checkpoint=True),
+                        Stage('stitch', _stitch,
+                              config=['STITCH_TRACKS', 'STITCH_MAX_GAP', 'STITCH_MAX_DISTANCE']),
+                        Stage('clean', _clean,
+                              config=['REMOVE_NANS', 'MIN_TRACK_LENGTH', 'CUT_TABLE_HEAD',
+                                      'CUT_TABLE_TAIL', 'FILL_GAPS', 'MAX_GAP_SIZE',
+                                      'THRESHOLDED_PARAMS', 'MASK_CONTACTS', 'CONTACT_DISTANCE',
+                                      'CONTACT_PADDING'],
+                              checkpoint=True),
+                        Stage('analyze', _analyze, checkpoint=True) ]
+
+        if issubclass( self.cls, core.TwoChoiceExperiment ):
+            self.stages.append( Stage('two_choice', _two_choice, checkpoint=True) )
+
+    def __repr__(self):
+        return '{0}: {1}'.format( type(self), ' -> '.join( [ s.name for s in self.stages ] ) )
+
+    @property
+    def names(self):
+        """ Names of stages in order of execution. """
+        return [ s.name for s in self.stages ]
+
+    def add_stage(self, name, func, before=None, after=None, config=None, checkpoint=False,
+                  version=None):
+        """ Adds a stage. See :class:`~pyfim.pipeline.Stage` for parameters.
+
+        Parameters
+        ----------
+        before, after : str, optional
+                        Name of the stage to insert the new stage before/after.
+                        If neither is given, the stage is appended.
+
+        """
+        if name in self.names:
+            raise ValueError('Stage "{0}" already exists'.format(name))
+
+        if before and after:
+            raise ValueError('Please provide either `before` or `after`, not both')
+
+        stage = Stage( name, func, config=config, checkpoint=checkpoint, version=version )
+
+        if before:
+            self.stages.insert( self._index(before), stage )
+        elif after:
+            self.stages.insert( self._index(after) + 1, stage )
+        else:
+            self.stages.append( stage )
+
+    def remove_stage(self, name):
+        """ Removes stage by name. """
+        self.stages.pop( self._index(name) )
+
+    def _index(self, name):
+        if name not in self.names:
+            raise ValueError('No stage "{0}". Available stages: {1}'.format( name, ', '.join(self.names) ))
+        return self.names.index(name)
+
+    def keys(self, f, include_subfolders=False, parameters=None):
+        """ Returns checkpoint keys for each stage. Returns None for all
+        stages if input can not be cached (e.g. file objects).
+        """
+        files = core._parse_files(f, include_subfolders)
+
+        if not all( [ isinstance(fn, str) for fn in files ] ):
+            return [ None ] * len(self.stages)
+
+        # Input is identified by path, size and modification time
+        inputs = [ ( os.path.abspath(fn), os.path.getsize(fn), os.path.getmtime(fn) ) for fn in files ]
+
+        keys, previous = [], dict( inputs=inputs,
+                                   parameters=parameters,
+                                   cls=self.cls.__name__,
+                                   keep_raw=self.keep_raw )
+        for stage in self.stages:
+            previous = dict( previous=previous, stage=stage.key() )
+            keys.append( hashlib.sha1( json.dumps( previous, sort_keys=True, default=str ).encode() ).hexdigest() )
+
+        return keys
+
+    def _checkpoint_file(self, stage, key):
+        return os.path.join( self.cache_dir, '{0}_{1}.pkl'.format( stage.name, key[:16] ) )
+
+    def run(self, f, include_subfolders=False, parameters=None):
+        """ Runs the pipeline.
+
+        Parameters
+        ----------
+        f :                 {filename, folder, file object}
+                                Provide either:
+                                    - a CSV file name
+                                    - a CSV file object
+                                    - single folder
+                                    - list of the above
+        include_subfolders : bool, optional
+                             If True and folder is provided, will also search
+                             subfolders for .csv files.
+        parameters :        list of str, optional
+                            If provided, will only load these FIMTrack
+                            parameters.
+
+        Returns
+        -------
+        pyfim.Experiment
+
+        """
+        keys = self.keys(f, include_subfolders, parameters) if self.cache_dir else [ None ] * len(self.stages)
+
+        # Find the last valid checkpoint
+        exp, start = None, 0
+        for i in reversed( range( len(self.stages) ) ):
+            stage = self.stages[i]
+            if not stage.checkpoint or isinstance(keys[i], type(None)):
+                continue
+            fn = self._checkpoint_file( stage, keys[i] )
+            if os.path.isfile( fn ):
+                with open(fn, 'rb') as fh:
+                    exp = pickle.load(fh)
+                start = i + 1
+                core.module_logger.info('Resuming from checkpoint "{0}"'.format( stage.name ))
+                break
+
+        if isinstance(exp, type(None)):
+            files = core._parse_files(f, include_subfolders)
+            if len(files) == 0:
+                raise ValueError('No files found')
+
+            exp = self.cls.__new__( self.cls )
+            core.Experiment.__init__( exp, None )
+            exp._source = f
+            exp._include_subfolders = include_subfolders
+            exp._load_params = parameters
+            exp._files = list( files )
+
+        for i in range( start, len(self.stages) ):
+            stage = self.stages[i]
+            res = stage.func( exp )
+            if not isinstance(res, type(None)):
+                exp = res
+
+            if stage.checkpoint and not isinstance(keys[i], type(None)):
+                os.makedirs( self.cache_dir, exist_ok=True )
+                with open( self._checkpoint_file( stage, keys[i] ), 'wb' ) as fh:
+                    pickle.dump( exp, fh, protocol=pickle.HIGHEST_PROTOCOL )
+
+        return exp
+
+    def clear_cache(self):
+        """ Deletes all checkpoints of this pipeline's stages. """
+        if not self.cache_dir or not os.path.isdir( self.cache_dir ):
+            return
+
+        prefixes = tuple( '{0}_'.format(n) for n in self.names )
+        for fn in os.listdir( self.cache_dir ):
+            if fn.endswith('.pkl') and fn.startswith( prefixes ):
+                os.remove( os.path.join( self.cache_dir, fn ) )
+
+    def _extract(self, exp):
+        exp._extract_parameters()
+        if not self.keep_raw:
+            del exp.raw_data
+
+
+def _code_hash(func):
+    """ Hashes the byte code and constants of a function (incl. nested
+    functions) so that editing it invalidates its checkpoints. Returns None
+    for callables without Python code.
+    """
+    code = getattr( getattr(func, '__func__', func), '__code__', None )
+    if isinstance(code, type(None)):
+        return None
+
+    h = hashlib.sha1()
+
+    def update(c):
+        h.update( c.co_code )
+        h.update( repr( c.co_names ).encode() )
+        for const in c.co_consts:
+            if hasattr(const, 'co_code'):
+                update( const )
+            else:
+                h.update( repr( const ).encode() )
+
+    update( code )
+
+    return h.hexdigest()
+
+
+def _read(exp):
+    """ Reads CSV files. """
+    exp._raw_parts = [ core._read_csv(fn, exp._load_params) for fn in exp._files ]
+
+
+def _merge(exp):
+    """ Merges data from individual files. """
+    exp._merge_raw( exp._raw_parts )
+    exp._n_raw_objects = exp.raw_data.shape[1]
+    del exp._raw_parts
+
+
+def _stitch(exp):
+    """ Stitches fragmented tracks (if `STITCH_TRACKS` is True). """
+    if defaults['STITCH_TRACKS']:
+        fim_stitching.stitch_tracks(exp)
+
+
+def _clean(exp):
+    """ Cleans up data. """
+    exp.clean_data()
+
+
+def _analyze(exp):
+    """ Runs per-object analyses. """
+    exp.run_analyses( fim_analysis.__all__ )
+
+
+def _two_choice(exp):
+    """ Runs two-choice analyses. """
+    exp.two_choice_analyses()
@@ -23,6 +23,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 from matplotlib.collections import LineCollection
+from matplotlib.colors import LogNorm
 
 
 def plot_parameters(coll, param=None, **kwargs):
@@ -101,9 +102,13 @@ def plot_parameters(coll, param=None, **kwargs):
     return axes
 
 
-def plot_tracks(exp, obj=None, ax=None, **kwargs):
+def plot_tracks(exp, obj=None, ax=None, stride=1, max_segments=None, **kwargs):
     """ Plots traces of tracked objects.
 
+    Notes
+    -----
+    Each frame of an object is drawn as a line from tail over the spine points
+    to the head. All lines are added to the axis as a single LineCollection.
 
     Parameters
     ----------
@@ -113,8 +118,13 @@ def plot_tracks(exp, obj=None, ax=None, **kwargs):
             Experiment.
     ax :    matplotlib.Axes, optional
             Ax to plot on. If not provided, will create a new one.
+    stride : int, optional
+             Only plot every Nth frame.
+    max_segments : int, optional
+                   Level of detail: if provided, `stride` is increased such
+                   that at most about this many lines are drawn.
     **kwargs
-            Will be passed to ax.plot()
+            Will be passed to matplotlib.collections.LineCollection
 
     Returns
     -------
@@ -132,70 +142,99 @@ def plot_tracks(exp, obj=None, ax=None, **kwargs):
         obj = [ obj ]
 
     # Make sure objects actually exists
-    for ob in obj:
-        if ob not in exp.objects:
-            raise ValueError('"{0}" not found in Experiment'.format(ob))
+    missing = set( obj ) - set( exp.objects )
+    if missing:
+        raise ValueError('"{0}" not found in Experiment'.format( sorted(missing)[0] ))
 
     # Make figure
     if not ax:
         fig, ax = plt.subplots()
         ax.set_aspect('equal')
 
-    # Prepare default colors
-    colors = plt.get_cmap('tab10').colors
-    # Multiply palette if necessary
-    colors *= math.ceil( len(obj) / len(colors) )
+    # Decimate frames before pulling coordinates -> only the frames we draw
+    # are copied
+    if max_segments:
+        stride = max( stride, math.ceil( len(obj) * exp.n_frames / max_segments ) )
+    stride = max( int(stride), 1 )
 
-    # Plot objects
-    for i, ob in enumerate( [ exp[ob] for ob in obj ] ):
-        defaults_lin = dict(
-                            color=colors[i],
-                            linewidth=.5,
-                            )
-        defaults_lin.update(kwargs)
-
-        # Subset to relevant parameters and drop empty frames
-        ob = ob[[
-                 'head_x','head_y',
-                 'spinepoint_1_x','spinepoint_1_y',
-                 'spinepoint_2_x','spinepoint_2_y',
-                 'spinepoint_3_x','spinepoint_3_y',
-                 'tail_x','tail_y',
-                 ]].dropna(how='any', axis=0)
-
-        # Extract x coordinates for each frame
-        lines_x = ob[['tail_x',
-                      'spinepoint_3_x',
-                      'spinepoint_2_x',
-                      'spinepoint_1_x',
-                      'head_x']].values
-
-        # Extract y coordinates for each frame
-        lines_y = ob[['tail_y',
-                      'spinepoint_3_y',
-                      'spinepoint_2_y',
-                      'spinepoint_1_y',
-                      'head_y']].values
-
-        # Merge x and y coordinates
-        lines_xy = [ list(  zip(l_x,l_y) ) for l_x,l_y in zip(lines_x,lines_y) ]
-
-        # Turn all lines into a collection
-        lc = LineCollection( lines_xy, **defaults_lin )
-
-        # Addd line collection to axis
-        ax.add_collection(lc)
-
-        """
-        # Indicate start with an "s"
-        ax.text( x.dropna().iloc[0],
-                 y.dropna().iloc[0],
-                 'S',
-                 color=defaults_lin['c']
-                )
-        """
+    def coords(param):
+        values = getattr(exp, param)
+        return values.values[ ::stride ][ :, values.columns.get_indexer( obj ) ].T
+
+    # Pull coordinates from tail to head -> (objects, frames, 5, 2)
+    points = ['tail', 'spinepoint_3', 'spinepoint_2', 'spinepoint_1', 'head']
+    lines_xy = np.stack( [ np.stack( [ coords( p + '_x' ), coords( p + '_y' ) ], axis=-1 )
+                           for p in points ],
+                         axis=2 )
+
+    # Prepare default colors -> one per object
+    colors = np.array( plt.get_cmap('tab10').colors )
+    colors = colors[ np.arange( len(obj) ) % len(colors) ]
+    colors = np.broadcast_to( colors[:, None, :], lines_xy.shape[:2] + (colors.shape[1], ) )
+
+    # Drop empty frames
+    not_empty = ~np.isnan( lines_xy ).any( axis=(2, 3) )
+
+    defaults_lin = dict(
+                        colors=colors[ not_empty ],
+                        linewidth=.5,
+                        )
+    if 'color' in kwargs or 'c' in kwargs:
+        defaults_lin.pop('colors')
+    defaults_lin.update(kwargs)
+
+    # Turn all lines into a single collection
+    lc = LineCollection( lines_xy[ not_empty ], **defaults_lin )
+
+    # Add line collection to axis
+    ax.add_collection(lc)
 
     ax.autoscale()
 
     return ax
 
+
+def plot_heatmap(hm, ax=None, normalize=True, log=False, **kwargs):
+    """ Plots a 2D occupancy heatmap.
+
+    Parameters
+    ----------
+    hm :        pyfim.heatmap.Heatmap
+    ax :        matplotlib.Axes, optional
+                Ax to plot on. If not provided, will create a new one.
+    normalize : bool, optional
+                If True, will plot fraction of positions per bin instead of
+                counts.
+    log :       bool, optional
+                If True, will use a logarithmic color scale.
+    **kwargs
+                Will be passed to matplotlib.Axes.imshow
+
+    Returns
+    -------
+    matplotlib.Axes
+
+    """
+    if not hasattr(hm, 'counts') or not hasattr(hm, 'extent'):
+        raise TypeError('Need pyfim.heatmap.Heatmap, got {0}'.format(type(hm)))
+
+    if not ax:
+        fig, ax = plt.subplots()
+
+    values = hm.density if normalize else hm.counts.astype(float)
+
+    defaults_im = dict( origin='lower',
+                        extent=hm.extent,
+                        cmap='viridis',
+                        interpolation='nearest',
+                        aspect='equal' )
+    if log:
+        values = np.where( values > 0, values, np.nan )
+        defaults_im['norm'] = LogNorm()
+    defaults_im.update(kwargs)
+
+    im = ax.imshow( values, **defaults_im )
+
+    plt.colorbar( im, ax=ax, label='fraction of positions' if normalize else 'counts' )
+
+    return ax
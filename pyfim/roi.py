@@ -0,0 +1,278 @@
+#    This code is part of pyFIM (http://www.github.com/schlegelp/pyfim), a
+#    package to analyze FIMTrack data (fim.uni-muenster.de). For full
+#    acknowledgments and references, please see the GitHub repository.
+#
+#    Copyright (C) 2018 Philipp Schlegel
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+""" Regions of interest (ROIs) for arbitrary arena layouts.
+
+ROIs are polygons or circles in the same units as the position parameters
+(pixel or mm, see `PIXEL2MM`). Membership is tested for all frames and
+objects at once.
+
+Examples
+--------
+>>> from pyfim.roi import Circle, Polygon
+>>> # Quadrant assay
+>>> rois = [ Polygon([(0, 0), (500, 0), (500, 500), (0, 500)], name='Q1'),
+...          Polygon([(500, 500), (1000, 500), (1000, 1000), (500, 1000)], name='Q3') ]
+>>> # Odor spot
+>>> rois.append( Circle((750, 250), 100, name='odor') )
+>>> occ = pyfim.roi.occupancy(exp, rois)
+>>> pi = pyfim.roi.preference_index(exp, rois[:2])
+"""
+
+import numpy as np
+import pandas as pd
+
+from pyfim import core
+
+__all__ = ['Polygon', 'Circle', 'membership', 'occupancy',
+           'time_in_regions', 'preference_index']
+
+
+class Polygon:
+    """ Polygonal region of interest.
+
+    Parameters
+    ----------
+    vertices :  list of (x, y) tuples | np.ndarray
+                Vertices of the polygon. Does not need to be closed.
+    name :      str, optional
+                Name of the region.
+
+    """
+
+    def __init__(self, vertices, name=None):
+        self.vertices = np.asarray( vertices, dtype=float )
+
+        if self.vertices.ndim != 2 or self.vertices.shape[1] != 2 or self.vertices.shape[0] < 3:
+            raise ValueError('Need at least 3 (x, y) vertices, got shape {0}'.format(self.vertices.shape))
+
+        self.name = name
+
+    def __repr__(self):
+        return '{0} "{1}" with {2} vertices'.format(type(self), self.name, self.vertices.shape[0])
+
+    def contains(self, x, y):
+        """ Tests which points are inside the polygon (even-odd rule).
+
+        Parameters
+        ----------
+        x, y :      np.ndarray
+                    Coordinates of arbitrary (but matching) shape. NaNs are
+                    never inside.
+
+        Returns
+        -------
+        np.ndarray
+                    Boolean array of same shape as `x`.
+
+        """
+        x, y = np.asarray( x, dtype=float ), np.asarray( y, dtype=float )
+
+        # Only test points within the bounding box
+        (x_min, y_min), (x_max, y_max) = self.vertices.min( axis=0 ), self.vertices.max( axis=0 )
+        with np.errstate(invalid='ignore'):
+            inside = ( x >= x_min ) & ( x <= x_max ) & ( y >= y_min ) & ( y <= y_max )
+
+        px, py = x[ inside ], y[ inside ]
+        hit = np.zeros( px.shape, dtype=bool )
+
+        # Cast a ray to the right and count crossings with each edge
+        for ( xi, yi ), ( xj, yj ) in zip( self.vertices, np.roll( self.vertices, -1, axis=0 ) ):
+            if yi == yj:
+                continue
+            crosses = ( yi > py ) != ( yj > py )
+            hit ^= crosses & ( px < ( xj - xi ) * ( py - yi ) / ( yj - yi ) + xi )
+
+        inside[ inside ] = hit
+
+        return inside
+
+
+class Circle:
+    """ Circular region of interest.
+
+    Parameters
+    ----------
+    center :    (x, y) tuple
+    radius :    int | float
+    name :      str, optional
+                Name of the region.
+
+    """
+
+    def __init__(self, center, radius, name=None):
+        self.center = np.asarray( center, dtype=float )
+        self.radius = float( radius )
+        self.name = name
+
+    def __repr__(self):
+        return '{0} "{1}" at {2} with radius {3}'.format(type(self), self.name, tuple(self.center), self.radius)
+
+    def contains(self, x, y):
+        """ Tests which points are inside the circle. See
+        :func:`~pyfim.roi.Polygon.contains`.
+        """
+        x, y = np.asarray( x, dtype=float ), np.asarray( y, dtype=float )
+        with np.errstate(invalid='ignore'):
+            return ( ( x - self.center[0] ) ** 2 + ( y - self.center[1] ) ** 2 ) <= self.radius ** 2
+
+
+def _parse_rois(rois):
+    """ Makes sure ROIs are a list with unique names. """
+    if isinstance(rois, (Polygon, Circle)):
+        rois = [ rois ]
+
+    rois = list( rois )
+    names = [ r.name if r.name is not None else 'roi_{0}'.format(i) for i, r in enumerate(rois) ]
+
+    if len( set(names) ) != len(names):
+        raise ValueError('ROI names must be unique')
+
+    return rois, names
+
+
+def membership(exp, rois, x='mom_x', y='mom_y'):
+    """ Tests for each frame and object whether it is inside given regions.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+    rois :      Polygon | Circle | list thereof
+    x, y :      str, optional
+                Parameters with x and y coordinates.
+
+    Returns
+    -------
+    dict
+                {region name: boolean pandas.DataFrame (frames x objects)}.
+                Untracked frames are False.
+
+    """
+    if not isinstance(exp, core.Experiment):
+        raise TypeError('Need pyfim.Experiment, not {0}'.format(type(exp)))
+
+    rois, names = _parse_rois( rois )
+
+    x = getattr(exp, x)
+    y = getattr(exp, y).reindex( index=x.index, columns=x.columns )
+
+    return { n: pd.DataFrame( r.contains( x.values, y.values ), index=x.index, columns=x.columns )
+             for r, n in zip( rois, names ) }
+
+
+def occupancy(exp, rois, x='mom_x', y='mom_y', normalize=False):
+    """ Counts objects in each region over time.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+    rois :      Polygon | Circle | list thereof
+    x, y :      str, optional
+                Parameters with x and y coordinates.
+    normalize : bool, optional
+                If True, will return the fraction of tracked objects instead
+                of counts.
+
+    Returns
+    -------
+    pandas.DataFrame
+                Frames x regions.
+
+    """
+    member = membership( exp, rois, x=x, y=y )
+
+    occ = pd.DataFrame( { n: m.values.sum( axis=1 ) for n, m in member.items() },
+                        index=getattr(exp, x).index )
+
+    if normalize:
+        tracked = getattr(exp, x).notnull().values.sum( axis=1 )
+        with np.errstate(invalid='ignore', divide='ignore'):
+            occ = occ.div( np.where( tracked > 0, tracked, np.nan ), axis=0 )
+
+    return occ
+
+
+def time_in_regions(exp, rois, x='mom_x', y='mom_y'):
+    """ Calculates the fraction of tracked frames each object spends in
+    each region.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+    rois :      Polygon | Circle | list thereof
+    x, y :      str, optional
+                Parameters with x and y coordinates.
+
+    Returns
+    -------
+    pandas.DataFrame
+                Objects x regions.
+
+    """
+    member = membership( exp, rois, x=x, y=y )
+    tracked = getattr(exp, x).notnull().values.sum( axis=0 )
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame( { n: m.values.sum( axis=0 ) / tracked for n, m in member.items() },
+                             index=getattr(exp, x).columns )
+
+
+def preference_index(exp, rois, x='mom_x', y='mom_y', over_time=False):
+    """ Calculates a preference index (PI) for each region:
+
+                    `PI = (region - others)/(region + others)`
+
+    with `region` and `others` being the number of objects in this region
+    and in the other regions, respectively. Objects inside overlapping
+    regions are counted for each of them. Counts are taken per frame as is -
+    unlike the two-choice PI (see :func:`pyfim.analysis.preference_index`)
+    they are not pooled over `TC_COUNT_WINDOW` or smoothed.
+
+    Parameters
+    ----------
+    exp :       pyfim.Experiment
+    rois :      list of Polygon | Circle
+                At least two regions.
+    x, y :      str, optional
+                Parameters with x and y coordinates.
+    over_time : bool, optional
+                If True, will return PI per frame.
+
+    Returns
+    -------
+    pandas.Series
+                Mean PI over all frames for each region.
+    pandas.DataFrame
+                If ``over_time=True``: frames x regions.
+
+    """
+    occ = occupancy( exp, rois, x=x, y=y )
+
+    if occ.shape[1] < 2:
+        raise ValueError('Need at least two regions to calculate preference indices')
+
+    total = occ.values.sum( axis=1, keepdims=True )
+    others = total - occ.values
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pi = ( occ.values - others ) / total
+
+    pi = pd.DataFrame( pi, index=occ.index, columns=occ.columns )
+
+    if over_time:
+        return pi
+
+    return pi.mean( axis=0 )
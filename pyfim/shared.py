@@ -0,0 +1,294 @@
+#    This code is part of pyFIM (http://www.github.com/schlegelp/pyfim), a
+#    package to analyze FIMTrack data (fim.uni-muenster.de). For full
+#    acknowledgments and references, please see the GitHub repository.
+#
+#    Copyright (C) 2018 Philipp Schlegel
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+""" Shared-memory backing of Experiment data for parallel workers.
+
+Parameters are copied once into a single block of shared memory. Worker
+processes attach to that block by name and get Experiments whose
+DataFrames are views into the shared buffer - nothing is pickled except
+a small layout description and the (per-object) results.
+"""
+
+import os
+import weakref
+
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8
+    shared_memory = None
+
+import numpy as np
+import pandas as pd
+
+from pyfim import core
+from pyfim import analysis as fim_analysis
+
+__all__ = ['SharedExperiment', 'attach', 'run_parallel']
+
+# Shared memory blocks attached in this process: {name: SharedMemory}
+_ATTACHED = {}
+
+
+class SharedExperiment:
+    """ Copies the FIMTrack parameters of an Experiment into shared memory.
+
+    The shared memory is released when this object is closed (explicitly,
+    via context manager or when it is garbage collected). Attached
+    experiments must not be used after that.
+
+    Parameters
+    ----------
+    exp :           pyfim.Experiment
+                    Experiment to share.
+    parameters :    list of str, optional
+                    FIMTrack parameters to share. If None, will share all
+                    original parameters.
+
+    Examples
+    --------
+    >>> with pyfim.shared.SharedExperiment(exp) as sh:
+    ...     # sh.spec is small and cheap to send to other processes
+    ...     worker_exp = pyfim.shared.attach(sh.spec)
+
+    """
+
+    def __init__(self, exp, parameters=None):
+        _check_shared_memory()
+
+        if not isinstance(exp, core.Experiment):
+            raise TypeError('Need pyfim.Experiment, not {0}'.format(type(exp)))
+
+        if isinstance(parameters, type(None)):
+            parameters = exp._original_params
+        elif isinstance(parameters, str):
+            parameters = [ parameters ]
+
+        missing = set(parameters) - set(exp._original_params)
+        if missing:
+            raise ValueError('Parameter(s) not found: {0}'.format( ', '.join( sorted(missing) ) ))
+
+        objects = list( exp.objects )
+        positions = { o: i for i, o in enumerate( objects ) }
+
+        # Columns of each parameter are stored in the order of `objects` so
+        # that contiguous chunks of objects are contiguous in memory
+        layout, offset = {}, 0
+        for p in parameters:
+            values = getattr(exp, p)
+            columns = sorted( values.columns, key=lambda c: positions[c] )
+            shape = ( values.shape[0], len(columns) )
+            layout[p] = dict( offset=offset,
+                              shape=shape,
+                              columns=[ positions[c] for c in columns ],
+                              index=list( values.index ) )
+            offset += int( np.prod( shape ) ) * 8
+
+        self._shm = shared_memory.SharedMemory( create=True, size=max( offset, 1 ) )
+
+        for p in parameters:
+            values = getattr(exp, p)
+            view = _view( self._shm, layout[p] )
+            view[:] = values[ [ objects[c] for c in layout[p]['columns'] ] ].values
+
+        self.spec = dict( name=self._shm.name,
+                          cls=type(exp).__name__,
+                          objects=objects,
+                          units=getattr(exp, 'units', {}),
+                          layout=layout )
+
+        # Make sure shared memory is released
+        self._finalizer = weakref.finalize( self, _release, self._shm )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return '{0} "{1}": {2} objects; {3} parameters; {4:.1f} MB'.format(type(self),
+                                                                         self.spec['name'],
+                                                                         len(self.spec['objects']),
+                                                                         len(self.spec['layout']),
+                                                                         self._shm.size / 1e6)
+
+    @property
+    def name(self):
+        """ Name of the shared memory block. """
+        return self.spec['name']
+
+    def close(self):
+        """ Releases the shared memory. """
+        self._finalizer()
+
+
+def attach(spec, objects=None):
+    """ Attaches to shared experiment data.
+
+    Parameters
+    ----------
+    spec :      dict
+                :attr:`SharedExperiment.spec` of the shared experiment.
+    objects :   slice, optional
+                Positions of objects (in ``spec['objects']``) to attach to,
+                e.g. ``slice(0, 10)``. Must be contiguous so that data can be
+                viewed without copying.
+
+    Returns
+    -------
+    pyfim.Experiment
+                Experiment (without analyses) whose parameters are views
+                into the shared memory.
+
+    """
+    _check_shared_memory()
+
+    if spec['name'] not in _ATTACHED:
+        _ATTACHED[ spec['name'] ] = _open( spec['name'] )
+
+    shm = _ATTACHED[ spec['name'] ]
+
+    if isinstance(objects, type(None)):
+        objects = slice( 0, len(spec['objects']) )
+
+    exp_class = getattr( core, spec['cls'], core.Experiment )
+    exp = exp_class.__new__( exp_class )
+    core.Experiment.__init__( exp, None )
+    exp.units = dict( spec['units'] )
+
+    for p, lay in spec['layout'].items():
+        columns = np.array( lay['columns'], dtype=int )
+        # Columns are sorted -> objects in chunk form a contiguous range
+        lo, hi = np.searchsorted( columns, [ objects.start, objects.stop ] )
+        view = _view( shm, lay )[ :, lo:hi ]
+        setattr(exp, p, pd.DataFrame( view,
+                                      index=lay['index'],
+                                      columns=[ spec['objects'][c] for c in columns[lo:hi] ],
+                                      copy=False ) )
+        exp._original_params.append( p )
+        exp.parameters.append( p )
+
+    exp.parameters = sorted( exp.parameters )
+
+    # Keep the shared memory alive as long as the experiment is around
+    exp._shm = shm
+
+    return exp
+
+
+def run_parallel(exp, analyses=None, n_cores=None, chunk_size=None):
+    """ Runs analyses in parallel on shared experiment data.
+
+    Each task works on one analysis and one chunk of objects. Workers
+    attach to the shared memory instead of receiving pickled data.
+
+    Parameters
+    ----------
+    exp :           pyfim.Experiment
+    analyses :      list of str, optional
+                    Per-object analyses to run. If None, will run all
+                    analyses in ``pyfim.analysis.__all__``.
+    n_cores :       int, optional
+                    Number of worker processes. Defaults to number of CPUs.
+    chunk_size :    int, optional
+                    Number of objects per task. If None, objects are split
+                    evenly across workers.
+
+    Returns
+    -------
+    Nothing - results are added to `exp` as parameters.
+
+    """
+    if isinstance(analyses, type(None)):
+        analyses = fim_analysis.__all__
+
+    if isinstance(n_cores, type(None)):
+        n_cores = os.cpu_count() or 1
+
+    # Skip analyses with missing parameters
+    analyses = [ a for a in analyses if a not in fim_analysis.__two_choice__ and not set( fim_analysis.required_parameters(a) ) - set( exp._original_params ) ]
+    required = sorted( set( [ r for a in analyses for r in fim_analysis.required_parameters(a) ] ) )
+
+    if not analyses:
+        return
+
+    n_objects = len( exp.objects )
+    if isinstance(chunk_size, type(None)):
+        chunk_size = max( 1, int( np.ceil( n_objects / n_cores ) ) )
+    chunks = [ ( i, min( i + chunk_size, n_objects ) ) for i in range( 0, n_objects, chunk_size ) ]
+
+    with SharedExperiment( exp, parameters=required ) as sh:
+        with ProcessPoolExecutor( max_workers=n_cores ) as pool:
+            futures = { a: [ pool.submit( _run_chunk, sh.spec, a, start, stop ) for start, stop in chunks ] for a in analyses }
+            results = { a: [ f.result() for f in futures[a] ] for a in futures }
+
+    for a, res in results.items():
+        res = pd.concat( res )
+        # Same order as if run on the experiment directly
+        order = [ c for c in getattr( exp, fim_analysis.required_parameters(a)[0] ).columns if c in res.index ]
+        setattr( exp, a, res[ order ] )
+        if a not in exp.parameters:
+            exp.parameters.append( a )
+
+    exp.parameters = sorted( exp.parameters )
+
+
+def _check_shared_memory():
+    """ Raises if shared memory is not available. """
+    if shared_memory is None:
+        raise ImportError('Shared memory requires Python 3.8 or later')
+
+
+def _run_chunk(spec, analysis, start, stop):
+    """ Worker: runs analysis on a chunk of objects. """
+    exp = attach( spec, objects=slice(start, stop) )
+    return getattr( fim_analysis, analysis )( exp )
+
+
+def _view(shm, layout):
+    """ Returns array view of a parameter in shared memory. """
+    return np.ndarray( layout['shape'], dtype=np.float64,
+                       buffer=shm.buf, offset=layout['offset'] )
+
+
+def _open(name):
+    """ Attaches to an existing shared memory block without taking
+    ownership (i.e. without unlinking it when this process exits).
+    """
+    try:
+        return shared_memory.SharedMemory( name=name, track=False )
+    except TypeError:
+        # Python < 3.13: worker processes share the resource tracker of the
+        # owning process, which unlinks the block only once
+        return shared_memory.SharedMemory( name=name )
+
+
+def _release(shm):
+    """ Closes and unlinks shared memory. """
+    # Drop attachments of the owning process
+    for m in [ _ATTACHED.pop( shm.name, None ), shm ]:
+        if m is None:
+            continue
+        try:
+            m.close()
+        except BufferError:
+            # Views into the buffer still exist - the mapping is released
+            # once they are garbage collected
+            pass
+    shm.unlink()
@@ -0,0 +1,326 @@
+#    This code is part of pyFIM (http://www.github.com/schlegelp/pyfim), a
+#    package to analyze FIMTrack data (fim.uni-muenster.de). For full
+#    acknowledgments and references, please see the GitHub repository.
+#
+#    Copyright (C) 2018 Philipp Schlegel
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+""" Stitching of fragmented tracks.
+
+FIMTrack assigns a new object whenever it loses and re-acquires a larva.
+Here, the end of each fragment is linked to the start of another fragment
+if the latter starts within `STITCH_MAX_GAP` frames and
+`STITCH_MAX_DISTANCE` of where the former ended. Candidate links are found
+via a spatio-temporal grid (no all-pairs comparison) and resolved such that
+each fragment is continued by at most one other fragment.
+"""
+
+import numpy as np
+import pandas as pd
+
+from pyfim import core, config
+defaults = config.default_parameters
+
+try:
+    from scipy.optimize import linear_sum_assignment
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+except ImportError:
+    linear_sum_assignment = None
+
+__all__ = ['find_links', 'stitch_tracks']
+
+# Position used to link fragments (in order of preference)
+LINK_POINTS = ['mom', 'spinepoint_2', 'head']
+
+
+def _link_point(exp):
+    """ Returns the first of `LINK_POINTS` available in the experiment. """
+    point = next( ( p for p in LINK_POINTS if p + '_x' in exp.parameters and p + '_y' in exp.parameters ), None )
+    if isinstance(point, type(None)):
+        raise ValueError('Need one of the following positions to stitch tracks: '
+                         '{0}'.format( ', '.join( LINK_POINTS ) ))
+    return point
+
+
+def _fragments(exp):
+    """ Gets first/last tracked frame and position of each object.
+
+    Returns
+    -------
+    pandas.DataFrame
+                Objects x (recording, start, end, start_x, start_y, end_x,
+                end_y).
+                Start/end are frame positions (not labels).
+
+    """
+    if not isinstance(exp, core.Experiment):
+        raise TypeError('Need pyfim.Experiment, not {0}'.format(type(exp)))
+
+    point = _link_point( exp )
+
+    x = getattr(exp, point + '_x')
+    y = getattr(exp, point + '_y').reindex( index=x.index, columns=x.columns )
+
+    tracked = ~( np.isnan( x.values ) | np.isnan( y.values ) )
+    has_data = tracked.any( axis=0 )
+
+    start = np.argmax( tracked, axis=0 )
+    end = tracked.shape[0] - 1 - np.argmax( tracked[::-1], axis=0 )
+    cols = np.arange( tracked.shape[1] )
+
+    # Fragments from different recordings (files) are never linked. Objects
+    # from an unknown recording get a recording of their own -> unlinkable
+    recording = getattr(exp, '_recording', None)
+    if isinstance(recording, type(None)):
+        recording = np.zeros( len(cols), dtype=int )
+    else:
+        recording = recording.reindex( x.columns ).values.astype(float)
+        unknown = np.isnan( recording )
+        recording[ unknown ] = np.nanmax( recording, initial=-1 ) + 1 + np.arange( unknown.sum() )
+        recording = recording.astype(int)
+
+    frags = pd.DataFrame( dict( recording=recording,
+                                start=start,
+                                end=end,
+                                start_x=x.values[ start, cols ],
+                                start_y=y.values[ start, cols ],
+                                end_x=x.values[ end, cols ],
+                                end_y=y.values[ end, cols ] ),
+                          index=x.columns )
+
+    return frags[ has_data ]
+
+
+def _candidates(frags, max_gap, max_distance):
+    """ Finds candidate links (end of fragment i -> start of fragment j)
+    using a grid of cells of size `max_distance` over the start positions,
+    sorted by start frame within each cell.
+
+    Returns
+    -------
+    i, j :      np.ndarray
+                Positions (in `frags`) of the linked fragments.
+    dist :      np.ndarray
+                Distance between end of i and start of j.
+    gap :       np.ndarray
+                Number of untracked frames between i and j.
+
+    """
+    start_xy = frags[ [ 'start_x', 'start_y' ] ].values
+    end_xy = frags[ [ 'end_x', 'end_y' ] ].values
+
+    origin = np.minimum( start_xy.min( axis=0 ), end_xy.min( axis=0 ) )
+    start_cells = np.floor( ( start_xy - origin ) / max_distance ).astype(np.int64) + 1
+    end_cells = np.floor( ( end_xy - origin ) / max_distance ).astype(np.int64) + 1
+    n_x = max( start_cells[:, 0].max(), end_cells[:, 0].max() ) + 2
+    n_y = max( start_cells[:, 1].max(), end_cells[:, 1].max() ) + 2
+
+    # Key = recording, cell, then frame -> fragments starting in a given
+    # cell and time window form a contiguous range
+    n_t = int( frags.end.max() ) + max_gap + 3
+    starts = frags.start.values.astype(np.int64)
+    ends = frags.end.values.astype(np.int64)
+    rec = frags.recording.values.astype(np.int64)
+    keys = ( ( rec * n_y + start_cells[:, 1] ) * n_x + start_cells[:, 0] ) * n_t + starts
+
+    order = np.argsort( keys, kind='stable' )
+    sorted_keys = keys[ order ]
+
+    cand_i, cand_j = [], []
+    for dx in ( -1, 0, 1 ):
+        for dy in ( -1, 0, 1 ):
+            cell = ( rec * n_y + end_cells[:, 1] + dy ) * n_x + end_cells[:, 0] + dx
+            lo = np.searchsorted( sorted_keys, cell * n_t + ends + 1, side='left' )
+            n = np.searchsorted( sorted_keys, cell * n_t + ends + max_gap + 1, side='right' ) - lo
+
+            cand_i.append( np.repeat( np.arange( len(ends) ), n ) )
+            cand_j.append( order[ np.repeat( lo - np.cumsum(n) + n, n ) + np.arange( n.sum() ) ] )
+
+    i, j = np.concatenate( cand_i ), np.concatenate( cand_j )
+    dist = np.linalg.norm( start_xy[j] - end_xy[i], axis=1 )
+    keep = dist <= max_distance
+
+    i, j, dist = i[ keep ], j[ keep ], dist[ keep ]
+
+    return i, j, dist, starts[j] - ends[i] - 1
+
+
+def _assign(i, j, cost, n):
+    """ Picks links such that each fragment has at most one successor and
+    one predecessor. Maximizes the number of links, then minimizes the
+    total cost. Falls back to greedy assignment if scipy is not installed.
+
+    Returns
+    -------
+    np.ndarray
+                Indices of the chosen links.
+
+    """
+    if not len(i):
+        return np.zeros( 0, dtype=int )
+
+    if isinstance(linear_sum_assignment, type(None)):
+        taken_i, taken_j = np.zeros( n, dtype=bool ), np.zeros( n, dtype=bool )
+        keep = []
+        for k in np.argsort( cost, kind='stable' ):
+            if not taken_i[ i[k] ] and not taken_j[ j[k] ]:
+                taken_i[ i[k] ] = taken_j[ j[k] ] = True
+                keep.append( k )
+        return np.sort( np.array( keep, dtype=int ) )
+
+    # Solve each connected group of ends (0..n-1) and starts (n..2n-1)
+    # separately -> small dense problems
+    graph = coo_matrix( ( np.ones( len(i) ), ( i, j + n ) ), shape=( 2 * n, 2 * n ) )
+    _, labels = connected_components( graph, directed=False )
+
+    # Any real link is cheaper than leaving a fragment unlinked
+    no_link = cost.sum() + 1
+
+    comp = labels[ i ]
+    order = np.argsort( comp, kind='stable' )
+    groups = np.split( order, np.flatnonzero( np.diff( comp[ order ] ) ) + 1 )
+
+    keep = []
+    for this in groups:
+        rows, ii = np.unique( i[ this ], return_inverse=True )
+        cols, jj = np.unique( j[ this ], return_inverse=True )
+
+        matrix = np.full( ( len(rows), len(cols) ), no_link )
+        matrix[ ii, jj ] = cost[ this ]
+        index = np.full( matrix.shape, -1 )
+        index[ ii, jj ] = this
+
+        r, k = linear_sum_assignment( matrix )
+        keep.append( index[ r, k ][ index[ r, k ] >= 0 ] )
+
+    return np.sort( np.concatenate( keep ) )
+
+
+def find_links(exp, max_gap=None, max_distance=None):
+    """ Finds which track fragments continue each other.
+
+    Parameters
+    ----------
+    exp :           pyfim.Experiment
+    max_gap :       int, optional
+                    Max number of untracked frames between end of one and
+                    start of the next fragment. Defaults to
+                    ``pyfim.defaults['STITCH_MAX_GAP']``.
+    max_distance :  int | float, optional
+                    Max distance between end of one and start of the next
+                    fragment. Defaults to
+                    ``pyfim.defaults['STITCH_MAX_DISTANCE']``.
+
+    Returns
+    -------
+    pandas.DataFrame
+                    One row per link with columns `object` (fragment that
+                    ends), `next` (fragment that continues it), `gap`
+                    (frames) and `distance`.
+
+    """
+    if isinstance(max_gap, type(None)):
+        max_gap = defaults['STITCH_MAX_GAP']
+
+    if isinstance(max_distance, type(None)):
+        max_distance = defaults['STITCH_MAX_DISTANCE']
+
+    if max_distance <= 0 or max_gap < 0:
+        raise ValueError('Need max_distance > 0 and max_gap >= 0')
+
+    frags = _fragments( exp )
+
+    if frags.shape[0] < 2:
+        return pd.DataFrame( columns=['object', 'next', 'gap', 'distance'] )
+
+    i, j, dist, gap = _candidates( frags, int(max_gap), max_distance )
+
+    # Close in space and time = cheap
+    cost = dist / max_distance + gap / ( max_gap + 1 )
+    k = _assign( i, j, cost, frags.shape[0] )
+
+    links = pd.DataFrame( dict( object=frags.index[ i[k] ],
+                                next=frags.index[ j[k] ],
+                                gap=gap[k],
+                                distance=dist[k] ) )
+
+    return links.sort_values( 'object' ).reset_index(drop=True)
+
+
+def stitch_tracks(exp, max_gap=None, max_distance=None):
+    """ Merges track fragments into single objects. Should be run before
+    clean-up so that stitched tracks are not dropped for being too short
+    (see `MIN_TRACK_LENGTH`).
+
+    Untracked frames between fragments stay NaN. Stitched objects keep the
+    name of their first fragment.
+
+    Parameters
+    ----------
+    exp :           pyfim.Experiment
+                    Experiment to stitch. Is modified in place.
+    max_gap :       int, optional
+                    See :func:`~pyfim.stitching.find_links`.
+    max_distance :  int | float, optional
+                    See :func:`~pyfim.stitching.find_links`.
+
+    Returns
+    -------
+    pandas.Series
+                    Maps each stitched fragment to the object it was merged
+                    into.
+
+    """
+    links = find_links( exp, max_gap=max_gap, max_distance=max_distance )
+    frags = _fragments( exp )
+
+    # Follow links from the first fragment of each chain
+    successor = dict( zip( links['object'], links['next'] ) )
+    merged_into = {}
+    for head in set( successor ) - set( successor.values() ):
+        nxt = successor[ head ]
+        while not isinstance(nxt, type(None)):
+            merged_into[ nxt ] = head
+            nxt = successor.get( nxt )
+
+    merged_into = pd.Series( merged_into, dtype=object ).sort_index()
+
+    if merged_into.empty:
+        return merged_into
+
+    # Frames to copy from each fragment into its chain's head. Fragments
+    # start/end are positions in the link parameter -> convert to labels
+    n = ( frags.end - frags.start + 1 ).loc[ merged_into.index ].values
+    pos = np.repeat( frags.start.loc[ merged_into.index ].values, n ) + \
+          np.arange( n.sum() ) - np.repeat( np.cumsum(n) - n, n )
+    frames = getattr( exp, _link_point( exp ) + '_x' ).index.values[ pos ]
+
+    for p in exp._original_params:
+        values = getattr(exp, p)
+
+        # Parameters do not necessarily share the frames of the link parameter
+        rows = values.index.get_indexer( frames )
+        src = values.columns.get_indexer( np.repeat( merged_into.index.values, n ) )
+        dst = values.columns.get_indexer( np.repeat( merged_into.values, n ) )
+        valid = ( src >= 0 ) & ( dst >= 0 ) & ( rows >= 0 )
+
+        arr = values.values.copy()
+        arr[ rows[ valid ], dst[ valid ] ] = arr[ rows[ valid ], src[ valid ] ]
+
+        values = pd.DataFrame( arr, index=values.index, columns=values.columns )
+        setattr( exp, p, values.drop( columns=merged_into.index.intersection( values.columns ) ) )
+
+    core.module_logger.info('Stitched {0} fragments into {1} tracks'.format( len(merged_into),
+                                                                            merged_into.nunique() ))
+
+    return merged_into
@@ -0,0 +1,80 @@
+import copy
+
+import numpy as np
+import pytest
+
+import pyfim
+
+PARAMS = ['acc_dst', 'acceleration', 'area', 'bending', 'dst_to_origin',
+          'go_phase', 'head_x', 'head_y', 'is_coiled', 'is_well_oriented',
+          'left_bended', 'mom_dst', 'mom_x', 'mom_y', 'mov_direction',
+          'perimeter', 'radius_1', 'radius_2', 'radius_3', 'right_bended',
+          'spine_length', 'spinepoint_1_x', 'spinepoint_1_y',
+          'spinepoint_2_x', 'spinepoint_2_y', 'spinepoint_3_x',
+          'spinepoint_3_y', 'tail_x', 'tail_y', 'velocity']
+
+
+@pytest.fixture(autouse=True)
+def restore_defaults():
+    """ Tests may change `pyfim.defaults` -> restore afterwards. """
+    saved = copy.deepcopy( pyfim.defaults )
+    pyfim.defaults['MIN_TRACK_LENGTH'] = 50
+    yield
+    pyfim.defaults.clear()
+    pyfim.defaults.update( saved )
+
+
+def write_fimtrack_csv(fn, n_objects=3, n_frames=200, seed=0):
+    """ Writes a synthetic FIMTrack CSV (rows = "param(frame)", columns =
+    objects) with larvae crawling in different parts of the arena.
+    """
+    rng = np.random.default_rng( seed )
+
+    data = { p: [] for p in PARAMS }
+    for o in range( n_objects ):
+        x0, y0 = 200 + 400 * o, 200 + 300 * o
+        vel = np.abs( rng.normal( 1, .5, n_frames ) )
+        ang = np.cumsum( rng.normal( 0, .1, n_frames ) )
+        mx = x0 + np.cumsum( vel * np.cos(ang) )
+        my = y0 + np.cumsum( vel * np.sin(ang) )
+
+        d = dict( mom_x=mx, mom_y=my, velocity=vel,
+                  acceleration=np.r_[ 0, np.diff(vel) ],
+                  acc_dst=np.cumsum(vel), mom_dst=vel,
+                  dst_to_origin=np.hypot( mx - x0, my - y0 ),
+                  area=300 + 30 * np.sin( np.arange(n_frames) / 3 ),
+                  perimeter=80 + rng.normal( 0, 1, n_frames ),
+                  bending=180 + rng.normal( 0, 40, n_frames ),
+                  go_phase=( np.sin( np.arange(n_frames) / 15 + o ) > -.5 ).astype(float),
+                  mov_direction=np.degrees(ang) % 360,
+                  spine_length=40 + rng.normal( 0, 1, n_frames ) )
+        for k in ['is_coiled', 'is_well_oriented', 'left_bended', 'right_bended']:
+            d[k] = ( rng.random(n_frames) < .3 ).astype(float)
+        for k in ['radius_1', 'radius_2', 'radius_3']:
+            d[k] = 5 + rng.normal( 0, .2, n_frames )
+        for p, off in [ ('head', 20), ('spinepoint_1', 10), ('spinepoint_2', 0),
+                        ('spinepoint_3', -10), ('tail', -20) ]:
+            d[p + '_x'] = mx + off * np.cos(ang)
+            d[p + '_y'] = my + off * np.sin(ang)
+
+        for p in PARAMS:
+            data[p].append( d[p] )
+
+    with open(fn, 'w') as f:
+        f.write( ',' + ','.join( 'larva({0})'.format(i) for i in range(n_objects) ) + '\n' )
+        for p in PARAMS:
+            values = np.array( data[p] )
+            for fr in range( n_frames ):
+                f.write( '{0}({1}),'.format(p, fr) + ','.join( repr(float(v)) for v in values[:, fr] ) + '\n' )
+
+    return fn
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    return str( write_fimtrack_csv( tmp_path / 'exp.csv' ) )
+
+
+@pytest.fixture
+def experiment(csv_file):
+    return pyfim.Experiment( csv_file )
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pyfim
+
+from conftest import write_fimtrack_csv
+
+
+def test_aggregate_matches_pandas(experiment):
+    stats = experiment.aggregate( parameters=[ 'velocity', 'stops' ] )
+
+    expected = experiment.velocity.describe().T.rename( columns={ '50%': 'median' } )
+    np.testing.assert_allclose( stats.loc['velocity'][ expected.columns ].values,
+                                expected.values )
+
+    # Per-object values are one observation per object
+    stops = stats.loc['stops']
+    np.testing.assert_allclose( stops['mean'], experiment.stops.values )
+    assert ( stops['count'] == 1 ).all()
+
+
+def test_aggregate_stats(experiment):
+    stats = experiment.aggregate( parameters='velocity', stats=[ 'median', '10%' ], quantiles=[ .1 ] )
+
+    assert list( stats.columns ) == [ 'median', '10%' ]
+    np.testing.assert_allclose( stats['10%'], experiment.velocity.quantile( .1 ).values )
+
+    with pytest.raises(ValueError):
+        experiment.aggregate( stats='mode' )
+
+
+def test_aggregate_nan(experiment):
+    obj = experiment.objects[0]
+    experiment.velocity.loc[:, obj] = np.nan
+
+    stats = experiment.aggregate( parameters='velocity' ).loc['velocity']
+    assert stats.loc[ obj, 'count' ] == 0
+    assert stats.loc[ obj, [ 'mean', 'median', 'min' ] ].isnull().all()
+
+
+def test_mean(experiment):
+    means = experiment.mean()
+
+    assert list( means.index ) == [ p for p in experiment.parameters if p in means.index ]
+    pd.testing.assert_series_equal( means.loc['velocity'], experiment.velocity.mean( axis=0 ), check_names=False )
+    pd.testing.assert_series_equal( experiment.mean( 'velocity' ), experiment.velocity.mean( axis=0 ) )
+
+
+def test_collection_aggregate(tmp_path):
+    coll = pyfim.Collection()
+    for i in range(2):
+        coll.add_data( str( write_fimtrack_csv( tmp_path / '{0}.csv'.format(i), seed=i ) ), label='exp{0}'.format(i) )
+
+    stats = coll.aggregate( parameters='velocity' )
+    assert list( stats.index.names ) == [ 'experiment', 'parameter', 'object' ]
+    pd.testing.assert_frame_equal( stats.loc['exp1'], coll.exp1.aggregate( parameters='velocity' ) )
@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+import pyfim
+
+from conftest import write_fimtrack_csv
+
+
+@pytest.fixture
+def csv_files(tmp_path):
+    return [ str( write_fimtrack_csv( tmp_path / '{0}.csv'.format(i), n_objects=3, seed=i ) ) for i in range(2) ]
+
+
+def test_matches_experiment(csv_files, tmp_path):
+    exp = pyfim.Experiment( csv_files )
+    out = str( tmp_path / 'results.csv' )
+
+    # Batches span file boundaries
+    res = pyfim.process_batches( csv_files, batch_size=4, out=out )
+
+    assert list( res.index ) == list( exp.objects )
+    for a in res.columns:
+        pd.testing.assert_series_equal( res[a], getattr(exp, a).reindex( res.index ),
+                                        check_names=False, check_index=False )
+
+    # Results were appended batch by batch
+    written = pd.read_csv( out, index_col=0 )
+    pd.testing.assert_frame_equal( written, res, check_dtype=False, check_index_type=False )
+
+
+def test_parameters(csv_files):
+    res = pyfim.process_batches( csv_files, batch_size=2, parameters=[ 'mom_x', 'mom_y', 'go_phase' ] )
+    assert sorted( res.columns ) == [ 'stop_duration', 'stops' ]
+
+
+def test_no_stitching(csv_files):
+    pyfim.defaults['STITCH_TRACKS'] = True
+    with pytest.raises(ValueError):
+        pyfim.process_batches( csv_files )
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+
+def test_objects_cache(experiment):
+    objects = experiment.objects
+    assert experiment.objects is objects
+
+    # Re-assigning a parameter drops the cache
+    experiment.mom_x = experiment.mom_x.rename( columns={ objects[0]: 'object_new' } )
+    assert 'object_new' in experiment.objects
+
+    # In-place changes need an explicit reset
+    experiment.mom_x.drop( columns='object_new', inplace=True )
+    assert 'object_new' in experiment.objects
+    experiment.clear_cache()
+    assert 'object_new' not in experiment.objects
+
+
+def test_events_cache(experiment):
+    events = experiment.events
+    assert experiment.events is events
+
+    go_phase = experiment.go_phase.copy()
+    go_phase.iloc[:] = 1
+    experiment.go_phase = go_phase
+    assert experiment.events is not events
+
+
+def test_getitem(experiment):
+    obj = experiment.objects[0]
+
+    # Single parameter -> no copy
+    col = experiment[ obj, 'mom_x' ]
+    assert np.shares_memory( col.values, experiment.mom_x.values )
+
+    data = experiment[ obj, [ 'mom_x', 'stops' ] ]
+    assert list( data.columns ) == [ 'mom_x', 'stops' ]
+    assert data.stops.iloc[0] == experiment.stops[obj]
+    np.testing.assert_array_equal( data.mom_x.values, experiment.mom_x[obj].values )
+
+    with pytest.raises(ValueError):
+        experiment['object_999']
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+import pyfim
+
+
+def _experiment(**params):
+    exp = pyfim.Experiment(None)
+    for p, values in params.items():
+        setattr( exp, p, pd.DataFrame( values ) )
+        exp.parameters.append( p )
+        exp._original_params.append( p )
+    return exp
+
+
+def test_fill_gaps_bounded():
+    pyfim.defaults['MIN_TRACK_LENGTH'] = 0
+    pyfim.defaults['MAX_GAP_SIZE'] = 3
+
+    go = np.array( [ 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 0, 1, 1, 0, 0 ], dtype=float )
+    exp = _experiment( mom_x=dict( object_0=np.arange( len(go), dtype=float ) ),
+                       go_phase=dict( object_0=go ) )
+    exp.clean_data()
+
+    # Interior gap of 3 frames is filled; 4-frame gap and gaps at the start
+    # and end of the track are not
+    expected = [ 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 0, 1, 1, 0, 0 ]
+    np.testing.assert_array_equal( exp.go_phase.object_0.values, expected )
+
+
+def test_fill_gaps_disabled():
+    pyfim.defaults['MIN_TRACK_LENGTH'] = 0
+    pyfim.defaults['FILL_GAPS'] = False
+
+    go = np.array( [ 1, 0, 1 ], dtype=float )
+    exp = _experiment( mom_x=dict( object_0=np.zeros(3) ), go_phase=dict( object_0=go ) )
+    exp.clean_data()
+
+    np.testing.assert_array_equal( exp.go_phase.object_0.values, go )
@@ -0,0 +1,84 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import pyfim
+
+
+def _experiment(points):
+    """ Experiment with given head/tail positions: (frames, objects, 2, 2). """
+    exp = pyfim.Experiment(None)
+    columns = [ 'object_{0}'.format(i) for i in range( points.shape[1] ) ]
+    for k, p in enumerate( [ 'head', 'tail' ] ):
+        for d, c in enumerate( [ 'x', 'y' ] ):
+            setattr( exp, '{0}_{1}'.format(p, c), pd.DataFrame( points[:, :, k, d], columns=columns ) )
+            exp.parameters.append( '{0}_{1}'.format(p, c) )
+    exp._original_params = list( exp.parameters )
+    return exp
+
+
+def _brute_force(points, distance):
+    found = {}
+    for f, a, b in itertools.product( range( points.shape[0] ), range( points.shape[1] ), range( points.shape[1] ) ):
+        if a >= b:
+            continue
+        d = np.linalg.norm( points[f, a][:, None] - points[f, b][None, :], axis=-1 )
+        if np.nanmin( d, initial=np.inf ) <= distance:
+            found[ ( f, a, b ) ] = np.nanmin( d )
+    return found
+
+
+def test_grid_matches_brute_force():
+    rng = np.random.default_rng( 0 )
+    points = rng.uniform( -50, 150, ( 30, 12, 2, 2 ) )
+    points[ rng.random( points.shape[:3] ) < .1 ] = np.nan
+
+    contacts = pyfim.contacts.find_contacts( _experiment( points ), distance=15 )
+    expected = _brute_force( points, 15 )
+
+    found = { ( f, int( a.split('_')[1] ), int( b.split('_')[1] ) ): d
+              for f, a, b, d in contacts[ [ 'frame', 'object_a', 'object_b', 'distance' ] ].values }
+
+    assert found.keys() == expected.keys()
+    np.testing.assert_allclose( [ found[k] for k in sorted(found) ],
+                                [ expected[k] for k in sorted(expected) ] )
+
+
+def _passing_objects(n_frames=20):
+    # Object 0 stands still, object 1 passes it in frames 5-7 and 12
+    points = np.zeros( ( n_frames, 2, 2, 2 ) )
+    points[:, 0, 1, 0] = 5
+    points[:, 1] = 100
+    points[ [ 5, 6, 7, 12 ], 1 ] = [ 8, 0 ]
+    return _experiment( points )
+
+
+def test_contact_events():
+    events = pyfim.contacts.contact_events( _passing_objects(), distance=5 )
+
+    assert events[ [ 'start', 'end' ] ].values.tolist() == [ [ 5, 7 ], [ 12, 12 ] ]
+    assert ( events.object_a == 'object_0' ).all()
+    assert ( events.object_b == 'object_1' ).all()
+    np.testing.assert_allclose( events.min_distance, 3 )
+
+
+def test_mask_padding():
+    exp = _passing_objects()
+
+    mask = pyfim.contacts.contact_mask( exp, distance=5, padding=0 )
+    assert np.flatnonzero( mask.object_0.values ).tolist() == [ 5, 6, 7, 12 ]
+    assert ( mask.object_0 == mask.object_1 ).all()
+
+    mask = pyfim.contacts.contact_mask( exp, distance=5, padding=2 )
+    assert np.flatnonzero( mask.object_0.values ).tolist() == [ 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14 ]
+
+    pyfim.contacts.mask_contacts( exp, distance=5, padding=1 )
+    assert np.flatnonzero( exp.head_x.object_1.isnull().values ).tolist() == [ 4, 5, 6, 7, 8, 11, 12, 13 ]
+
+
+def test_no_contacts():
+    exp = _passing_objects()
+    assert pyfim.contacts.find_contacts( exp, distance=1 ).empty
+    assert pyfim.contacts.contact_events( exp, distance=1 ).empty
+    assert not pyfim.contacts.contact_mask( exp, distance=1 ).values.any()
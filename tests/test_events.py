@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import pyfim
+from pyfim import analysis
+
+
+@pytest.fixture(autouse=True)
+def more_events():
+    pyfim.defaults['MIN_GO_TIME'] = 3
+    pyfim.defaults['MIN_STOP_TIME'] = 3
+    pyfim.defaults['TURN_ANGLE_THRESHOLD'] = 5
+
+
+@pytest.mark.parametrize('event, name', [ ( 'stop', 'stops' ),
+                                          ( 'head_bend', 'head_bends' ),
+                                          ( 'pause_turn', 'pause_turns' ),
+                                          ( 'peristalsis', 'peristalsis_frequency' ) ])
+def test_counts_match_analyses(event, name, experiment):
+    ev = experiment.events
+    ev = ev[ ev['event'] == analysis.EVENT_TYPES.index(event) ]
+    assert len(ev)
+
+    # Analyses report events per second of valid frames
+    valid = analysis._detect_events( experiment, name )[1]
+    counts = np.bincount( ev['object'], minlength=experiment.n_objects )
+    freq = getattr(analysis, name)( experiment )[ experiment.objects ].values
+    np.testing.assert_allclose( counts, freq * valid[ experiment.objects ].sum().values / pyfim.defaults['FPS'] )
+
+
+def test_table(experiment):
+    ev = experiment.events
+
+    # Sorted by object and start
+    order = np.lexsort( ( ev['start'], ev['object'] ) )
+    np.testing.assert_array_equal( order, np.arange( len(ev) ) )
+    assert ( ev['end'] > ev['start'] ).all()
+
+    # Stop magnitude is its duration
+    stops = ev[ ev['event'] == analysis.EVENT_TYPES.index('stop') ]
+    np.testing.assert_array_equal( stops['magnitude'], stops['end'] - stops['start'] )
+
+    # Stops are frames without go phase
+    for o, start, end in stops[ [ 'object', 'start', 'end' ] ]:
+        assert ( experiment.go_phase[ experiment.objects[o] ].loc[ start : end - 1 ] == 0 ).all()
+
+
+def test_select_events(experiment):
+    ev = analysis.detect_events( experiment, events='stop' )
+    assert set( ev['event'] ) == { analysis.EVENT_TYPES.index('stop') }
+
+    with pytest.raises(ValueError):
+        analysis.detect_events( experiment, events='jump' )
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import pyfim
+from pyfim import features
+
+from conftest import write_fimtrack_csv
+
+
+def test_experiment(experiment):
+    X, rows, columns = features.feature_matrix( experiment )
+
+    assert X.shape == ( experiment.n_objects, len(columns) )
+    assert X.dtype == np.float32
+    assert list( rows ) == list( experiment.objects )
+
+    np.testing.assert_allclose( X[:, columns.index.get_loc('stops')],
+                                experiment.stops[ rows ].values, rtol=1e-6 )
+    np.testing.assert_allclose( X[:, columns.index.get_loc('velocity_q50')],
+                                experiment.velocity[ rows ].median().values, rtol=1e-6 )
+
+    # Parameters that are not available are NaN
+    X = features.feature_matrix( experiment, analyses=[ 'not_an_analysis' ], as_frame=True )
+    assert X['not_an_analysis'].isnull().all()
+
+
+def test_spectral():
+    fps = pyfim.defaults['FPS']
+    t = np.arange( 400 ) / fps
+    values = np.column_stack( [ np.sin( 2 * np.pi * 1 * t ), np.ones( len(t) ) ] )
+
+    out = features._spectral_features( values, [ ( 0, .5 ), ( .5, 1.5 ) ] )
+
+    assert out[0, 0] == pytest.approx( 1, abs=fps / len(t) )
+    assert out[0, 1] > .9
+    assert out[0, 5] == pytest.approx( 1, abs=.01 )
+    # No power -> NaN
+    assert np.isnan( out[1] ).all()
+
+
+@pytest.mark.parametrize('n_frames', [ 0, 1, 2, 3 ])
+def test_spectral_short(n_frames):
+    values = np.arange( n_frames * 2, dtype=float ).reshape( n_frames, 2 )
+    with np.errstate(all='raise'):
+        assert np.isnan( features._spectral_features( values, [ ( 0, 1 ) ] ) ).all()
+
+
+def test_collection(tmp_path):
+    coll = pyfim.Collection( spill_dir=str( tmp_path / 'spill' ) )
+    for i in range(3):
+        coll.add_data( str( write_fimtrack_csv( tmp_path / '{0}.csv'.format(i), seed=i ) ), label='exp{0}'.format(i) )
+
+    expected = features.feature_matrix( coll, as_frame=True )
+    assert list( expected.index.names ) == [ 'experiment', 'object' ]
+    assert expected.index.get_level_values('experiment').unique().tolist() == coll.experiments
+
+    # Room for about one experiment -> experiments are loaded one at a time
+    coll.memory_budget = int( coll.memory_usage().total.max() * 1.5 )
+    pyfim.defaults['MEMORY_BUDGET_ACTIONS'] = [ 'spill' ]
+    coll.enforce_budget()
+    assert len( coll._spilled ) == 2
+
+    X = features.feature_matrix( coll, as_frame=True )
+    assert X.equals( expected )
+    assert len( coll._spilled ) == 2
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import pyfim
+from pyfim import analysis
+
+ANALYSES = [ 'stops', 'head_bends', 'pause_turns', 'peristalsis_frequency' ]
+
+
+@pytest.fixture(autouse=True)
+def more_events():
+    # Make sure the synthetic tracks have events of all kinds
+    pyfim.defaults['MIN_GO_TIME'] = 3
+    pyfim.defaults['MIN_STOP_TIME'] = 3
+    pyfim.defaults['TURN_ANGLE_THRESHOLD'] = 5
+
+
+@pytest.mark.parametrize('name', ANALYSES)
+def test_whole_track(name, experiment):
+    expected = getattr(analysis, name)( experiment )
+    freq = analysis.frequency_over_time( experiment, name, window=experiment.n_frames )
+
+    assert freq.shape == ( 1, experiment.n_objects )
+    np.testing.assert_allclose( freq.iloc[0].values, expected[ freq.columns ].values )
+
+
+@pytest.mark.parametrize('name', ANALYSES)
+def test_windows_add_up(name, experiment):
+    window = experiment.n_frames // 4
+    full = analysis.frequency_over_time( experiment, name, window=experiment.n_frames ).iloc[0]
+    freq = analysis.frequency_over_time( experiment, name, window=window )
+
+    # Tumbling windows: frequency x tracked time adds up to the total count
+    assert freq.shape[0] == 4
+    assert list( freq.index ) == list( experiment.go_phase.index[ ::window ][:4] )
+    valid = analysis._detect_events( experiment, name )[1]
+    tracked = valid.values[ : 4 * window ].reshape( 4, window, -1 ).sum( axis=1 )
+    counts = np.nansum( freq.values * tracked, axis=0 )
+    np.testing.assert_allclose( counts, full.values * valid.values[ : 4 * window ].sum( axis=0 ) )
+
+    # Sliding windows
+    sliding = analysis.frequency_over_time( experiment, name, window=window, step=window // 2 )
+    assert sliding.shape[0] == 7
+    np.testing.assert_allclose( sliding.iloc[::2].values, freq.values )
+
+
+def test_invalid_window(experiment):
+    with pytest.raises(ValueError):
+        analysis.frequency_over_time( experiment, 'stops', window=0 )
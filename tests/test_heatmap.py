@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import pyfim
+from pyfim.heatmap import Heatmap
+
+from conftest import write_fimtrack_csv
+
+
+def test_counts_match_histogram2d():
+    rng = np.random.default_rng( 0 )
+    x, y = rng.uniform( 0, 10, 1000 ), rng.uniform( 0, 5, 1000 )
+    # Edges, outside and untracked positions
+    x = np.r_[ x, 10, 0, -1, 11, np.nan ]
+    y = np.r_[ y, 5, 0, 1, 1, 1 ]
+
+    hm = Heatmap( ( 0, 10, 0, 5 ), bins=( 20, 7 ) )
+    # Chunks add up to the same counts
+    hm.add( x[:500], y[:500] ).add( x[500:], y[500:] )
+
+    valid = ~np.isnan( x )
+    expected, _, _ = np.histogram2d( x[valid], y[valid], bins=( hm.x_edges, hm.y_edges ) )
+
+    np.testing.assert_array_equal( hm.counts, expected.T )
+    assert hm.n_outside == 2
+    assert hm.n_positions == 1002
+
+
+def test_merge():
+    a = Heatmap( ( 0, 1, 0, 1 ), bins=4 ).add( [ .1, .9 ], [ .1, .9 ] )
+    b = Heatmap( ( 0, 1, 0, 1 ), bins=4 ).add( [ .1 ], [ .1 ] )
+
+    merged = pyfim.heatmap.merge( a, b )
+    np.testing.assert_array_equal( merged.counts, a.counts + b.counts )
+    np.testing.assert_array_equal( ( a + b ).counts, merged.counts )
+    # Inputs are not modified
+    assert a.n_positions == 2
+
+    with pytest.raises(ValueError):
+        a + Heatmap( ( 0, 1, 0, 1 ), bins=5 )
+
+    with pytest.raises(ValueError):
+        a + Heatmap( ( 0, 2, 0, 1 ), bins=4 )
+
+
+def test_experiment_chunks(experiment):
+    extent = pyfim.heatmap.data_extent( experiment )
+    full = Heatmap( extent, bins=30 ).add_experiment( experiment, chunk_size=10 ** 6 )
+    chunked = Heatmap( extent, bins=30 ).add_experiment( experiment, chunk_size=7 )
+
+    np.testing.assert_array_equal( full.counts, chunked.counts )
+    assert full.n_positions == int( experiment.mom_x.notnull().values.sum() )
+    assert full.n_outside == 0
+
+
+def test_collection_combine(tmp_path):
+    coll = pyfim.Collection()
+    coll.add_data( str( write_fimtrack_csv( tmp_path / 'a.csv', seed=1 ) ), label='a' )
+    coll.add_data( str( write_fimtrack_csv( tmp_path / 'b.csv', seed=2 ) ), label='b' )
+
+    extent = ( 0, 2000, 0, 2000 )
+    hms = coll.heatmap( extent=extent, bins=25 )
+    combined = coll.heatmap( extent=extent, bins=25, combine=True )
+
+    assert sorted( hms ) == [ 'a', 'b' ]
+    np.testing.assert_array_equal( combined.counts, hms['a'].counts + hms['b'].counts )
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pyfim
+from pyfim import io as fim_io
+
+h5py = pytest.importorskip('h5py')
+
+formats = [ ( fim_io.to_hdf5, fim_io.read_hdf5, 'exp.h5' ),
+            pytest.param( fim_io.to_zarr, fim_io.read_zarr, 'exp.zarr',
+                          marks=pytest.mark.skipif( fim_io.zarr is None, reason='zarr not installed' ) ) ]
+
+
+def _assert_same(a, b, parameters=None, objects=None):
+    for p in ( parameters or a.parameters ):
+        x, y = getattr(a, p), getattr(b, p)
+        if isinstance(x, pd.DataFrame):
+            if objects:
+                x = x[ [ o for o in objects if o in x.columns ] ]
+            pd.testing.assert_frame_equal( x.astype(float), y, check_index_type=False, check_column_type=False )
+        elif isinstance(x, pd.Series):
+            if objects:
+                x = x[ objects ]
+            pd.testing.assert_series_equal( x.astype(float), y, check_index_type=False, check_names=False )
+        else:
+            assert x == pytest.approx( y )
+
+
+@pytest.mark.parametrize('write, read, fn', formats)
+def test_round_trip(write, read, fn, experiment, tmp_path):
+    write( experiment, str( tmp_path / fn ) )
+    exp = read( str( tmp_path / fn ) )
+
+    assert sorted( exp.parameters ) == sorted( experiment.parameters )
+    assert sorted( exp._original_params ) == sorted( experiment._original_params )
+    _assert_same( experiment, exp )
+
+
+@pytest.mark.parametrize('write, read, fn', formats)
+def test_subset(write, read, fn, experiment, tmp_path):
+    write( experiment, str( tmp_path / fn ) )
+
+    objects = list( experiment.objects[::-1][:2] )
+    exp = read( str( tmp_path / fn ), parameters=[ 'mom_x', 'velocity' ], objects=objects )
+
+    assert exp.parameters == [ 'mom_x', 'velocity' ]
+    assert list( exp.mom_x.columns ) == objects
+    _assert_same( experiment, exp, parameters=[ 'mom_x' ], objects=objects )
+
+
+@pytest.mark.parametrize('write, read, fn', formats)
+def test_non_contiguous_frames(write, read, fn, experiment, tmp_path):
+    # E.g. after dropping frames
+    experiment.mom_x = experiment.mom_x.iloc[ np.r_[ 10:50, 60:80 ] ]
+
+    write( experiment, str( tmp_path / fn ) )
+    exp = read( str( tmp_path / fn ), parameters='mom_x' )
+
+    np.testing.assert_array_equal( exp.mom_x.index, experiment.mom_x.index )
+
+
+@pytest.mark.parametrize('write, read, fn', formats)
+def test_groups(write, read, fn, csv_file, tmp_path):
+    a = pyfim.Experiment( csv_file )
+    b = pyfim.Experiment( csv_file, parameters=[ 'mom_x', 'mom_y' ] )
+    path = str( tmp_path / fn )
+
+    write( a, path, group='a' )
+    # Writing to the root must not remove other experiments
+    write( b, path )
+    write( b, path )
+
+    _assert_same( a, read( path, group='a' ) )
+    _assert_same( b, read( path ) )
+
+    # Writing to a group replaces its content
+    write( b, path, group='a' )
+    assert sorted( read( path, group='a' ).parameters ) == sorted( b.parameters )
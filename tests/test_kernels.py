@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import peakutils
+import pytest
+
+import pyfim
+from pyfim import analysis, kernels
+
+numba_modes = [ False,
+                pytest.param( True, marks=pytest.mark.skipif( kernels.numba is None,
+                                                              reason='numba not installed' ) ) ]
+
+
+def _reference_phases(x, mode, min_len):
+    """ Plain Python run finder. """
+    x = np.asarray( x, dtype=float )
+    x = x[ ~np.isnan(x) ].astype(int)
+    phases, start = [], 0
+    for i in range( 1, len(x) + 1 ):
+        if i == len(x) or x[i] != x[start]:
+            if ( mode == 'ALL' or x[start] == ( mode == 'ON' ) ) and i - start >= min_len:
+                phases.append( ( start, i ) )
+            start = i
+    return phases
+
+
+@pytest.mark.parametrize('use_numba', numba_modes)
+@pytest.mark.parametrize('mode', ['ON', 'OFF', 'ALL'])
+@pytest.mark.parametrize('x', [ [],
+                                [ np.nan, np.nan ],
+                                [ 1, 1, 0, 0, 0, 1 ],
+                                [ 0, 1, 1, 1, 0, 0 ],
+                                [ 1, np.nan, 1, 0, 1, 1, 1 ],
+                                [ 1, 1, 1 ] ])
+def test_binary_phases_parity(use_numba, mode, x):
+    pyfim.defaults['USE_NUMBA'] = use_numba
+    for min_len in ( 1, 2 ):
+        phases = analysis.binary_phases( np.array( x, dtype=float ), mode=mode, min_len=min_len )
+        assert [ tuple(p) for p in phases ] == _reference_phases( x, mode, min_len )
+
+
+@pytest.mark.parametrize('use_numba', numba_modes)
+@pytest.mark.parametrize('y', [ np.zeros(0),
+                                np.ones(10),
+                                np.array([ 0, 2, 0, 2, 0, 2, 0 ], dtype=float),  # tied peaks
+                                np.array([ 0, 3, 3, 0, 1, 1, 1, 0 ], dtype=float),  # plateaus
+                                np.array([ 5, 1, 0, 1, 5 ], dtype=float),  # peaks at the edges
+                                np.sin( np.arange(200) / 3 ) + np.random.default_rng(0).normal(0, .1, 200) ])
+@pytest.mark.parametrize('min_dist', [ 1, 3 ])
+def test_peak_indexes_parity(use_numba, y, min_dist):
+    pyfim.defaults['USE_NUMBA'] = use_numba
+    expected = peakutils.indexes( y, thres=0.3, min_dist=min_dist ) if len(y) else np.zeros(0, dtype=int)
+    np.testing.assert_array_equal( kernels.peak_indexes( y, min_dist=min_dist ), expected )
+
+
+def _reference_fill_gaps(col, max_gap):
+    """ Fills OFF runs of <= max_gap frames with ON frames on both sides. """
+    col = col.copy()
+    i = 0
+    while i < len(col):
+        if col[i] != 0:
+            i += 1
+            continue
+        j = i
+        while j < len(col) and col[j] == 0:
+            j += 1
+        if 0 < i and j < len(col) and j - i <= max_gap and col[i - 1] > 0 and col[j] > 0:
+            col[i:j] = col[i - 1]
+        i = j
+    return col
+
+
+@pytest.mark.parametrize('col', [ [],
+                                  [ np.nan, np.nan, np.nan ],
+                                  [ 0, 0, 1, 1, 0, 1 ],  # gap at the start
+                                  [ 1, 0, 1, 1, 0, 0 ],  # gap at the end
+                                  [ 1, 0, 0, 0, 1, 0, 0, 0, 0, 1 ],  # short and long gap
+                                  [ 1, 0, np.nan, 0, 1 ] ])  # NaN breaks the gap
+def test_fill_gaps_parity(col):
+    x = np.array( col, dtype=float ).reshape(-1, 1)
+    expected = _reference_fill_gaps( x[:, 0], 3 )
+    np.testing.assert_array_equal( kernels.fill_gaps( x.copy(), 3 )[:, 0], expected )
+
+
+def _reference_pause_turns(exp):
+    """ Plain Python pause-turn counter (one pause at a time). """
+    smoothed = exp.mov_direction.rolling( pyfim.defaults['DIRECTION_SMOOTHING'] ).median()
+    turns = []
+    for obj in exp.mov_direction:
+        go_phases = analysis.binary_phases( exp.go_phase[obj].values, mode='ON' )
+        n = 0
+        for this_go, next_go in zip( go_phases, go_phases[1:] ):
+            if ( this_go[1] - this_go[0] ) < pyfim.defaults['MIN_GO_TIME'] or \
+               ( next_go[1] - next_go[0] ) < pyfim.defaults['MIN_GO_TIME'] or \
+               ( next_go[0] - this_go[1] ) < pyfim.defaults['MIN_STOP_TIME']:
+                continue
+            if abs( smoothed.loc[ this_go[1] - 1, obj ] - smoothed.loc[ next_go[0] + 1, obj ] ) >= pyfim.defaults['TURN_ANGLE_THRESHOLD']:
+                n += 1
+        turns.append( n / ( exp.mov_direction[obj].dropna().shape[0] / pyfim.defaults['FPS'] ) )
+    return np.array( turns )
+
+
+@pytest.mark.parametrize('use_numba', numba_modes)
+def test_pause_turns_parity(use_numba, experiment):
+    pyfim.defaults['USE_NUMBA'] = use_numba
+    # Make sure there are pauses to evaluate
+    pyfim.defaults['MIN_GO_TIME'] = 3
+    pyfim.defaults['MIN_STOP_TIME'] = 3
+    pyfim.defaults['TURN_ANGLE_THRESHOLD'] = 5
+
+    expected = _reference_pause_turns( experiment )
+    assert expected.sum() > 0
+    np.testing.assert_allclose( analysis.pause_turns( experiment ).values, expected )
+
+
+def test_pause_turns_missing_frames():
+    pyfim.defaults['MIN_GO_TIME'] = 2
+    pyfim.defaults['MIN_STOP_TIME'] = 2
+    pyfim.defaults['TURN_ANGLE_THRESHOLD'] = 45
+
+    go_phase = np.array( [ 1, 1, 1, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 1, 1, 1 ], dtype=float )
+    directions = np.zeros( len(go_phase) )
+    # The last frame points elsewhere -> must never be used for missing frames
+    directions[-1] = 180
+
+    # Index shifted (e.g. by CUT_TABLE_HEAD) -> first pause can't be evaluated
+    index = pd.RangeIndex( 3, 3 + len(go_phase) )
+    this_go, next_go, is_turn, angle = analysis._find_pause_turns( go_phase, directions, index )
+
+    assert len(is_turn) == 2
+    assert np.isnan( angle[0] ) and not is_turn[0]
+    assert angle[1] == 0 and not is_turn[1]
+
+    # Gaps in the index
+    index = pd.Index( [ 0, 1, 3, 4, 5, 6, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17 ] )
+    is_turn, angle = analysis._find_pause_turns( go_phase, directions, index )[2:]
+    assert np.isnan( angle[0] ) and not is_turn.any()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+import pyfim
+from pyfim import kinematics
+
+
+def _heading(exp):
+    """ Direction [degrees] of the (straight) synthetic larvae. """
+    return np.degrees( np.arctan2( exp.head_y.values - exp.tail_y.values,
+                                   exp.head_x.values - exp.tail_x.values ) )
+
+
+def test_not_run_by_default(experiment):
+    assert 'tortuosity' not in pyfim.analysis.__all__
+    assert 'tortuosity' in pyfim.analysis.__kinematics__
+    assert 'segment_angles' not in pyfim.analysis.__kinematics__
+
+    for a in pyfim.analysis.__kinematics__:
+        assert a not in experiment.parameters
+
+
+def test_run_kinematics(experiment):
+    experiment.run_analyses( pyfim.analysis.__kinematics__ )
+
+    for a in pyfim.analysis.__kinematics__:
+        assert a in experiment.parameters
+        # Results are per object -> can be summarised like other parameters
+        assert len( pyfim.core._param_means( experiment, a ) ) == experiment.n_objects
+
+
+def test_segment_angles(experiment):
+    angles = kinematics.segment_angles( experiment )
+
+    assert angles.shape == ( experiment.n_frames, 4 * experiment.n_objects )
+    assert list( angles.columns.levels[0] ) == sorted( kinematics.SEGMENTS )
+
+    # Synthetic larvae are straight -> all segments point in the same direction
+    for s in kinematics.SEGMENTS:
+        diff = kinematics._wrap( angles[s].values - _heading( experiment ) )
+        np.testing.assert_allclose( diff, 0, atol=1e-6 )
+
+
+def test_straight_body(experiment):
+    np.testing.assert_allclose( kinematics.body_curvature( experiment ).values, 0, atol=1e-6 )
+
+    velocity = kinematics.head_angular_velocity( experiment )
+    assert velocity.iloc[0].isnull().all()
+    np.testing.assert_allclose( velocity.values[1:], 0, atol=1e-6 )
+
+
+def test_heading_change(experiment):
+    change = kinematics.heading_change( experiment )
+    expected = kinematics._wrap( np.diff( _heading( experiment ), axis=0 ) )
+
+    assert change.iloc[0].isnull().all()
+    np.testing.assert_allclose( change.values[1:], expected, atol=1e-6 )
+
+
+def test_tortuosity():
+    exp = pyfim.Experiment( None )
+    # Straight line, detour and (almost) untracked object
+    x = pd.DataFrame( { 'object_0': [ 0., 1., 2., 3. ],
+                        'object_1': [ 0., 1., 1., 0. ],
+                        'object_2': [ 5., np.nan, np.nan, np.nan ] } )
+    y = pd.DataFrame( { 'object_0': [ 0., 0., 0., 0. ],
+                        'object_1': [ 0., 0., 1., 1. ],
+                        'object_2': [ 5., np.nan, np.nan, np.nan ] } )
+    exp.spinepoint_2_x, exp.spinepoint_2_y = x, y
+    exp.parameters = [ 'spinepoint_2_x', 'spinepoint_2_y' ]
+
+    tort = kinematics.tortuosity( exp )
+
+    assert tort['object_0'] == 1
+    assert tort['object_1'] == 3
+    assert np.isnan( tort['object_2'] )
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+import pyfim
+from pyfim import analysis
+from pyfim.core import _read_csv
+
+from conftest import write_fimtrack_csv
+
+
+def _raw(fn, p):
+    raw = _read_csv( fn, parameters=p )
+    return raw.values
+
+
+def test_partial_writes(tmp_path):
+    src = str( write_fimtrack_csv( tmp_path / 'src.csv' ) )
+    with open(src) as f:
+        text = f.read()
+
+    fn = str( tmp_path / 'live.csv' )
+    tail = pyfim.LiveTail( fn, capacity=16 )
+    assert tail.poll() == {}
+
+    # File is written in chunks that split lines
+    n_new = 0
+    for i in range( 0, len(text), 7919 ):
+        with open(fn, 'a') as f:
+            f.write( text[ i : i + 7919 ] )
+        n_new += sum( len( v[0] ) for v in tail.poll().values() )
+    assert tail.poll() == {}
+
+    assert tail.objects == [ 'object_0', 'object_1', 'object_2' ]
+    assert n_new == 200 * len( tail.parameters )
+    for p in [ 'mom_x', 'go_phase' ]:
+        np.testing.assert_array_equal( tail.data(p).values, _raw( src, p ) )
+
+    # Running metrics
+    metrics = tail.metrics
+    np.testing.assert_allclose( metrics.distance, _raw( src, 'mom_dst' ).sum( axis=0 ) )
+    np.testing.assert_allclose( metrics.velocity, _raw( src, 'velocity' ).mean( axis=0 ) )
+
+    go_phase = _raw( src, 'go_phase' )
+    stops = [ len( analysis.binary_phases( go_phase[:, i], mode='OFF',
+                                           min_len=pyfim.defaults['MIN_STOP_PHASE'] ) )
+              for i in range( go_phase.shape[1] ) ]
+    assert sum(stops) > 0
+    assert metrics.stops.tolist() == stops
+
+    # Same as loading the finished file
+    exp = tail.to_experiment()
+    pd.testing.assert_frame_equal( exp.mom_x, pyfim.Experiment( src ).mom_x, check_index_type=False )
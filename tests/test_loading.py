@@ -0,0 +1,78 @@
+import io
+
+import pandas as pd
+
+import pyfim
+from pyfim.core import _load_file, _read_csv
+
+from conftest import write_fimtrack_csv
+
+
+class CountingStringIO(io.StringIO):
+    """ Counts lines read. """
+    n_lines = 0
+
+    def __next__(self):
+        self.n_lines += 1
+        return super().__next__()
+
+
+def test_read_subset(csv_file):
+    full = _read_csv( csv_file )
+    subset = _read_csv( csv_file, parameters=[ 'mom_x', 'mom_y' ] )
+
+    assert set( p[ : p.find('(') ] for p in subset.index ) == { 'mom_x', 'mom_y' }
+    pd.testing.assert_frame_equal( subset, full.loc[ subset.index ] )
+
+
+def test_read_stops_after_last_block(csv_file):
+    with open(csv_file) as f:
+        text = f.read()
+    n_lines = text.count('\n')
+
+    # "acc_dst" is the first block -> rest of the file is skipped
+    fh = CountingStringIO( text )
+    subset = _read_csv( fh, parameters='acc_dst' )
+
+    assert subset.shape[0] == 200
+    assert fh.n_lines < n_lines / 2
+
+
+def test_experiment_parameters(csv_file):
+    full = pyfim.Experiment( csv_file )
+    exp = pyfim.Experiment( csv_file, parameters=[ 'mom_x', 'mom_y', 'go_phase' ] )
+
+    assert set( exp._original_params ) == { 'mom_x', 'mom_y', 'go_phase' }
+    assert 'velocity' not in exp.parameters
+    pd.testing.assert_frame_equal( exp.mom_x, full.mom_x )
+
+    # Analyses that only need loaded parameters are still run
+    assert set( exp.parameters ) - set( exp._original_params ) == { 'stops', 'stop_duration' }
+    pd.testing.assert_series_equal( exp.stops, full.stops )
+
+
+def test_pipelined_processes_use_defaults(tmp_path):
+    fn = str( tmp_path / 'exp.csv' )
+    write_fimtrack_csv( fn, n_objects=3, n_frames=200 )
+
+    pyfim.defaults['MIN_TRACK_LENGTH'] = 150
+    pyfim.defaults['PIXEL2MM'] = False
+
+    exp = pyfim.Experiment( fn )
+    pipelined = pyfim.load_pipelined( fn, n_workers=2, processes=True )
+
+    pd.testing.assert_frame_equal( pipelined.mom_x, exp.mom_x )
+    pd.testing.assert_series_equal( pipelined.stops, exp.stops )
+
+
+def test_load_file_applies_config(tmp_path):
+    fn = str( tmp_path / 'exp.csv' )
+    write_fimtrack_csv( fn, n_objects=3, n_frames=200 )
+    with open( fn, 'rb' ) as fh:
+        payload = fh.read()
+
+    config = dict( pyfim.defaults, PIXEL2MM=False )
+    raw = _load_file( payload, config=config )
+
+    assert pyfim.defaults['PIXEL2MM'] is False
+    pd.testing.assert_frame_equal( raw.mom_x, pyfim.Experiment( fn ).mom_x )
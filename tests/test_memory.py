@@ -0,0 +1,97 @@
+import numpy as np
+
+import pyfim
+
+from conftest import write_fimtrack_csv
+
+
+def test_memory_usage_kinds(csv_file):
+    exp = pyfim.Experiment( csv_file, keep_raw=True )
+    mem = exp.memory_usage()
+
+    assert set( mem.kind ) >= { 'parameter', 'analysis', 'raw' }
+    assert mem.loc['raw_data', 'kind'] == 'raw'
+    assert mem.loc['mom_x', 'kind'] == 'parameter'
+    assert mem.loc['mom_x', 'bytes'] == exp.mom_x.memory_usage( deep=True ).sum()
+
+
+def test_downcast(experiment):
+    before = experiment.memory_usage().bytes.sum()
+    mom_x = experiment.mom_x.copy()
+
+    saved = experiment.downcast()
+
+    assert saved > 0
+    assert experiment.memory_usage().bytes.sum() == before - saved
+    assert ( experiment.mom_x.dtypes == np.float32 ).all()
+    np.testing.assert_allclose( experiment.mom_x.values, mom_x.values, rtol=1e-6 )
+
+
+def test_experiment_budget(csv_file):
+    pyfim.defaults['MEMORY_BUDGET'] = 1
+    pyfim.defaults['MEMORY_BUDGET_ACTIONS'] = [ 'downcast' ]
+
+    assert ( pyfim.Experiment( csv_file ).mom_x.dtypes == np.float32 ).all()
+
+    # Collections enforce their own budget instead
+    coll = pyfim.Collection( memory_budget=10 ** 12 )
+    coll.add_data( csv_file, label='a' )
+    assert ( coll.a.mom_x.dtypes == np.float64 ).all()
+
+
+def test_spill_round_trip(tmp_path):
+    coll = pyfim.Collection( spill_dir=str( tmp_path / 'spill' ) )
+    coll.add_data( str( write_fimtrack_csv( tmp_path / 'a.csv', seed=1 ) ), label='a' )
+    coll.add_data( str( write_fimtrack_csv( tmp_path / 'b.csv', seed=2 ) ), label='b' )
+
+    velocity = coll.velocity.copy()
+    summary = coll.summary()
+    mom_x = coll.a.mom_x.copy()
+
+    # Room for one experiment only -> least recently used is spilled
+    size = coll.memory_usage().total.max()
+    coll.memory_budget = int( size * 1.5 )
+    pyfim.defaults['MEMORY_BUDGET_ACTIONS'] = [ 'spill' ]
+
+    assert coll.enforce_budget()
+    assert list( coll._spilled ) == [ 'a' ]
+    assert 'a' not in coll.__dict__
+    assert coll.memory_usage().loc['a', 'total'] == 0
+
+    # Collection-level data does not need the spilled experiment
+    assert coll.summary().equals( summary )
+    coll.extract_data()
+    assert coll.velocity.equals( velocity )
+    assert 'a' in coll._spilled
+
+    # Accessing it loads it back and spills the other one
+    assert coll.a.mom_x.equals( mom_x )
+    assert list( coll._spilled ) == [ 'b' ]
+
+    # Explicit fetches update the order of use
+    coll._get( 'b' )
+    assert list( coll._last_used )[-1] == 'b'
+    assert list( coll._spilled ) == [ 'a' ]
+
+
+def test_spill_file_object(tmp_path):
+    coll = pyfim.Collection( spill_dir=str( tmp_path / 'spill' ) )
+    with open( write_fimtrack_csv( tmp_path / 'a.csv', seed=1 ), 'r' ) as f:
+        coll.add_data( f, label='a' )
+    coll.add_data( [ str( write_fimtrack_csv( tmp_path / 'b.csv', seed=2 ) ) ], label='b' )
+    mom_x = coll.a.mom_x.copy()
+
+    coll.memory_budget = 1
+    pyfim.defaults['MEMORY_BUDGET_ACTIONS'] = [ 'spill' ]
+
+    # Experiment read from a file object can be spilled
+    coll.enforce_budget( keep='b' )
+    assert 'a' in coll._spilled
+
+    exp = coll.a
+    assert exp.mom_x.equals( mom_x )
+    assert exp._files == [] and exp._source is None
+
+    # File names survive spilling
+    assert 'b' in coll._spilled
+    assert coll.b._files == [ str( tmp_path / 'b.csv' ) ]
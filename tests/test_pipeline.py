@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+
+import pyfim
+from pyfim.pipeline import Pipeline, Stage
+
+
+def test_stage_key_tracks_code():
+    a = Stage( 'custom', lambda exp: exp.mom_x * 2 )
+    b = Stage( 'custom', lambda exp: exp.mom_x * 3 )
+    assert a.key() != b.key()
+
+    c = Stage( 'custom', a.func )
+    assert a.key() == c.key()
+
+    # Explicit version bump
+    d = Stage( 'custom', a.func, version=2 )
+    assert a.key() != d.key()
+
+    assert a.key()['pyfim'] == pyfim.__version__
+
+
+def test_checkpoints(csv_file, tmp_path):
+    cache = str( tmp_path / 'cache' )
+
+    exp = Pipeline( cache_dir=cache ).run( csv_file )
+    files = sorted( os.listdir( cache ) )
+    assert files
+
+    # Second run resumes from the last checkpoint and writes nothing new
+    again = Pipeline( cache_dir=cache ).run( csv_file )
+    assert sorted( os.listdir( cache ) ) == files
+    np.testing.assert_array_equal( again.stops.values, exp.stops.values )
+
+    # Changing an analysis parameter invalidates only later stages
+    pyfim.defaults['MIN_STOP_PHASE'] = 9
+    pl = Pipeline( cache_dir=cache )
+    keys = pl.keys( csv_file )
+    pl.run( csv_file )
+    new = set( os.listdir( cache ) ) - set( files )
+    assert new == { 'analyze_{0}.pkl'.format( keys[ pl.names.index('analyze') ][:16] ) }
@@ -0,0 +1,43 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import pytest
+
+import pyfim
+
+
+@pytest.fixture(autouse=True)
+def close_figures():
+    yield
+    matplotlib.pyplot.close('all')
+
+
+def test_plot_tracks(experiment):
+    ax = experiment.plot_tracks()
+    lc = ax.collections[0]
+    segments = lc.get_segments()
+
+    assert len(segments) == int( experiment.head_x.notnull().values.sum() )
+    # Tail -> spine points -> head
+    obj = experiment.objects[0]
+    np.testing.assert_allclose( segments[0][0], [ experiment.tail_x[obj].iloc[0], experiment.tail_y[obj].iloc[0] ] )
+    np.testing.assert_allclose( segments[0][-1], [ experiment.head_x[obj].iloc[0], experiment.head_y[obj].iloc[0] ] )
+
+
+def test_plot_tracks_decimation(experiment):
+    obj = experiment.objects[:2]
+    full = experiment.plot_tracks( obj=obj ).collections[0].get_segments()
+
+    strided = experiment.plot_tracks( obj=obj, stride=3 ).collections[0].get_segments()
+    n_frames = len( range( 0, experiment.n_frames, 3 ) )
+    assert len(strided) == sum( experiment.head_x[o].iloc[::3].notnull().sum() for o in obj ) <= 2 * n_frames
+    np.testing.assert_allclose( strided[1], full[3] )
+
+    limited = experiment.plot_tracks( obj=obj, max_segments=50 ).collections[0].get_segments()
+    assert 25 <= len(limited) <= 50
+
+
+def test_plot_tracks_missing_object(experiment):
+    with pytest.raises(ValueError):
+        experiment.plot_tracks( obj='object_999' )
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pyfim
+from pyfim.roi import Circle, Polygon
+
+
+def _experiment(x, y):
+    exp = pyfim.Experiment(None)
+    exp.mom_x = pd.DataFrame( x, columns=[ 'object_{0}'.format(i) for i in range( np.shape(x)[1] ) ] )
+    exp.mom_y = pd.DataFrame( y, columns=exp.mom_x.columns )
+    exp.parameters = [ 'mom_x', 'mom_y' ]
+    exp._original_params = [ 'mom_x', 'mom_y' ]
+    return exp
+
+
+def test_polygon_contains():
+    # Concave "L" shape
+    poly = Polygon( [ (0, 0), (2, 0), (2, 1), (1, 1), (1, 2), (0, 2) ] )
+    x = np.array( [ .5, 1.5, 1.5, .5, 3, np.nan ] )
+    y = np.array( [ .5, .5, 1.5, 1.5, .5, .5 ] )
+    np.testing.assert_array_equal( poly.contains( x, y ), [ True, True, False, True, False, False ] )
+
+
+def test_circle_contains():
+    circle = Circle( (0, 0), 1 )
+    assert circle.contains( np.array([ .5, 2 ]), np.array([ .5, 0 ]) ).tolist() == [ True, False ]
+
+
+def test_occupancy_and_pi():
+    # Object 0 always left, object 1 always right, object 2 switches
+    x = [ [ 1, 9, 1 ],
+          [ 1, 9, 9 ],
+          [ 1, 9, 9 ],
+          [ 1, 9, np.nan ] ]
+    exp = _experiment( x, np.ones( (4, 3) ) )
+    rois = [ Polygon( [ (0, 0), (5, 0), (5, 5), (0, 5) ], name='left' ),
+             Polygon( [ (5, 0), (10, 0), (10, 5), (5, 5) ], name='right' ) ]
+
+    occ = pyfim.roi.occupancy( exp, rois )
+    assert occ.left.tolist() == [ 2, 1, 1, 1 ]
+    assert occ.right.tolist() == [ 1, 2, 2, 1 ]
+
+    tir = pyfim.roi.time_in_regions( exp, rois )
+    assert tir.loc['object_2', 'right'] == pytest.approx( 2 / 3 )
+
+    pi = pyfim.roi.preference_index( exp, rois, over_time=True )
+    np.testing.assert_allclose( pi.left.values, [ 1 / 3, -1 / 3, -1 / 3, 0 ] )
+    np.testing.assert_allclose( pi.right.values, -pi.left.values )
+
+
+def test_overlapping_regions_count_for_each():
+    exp = _experiment( [ [ 1 ] ], [ [ 1 ] ] )
+    rois = [ Circle( (0, 0), 5, name='a' ), Circle( (2, 2), 5, name='b' ) ]
+    assert pyfim.roi.occupancy( exp, rois ).iloc[0].tolist() == [ 1, 1 ]
+
+
+def test_unique_names():
+    with pytest.raises(ValueError):
+        pyfim.roi.occupancy( _experiment( [[1]], [[1]] ), [ Circle( (0, 0), 1, name='a' ),
+                                                           Circle( (0, 0), 2, name='a' ) ] )
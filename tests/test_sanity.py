@@ -0,0 +1,40 @@
+import numpy as np
+
+import pyfim
+
+
+def test_clean_data_is_ok(experiment):
+    report = experiment.sanity_check( verbose=False )
+
+    assert report['ok']
+    assert set( report['n_frames'].values() ) == { experiment.n_frames }
+
+
+def test_issues(experiment):
+    objects = experiment.objects
+
+    # Fewer frames
+    experiment.area = experiment.area.iloc[ :-10 ]
+    # Missing object
+    experiment.perimeter = experiment.perimeter.drop( columns=objects[0] )
+    # Empty column
+    velocity = experiment.velocity.copy()
+    velocity[ objects[1] ] = np.nan
+    experiment.velocity = velocity
+    # Non-binary values in thresholded parameter
+    go_phase = experiment.go_phase.copy()
+    go_phase.iloc[ :3, 0 ] = .5
+    experiment.go_phase = go_phase
+
+    report = experiment.sanity_check( verbose=False )
+
+    assert not report['ok']
+    assert report['frame_mismatch'] == [ 'area' ]
+    assert report['missing_objects'] == { 'perimeter': [ objects[0] ] }
+    assert report['empty_columns'] == { 'velocity': [ objects[1] ] }
+    assert report['non_binary'] == { 'go_phase': 3 }
+
+
+def test_empty_experiment():
+    report = pyfim.Experiment(None).sanity_check( verbose=False )
+    assert report['ok'] and report['n_frames'] == {}
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pyfim
+from pyfim import analysis, shared
+
+pytestmark = pytest.mark.skipif( shared.shared_memory is None, reason='needs Python 3.8+' )
+
+
+def test_attach(experiment):
+    with shared.SharedExperiment( experiment, parameters=[ 'mom_x', 'go_phase' ] ) as sh:
+        exp = shared.attach( sh.spec )
+
+        assert exp.parameters == [ 'go_phase', 'mom_x' ]
+        pd.testing.assert_frame_equal( exp.mom_x, experiment.mom_x[ exp.mom_x.columns ],
+                                       check_index_type=False )
+
+        # Views into shared memory, not copies
+        view = shared._view( shared._ATTACHED[ sh.name ], sh.spec['layout']['mom_x'] )
+        assert np.shares_memory( exp.mom_x.values, view )
+
+        # Contiguous chunk of objects
+        chunk = shared.attach( sh.spec, objects=slice( 1, 3 ) )
+        assert list( chunk.mom_x.columns ) == sh.spec['objects'][1:3]
+        pd.testing.assert_frame_equal( chunk.go_phase, experiment.go_phase[ chunk.go_phase.columns ],
+                                       check_index_type=False )
+        del exp, chunk, view
+
+
+def test_missing_parameter(experiment):
+    with pytest.raises(ValueError):
+        shared.SharedExperiment( experiment, parameters=[ 'not_a_parameter' ] )
+
+
+def test_run_parallel(experiment):
+    analyses = [ 'stops', 'pause_turns', 'head_bends' ]
+    expected = { a: getattr(experiment, a).copy() for a in analyses }
+
+    for a in analyses:
+        experiment.__dict__.pop( a )
+        experiment.parameters.remove( a )
+
+    # More chunks than workers
+    shared.run_parallel( experiment, analyses=analyses, n_cores=2, chunk_size=1 )
+
+    for a in analyses:
+        assert a in experiment.parameters
+        pd.testing.assert_series_equal( getattr(experiment, a), expected[a] )
@@ -0,0 +1,57 @@
+import copy
+
+import pandas as pd
+
+import pyfim
+from pyfim import analysis
+from pyfim.core import run_stacked
+
+from conftest import write_fimtrack_csv
+
+
+def _experiments(tmp_path):
+    a = pyfim.Experiment( str( write_fimtrack_csv( tmp_path / 'a.csv', seed=1 ) ) )
+    # Different number of frames and objects
+    b = pyfim.Experiment( str( write_fimtrack_csv( tmp_path / 'b.csv', n_objects=4, n_frames=150, seed=2 ) ) )
+    # Only some parameters -> some analyses can't be stacked
+    c = pyfim.Experiment( str( write_fimtrack_csv( tmp_path / 'c.csv', seed=3 ) ),
+                          parameters=[ 'mom_x', 'mom_y', 'go_phase', 'mov_direction' ] )
+    return [ a, b, c ]
+
+
+def test_matches_separate_runs(tmp_path):
+    experiments = _experiments( tmp_path )
+    expected = copy.deepcopy( experiments )
+    for exp in expected:
+        exp.run_analyses( analysis.__all__ )
+
+    # Drop results -> must be recomputed
+    for exp in experiments:
+        for a in analysis.__all__:
+            if a in exp.parameters:
+                exp.__dict__.pop( a )
+                exp.parameters.remove( a )
+
+    run_stacked( experiments, analysis.__all__ )
+
+    for exp, exp_exp in zip( experiments, expected ):
+        assert exp.parameters == exp_exp.parameters
+        for a in analysis.__all__:
+            if a in exp_exp.parameters:
+                pd.testing.assert_series_equal( getattr(exp, a).sort_index(),
+                                                getattr(exp_exp, a).sort_index(),
+                                                check_names=False )
+
+
+def test_collection(tmp_path):
+    coll = pyfim.Collection()
+    for label, exp in zip( 'ab', _experiments( tmp_path )[:2] ):
+        coll.add_data( exp, label=label )
+
+    before = coll.stops.copy()
+    coll.run_analyses( [ 'stops' ] )
+    pd.testing.assert_frame_equal( coll.stops, before )
+
+
+def test_empty():
+    assert run_stacked( [], analysis.__all__ ) is None
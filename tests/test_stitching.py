@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+import pyfim
+
+
+def _track(start, end, n_frames, x0=0):
+    """ Object moving along x in frames start..end (NaN elsewhere). """
+    x = np.full( n_frames, np.nan )
+    x[ start : end + 1 ] = x0 + np.arange( start, end + 1 )
+    return x
+
+
+def _experiment(tracks):
+    exp = pyfim.Experiment(None)
+    columns = [ 'object_{0}'.format(i) for i in range( len(tracks) ) ]
+    exp.mom_x = pd.DataFrame( np.array( tracks ).T, columns=columns )
+    exp.mom_y = exp.mom_x * 0 + 100
+    exp.parameters = [ 'mom_x', 'mom_y' ]
+    exp._original_params = [ 'mom_x', 'mom_y' ]
+    return exp
+
+
+def _write_csv(fn, tracks):
+    """ Writes mom_x/mom_y of given tracks as FIMTrack CSV. """
+    tracks = np.array( tracks )
+    with open(fn, 'w') as f:
+        f.write( ',' + ','.join( 'larva({0})'.format(i) for i in range( tracks.shape[0] ) ) + '\n' )
+        for p, values in [ ( 'mom_x', tracks ), ( 'mom_y', tracks * 0 + 100 ) ]:
+            for fr in range( values.shape[1] ):
+                f.write( '{0}({1}),'.format(p, fr) + ','.join( '' if np.isnan(v) else repr(float(v))
+                                                               for v in values[:, fr] ) + '\n' )
+    return str( fn )
+
+
+def test_stitch_split_track():
+    # Object 0 is lost for 2 frames and continues as object 1; object 2 is
+    # elsewhere
+    exp = _experiment( [ _track( 0, 59, 130 ), _track( 62, 129, 130 ), _track( 62, 129, 130, x0=1000 ) ] )
+
+    links = pyfim.stitching.find_links( exp, max_gap=5, max_distance=10 )
+    assert links[ [ 'object', 'next', 'gap' ] ].values.tolist() == [ [ 'object_0', 'object_1', 2 ] ]
+
+    merged = pyfim.stitching.stitch_tracks( exp, max_gap=5, max_distance=10 )
+    assert merged.to_dict() == { 'object_1': 'object_0' }
+    assert exp.mom_x.columns.tolist() == [ 'object_0', 'object_2' ]
+    np.testing.assert_array_equal( exp.mom_x.object_0.isnull().values.nonzero()[0], [ 60, 61 ] )
+
+
+def test_stitch_parameter_with_other_frames():
+    exp = _experiment( [ _track( 0, 59, 130 ), _track( 62, 129, 130 ) ] )
+    # Parameter missing the first 10 frames -> positions differ from labels
+    exp.area = exp.mom_x.iloc[ 10: ] * 2
+    exp.parameters.append( 'area' )
+    exp._original_params.append( 'area' )
+
+    pyfim.stitching.stitch_tracks( exp, max_gap=5, max_distance=10 )
+
+    assert exp.area.index.tolist() == list( range( 10, 130 ) )
+    pd.testing.assert_series_equal( exp.area.object_0, exp.mom_x.object_0.iloc[ 10: ] * 2 )
+
+
+def test_recordings_not_linked():
+    exp = _experiment( [ _track( 0, 59, 130 ), _track( 62, 129, 130 ) ] )
+
+    # Different recordings
+    exp._recording = pd.Series( [ 0, 1 ], index=exp.mom_x.columns )
+    assert pyfim.stitching.find_links( exp, max_gap=5, max_distance=10 ).empty
+
+    # Unknown recording
+    exp._recording = pd.Series( [ 0 ], index=[ 'object_0' ] )
+    assert pyfim.stitching.find_links( exp, max_gap=5, max_distance=10 ).empty
+
+    exp._recording = pd.Series( [ 0, 0 ], index=exp.mom_x.columns )
+    assert len( pyfim.stitching.find_links( exp, max_gap=5, max_distance=10 ) ) == 1
+
+
+def test_recordings_across_files(tmp_path):
+    # The second file starts right where the first one ended
+    a = _write_csv( tmp_path / 'a.csv', [ _track( 0, 59, 130 ) ] )
+    b = _write_csv( tmp_path / 'b.csv', [ _track( 62, 129, 130 ) ] )
+
+    merged = pyfim.Experiment( [ a, b ], parameters=[ 'mom_x', 'mom_y' ] )
+
+    updated = pyfim.Experiment( a, parameters=[ 'mom_x', 'mom_y' ] )
+    updated.update( b )
+
+    pipelined = pyfim.load_pipelined( [ a, b ], parameters=[ 'mom_x', 'mom_y' ], n_workers=2 )
+
+    for exp in [ merged, updated, pipelined ]:
+        assert exp._recording.reindex( exp.mom_x.columns ).tolist() == [ 0, 1 ]
+        assert pyfim.stitching.find_links( exp, max_gap=5, max_distance=10 ).empty
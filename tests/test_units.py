@@ -0,0 +1,57 @@
+import numpy as np
+
+import pyfim
+
+
+def test_repeated_extraction_converts_once(csv_file):
+    pyfim.defaults['PIXEL2MM'] = True
+
+    exp = pyfim.Experiment( csv_file, keep_raw=True )
+    mom_x = exp.mom_x.copy()
+    raw = exp.raw_data.copy()
+
+    exp.extract_data()
+
+    np.testing.assert_allclose( exp.mom_x.values, mom_x.values )
+    # Raw data is converted once and then left alone
+    np.testing.assert_array_equal( exp.raw_data.values, raw.values )
+    assert exp.units['mom_x'] == 'mm'
+
+
+def test_raw_data_converted_in_place(csv_file):
+    pyfim.defaults['PIXEL2MM'] = True
+
+    exp = pyfim.Experiment( None )
+    exp._merge_raw( [ pyfim.core._read_csv( csv_file ) ] )
+    before = exp.raw_data.to_numpy()
+
+    exp._extract_parameters()
+
+    assert exp._raw_converted
+    assert np.shares_memory( exp.raw_data.to_numpy(), before )
+
+
+def test_converted_raw_data_keeps_units(csv_file):
+    pyfim.defaults['PIXEL2MM'] = True
+    exp = pyfim.Experiment( csv_file, keep_raw=True )
+    mom_x = exp.mom_x.copy()
+
+    # Raw data is already in mm -> not converted back
+    pyfim.defaults['PIXEL2MM'] = False
+    exp.extract_data()
+
+    np.testing.assert_allclose( exp.mom_x.values, mom_x.values )
+    assert exp.units['mom_x'] == 'mm'
+
+
+def test_conversion_factor(csv_file):
+    px = pyfim.Experiment( csv_file )
+
+    pyfim.defaults['PIXEL2MM'] = True
+    mm = pyfim.Experiment( csv_file )
+
+    ppm = pyfim.defaults['PIXEL_PER_MM']
+    np.testing.assert_allclose( mm.mom_x.values, px.mom_x.values / ppm )
+    np.testing.assert_allclose( mm.area.values, px.area.values / ppm ** 2 )
+    # Non-spatial parameters are left alone
+    np.testing.assert_array_equal( mm.bending.values, px.bending.values )
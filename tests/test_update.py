@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+import pyfim
+
+from conftest import write_fimtrack_csv
+
+
+def test_update_folder(tmp_path):
+    folder = tmp_path / 'data'
+    folder.mkdir()
+    a = str( write_fimtrack_csv( folder / 'a.csv', seed=1 ) )
+
+    exp = pyfim.Experiment( str(folder) )
+    assert exp.update() == []
+
+    b = str( write_fimtrack_csv( folder / 'b.csv', seed=2 ) )
+    assert exp.update() == [ b ]
+    assert exp.update() == []
+
+    # Same as loading both files at once
+    full = pyfim.Experiment( [ a, b ] )
+    assert exp.objects == full.objects
+    for p in [ 'mom_x', 'velocity', 'stops', 'acc_dst' ]:
+        expected = getattr(full, p)
+        if isinstance(expected, pd.DataFrame):
+            pd.testing.assert_frame_equal( getattr(exp, p), expected, check_like=True )
+        else:
+            pd.testing.assert_series_equal( getattr(exp, p).sort_index(), expected.sort_index() )
+
+
+def test_update_files(tmp_path):
+    a = str( write_fimtrack_csv( tmp_path / 'a.csv', n_objects=2, seed=1 ) )
+    b = str( write_fimtrack_csv( tmp_path / 'b.csv', n_objects=2, seed=2 ) )
+
+    exp = pyfim.Experiment( a )
+    assert exp.update( [ a, b ] ) == [ b ]
+    assert exp.objects == [ 'object_{0}'.format(i) for i in range(4) ]
+
+
+def test_update_without_source():
+    with pytest.raises(ValueError):
+        pyfim.Experiment(None).update()